@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Benchmarks the dictionary utilities.
+
+The suite times Maps construction, attribute and item reads, 'to_dict',
+'copy', 'parse_ini' and pickling on synthetic configs from 10 to 10^6
+keys, followed by comparisons against the original implementations.
+Results are printed and written to 'bench_output.txt'.
+
+Run from the root of the repository:
+    $ python -m benchmarks.bench_dictutils
+    $ python -m benchmarks.bench_dictutils --max-keys 10000 --output quick.txt
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+import argparse
+import ast
+import os
+import pickle
+import platform
+import re
+import tempfile
+import time
+import timeit
+from configparser import ConfigParser
+from typing import Any, Callable, Dict, List, Tuple
+
+from helix.utils.dictutils import FrozenMaps, Maps
+
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+
+# The values of each section of the deep config
+_DEEP_OPTIONS = 10
+# Pickle recurses once per nested object, so deeper trees overflow its
+# recursion limit; the other operations are timed at every depth
+_MAX_PICKLE_DEPTH = 200
+_SAMPLES = ("32", "0.001", "True", "None", "adam", "[1, 2, 3]", "/data/train", "1e-5")
+
+
+def make_config(sections: int = 100, options: int = 100) -> dict:
+    """Builds a nested config resembling a loaded experiment config.
+
+    Args:
+        sections (:obj:`int`):
+            The number of top-level sections.
+        options (:obj:`int`):
+            The number of options in each section.
+
+    Returns:
+        dict:
+            The config with 'sections * options' string values.
+    """
+
+    return {
+        f"section {i}": {
+            f"option-{j}": _SAMPLES[j % len(_SAMPLES)] for j in range(options)
+        }
+        for i in range(sections)
+    }
+
+
+def make_wide(keys: int) -> dict:
+    """Builds a config of about :term:`keys` values spread over sections
+    of up to 1000 options."""
+
+    options = min(keys, 1000)
+    return make_config(max(1, keys // options), options)
+
+
+def make_deep(keys: int) -> dict:
+    """Builds a chain of nested sections of ten values each, with about
+    :term:`keys` values in total."""
+
+    options = min(keys, _DEEP_OPTIONS)
+    depth = max(1, keys // options)
+
+    root: dict = {}
+    node = root
+    for level in range(depth):
+        node.update((f"option-{j}", _SAMPLES[(level + j) % len(_SAMPLES)]) for j in range(options))
+        node["child"] = {}
+        node = node["child"]
+    return root
+
+
+def make_list_heavy(keys: int) -> dict:
+    """Builds a config whose sections hold lists of small records, with
+    about :term:`keys` values in total."""
+
+    records = max(1, keys // 2)
+    sections = max(1, records // 1000)
+    per_section = max(1, records // sections)
+
+    return {
+        f"split {i}": {
+            "records": [
+                {"path": f"/data/{i}/{j}.png", "label": str(j % 10)} for j in range(per_section)
+            ]
+        }
+        for i in range(sections)
+    }
+
+
+def make_ini(keys: int, env: bool = False) -> ConfigParser:
+    """Builds a parsed INI file holding :term:`keys` values.
+
+    If :term:`env` is True, half of the values reference an environment
+    variable.
+    """
+
+    config = make_wide(keys)
+    if env:
+        os.environ.setdefault("HELIX_BENCH_ROOT", "/mnt/datasets")
+        for options in config.values():
+            for index, option in enumerate(options):
+                if index % 2:
+                    options[option] = f"&HELIX_BENCH_ROOT&/{option}"
+
+    parser = ConfigParser(interpolation=None)
+    parser.read_dict(config)
+    return parser
+
+
+SHAPES: Dict[str, Callable[[int], dict]] = {
+    "wide": make_wide,
+    "deep": make_deep,
+    "list-heavy": make_list_heavy,
+}
+
+
+def _legacy_maps(dictionary: dict) -> dict:
+    # Reference walk mirroring the original constructor: an uncompiled
+    # pattern per key and 'literal_eval' on every value
+    result = {}
+    for key, value in dictionary.items():
+        key = re.sub('[^0-9a-zA-Z]+', '_', key)
+        if isinstance(value, dict):
+            value = _legacy_maps(value)
+        try:
+            result[key] = ast.literal_eval(value)
+        except (SyntaxError, ValueError):
+            result[key] = value
+    return result
+
+
+def _legacy_interpolate(option_value: str) -> str:
+    # Reference copy of the original '&VAR&' substitution loop
+    matches = [(m.start(0), m.end(0)) for m in re.finditer("&", option_value)]
+    if len(matches) > 0 and len(matches) % 2 == 0:
+        i = 0
+        while True:
+            try:
+                index_end = matches.pop(i + 1)[1]
+                index_start = matches.pop(i)[0]
+                sub = option_value[index_start:index_end]
+                sub_replace = os.environ[sub[1:-1]]
+                option_value = option_value.replace(sub, sub_replace)
+            except IndexError:
+                break
+            except KeyError:
+                pass
+    return option_value
+
+
+def _time(func: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def _time_auto(func: Callable[[], Any], target: float = 0.05) -> float:
+    # Runs 'func' enough times to take at least 'target' seconds per
+    # repeat; slow operations are only run once per repeat
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        seconds = timer.timeit(number)
+        if seconds >= target:
+            break
+        number *= max(2, min(100, int(target / max(seconds, 1e-9))))
+    return min([seconds] + timer.repeat(repeat=2, number=number)) / number
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def _shape_cases(shape: str, keys: int) -> List[Tuple[str, Callable[[], Any]]]:
+    # Returns the (operation, function) pairs timed on one config
+    data = SHAPES[shape](keys)
+    maps = Maps(data)
+
+    cases = [
+        ("construction", lambda: Maps(data)),
+        ("to_dict", maps.to_dict),
+        ("copy", maps.copy),
+    ]
+
+    if shape != "deep" or keys // _DEEP_OPTIONS <= _MAX_PICKLE_DEPTH:
+        payload = pickle.dumps(maps, protocol=pickle.HIGHEST_PROTOCOL)
+        cases.extend((
+            ("pickle dumps", lambda: pickle.dumps(maps, protocol=pickle.HIGHEST_PROTOCOL)),
+            ("pickle loads", lambda: pickle.loads(payload)),
+        ))
+
+    if shape == "wide":
+        section = maps.section_0
+        cases.extend((
+            ("attribute read", lambda: section.option_0),
+            ("item read", lambda: section["option_0"]),
+        ))
+    return cases
+
+
+def bench_suite(sizes: Tuple[int, ...] = SIZES, emit: Callable[[str], None] = print) -> None:
+    """Times every operation on each config shape and size."""
+
+    emit(f"{'shape':<11} {'keys':>8}  {'operation':<16} {'time':>11}")
+
+    for shape in SHAPES:
+        for keys in sizes:
+            for operation, func in _shape_cases(shape, keys):
+                emit(f"{shape:<11} {keys:>8}  {operation:<16} {_format_time(_time_auto(func))}")
+
+    for env in (False, True):
+        operation = "parse_ini (env)" if env else "parse_ini"
+        for keys in sizes:
+            parser = make_ini(keys, env=env)
+            seconds = _time_auto(lambda: Maps.parse_ini(parser))
+            emit(f"{'ini':<11} {keys:>8}  {operation:<16} {_format_time(seconds)}")
+
+
+def bench_construction(number: int = 5, emit: Callable[[str], None] = print) -> None:
+    """Compares building a :obj:`Maps` object against the original
+    per-value 'literal_eval' walk."""
+
+    config = make_config()
+
+    legacy = _time(lambda: _legacy_maps(config), number)
+    current = _time(lambda: Maps(config), number)
+
+    emit(f"construction (10^4 keys): legacy {legacy * 1e3:8.2f} ms | "
+         f"Maps {current * 1e3:8.2f} ms | {legacy / current:5.2f}x")
+
+
+def bench_reads(number: int = 1000000, emit: Callable[[str], None] = print) -> None:
+    """Compares attribute and item reads on :obj:`Maps`,
+    :obj:`FrozenMaps` and a stdlib dictionary."""
+
+    config = {"optimizer": {"lr": "0.001"}}
+    maps = Maps(config)
+    frozen = FrozenMaps(config)
+    plain = maps.to_dict()
+
+    maps_optimizer = maps.optimizer
+    frozen_optimizer = frozen.optimizer
+    plain_optimizer = plain["optimizer"]
+
+    cases = (
+        ("dict item", lambda: plain_optimizer["lr"]),
+        ("Maps attribute", lambda: maps_optimizer.lr),
+        ("Maps item", lambda: maps_optimizer["lr"]),
+        ("FrozenMaps attribute", lambda: frozen_optimizer.lr),
+        ("FrozenMaps item", lambda: frozen_optimizer["lr"]),
+    )
+
+    for name, func in cases:
+        emit(f"read {name:<20}: {_time(func, number) * 1e9:8.1f} ns")
+
+
+def bench_paths(number: int = 200000, emit: Callable[[str], None] = print) -> None:
+    """Compares deep reads through chained attributes against
+    :meth:`Maps.get_path` and a compiled :obj:`MapsPath`."""
+
+    maps = Maps({"train": {"optimizer": {"params": {"lr": "0.001", "momentum": "0.9"}}}})
+    compiled = Maps.compile_path("train.optimizer.params.lr")
+    paths = ["train.optimizer.params.lr", "train.optimizer.params.momentum"]
+
+    cases = (
+        ("attributes", lambda: maps.train.optimizer.params.lr),
+        ("get_path", lambda: maps.get_path("train.optimizer.params.lr")),
+        ("compiled", lambda: compiled.get(maps)),
+        ("2x compiled", lambda: (compiled.get(maps), compiled.get(maps))),
+        ("get_paths (2)", lambda: maps.get_paths(paths)),
+    )
+
+    for name, func in cases:
+        emit(f"deep read {name:<15}: {_time(func, number) * 1e9:8.1f} ns")
+
+
+def bench_load_ini(number: int = 5, emit: Callable[[str], None] = print) -> None:
+    """Compares a cold INI parse against a warm load from the binary
+    snapshot cache."""
+
+    config = make_config()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.ini")
+        cache_dir = os.path.join(directory, "cache")
+
+        with open(path, "w") as file:
+            for section, options in config.items():
+                file.write(f"[{section}]\n")
+                file.writelines(f"{option} = {value}\n" for option, value in options.items())
+
+        def cold() -> None:
+            for snapshot in os.listdir(cache_dir) if os.path.isdir(cache_dir) else ():
+                os.remove(os.path.join(cache_dir, snapshot))
+            Maps.load_ini(path, cache_dir=cache_dir)
+
+        cold_time = _time(cold, number)
+        warm_time = _time(lambda: Maps.load_ini(path, cache_dir=cache_dir), number)
+
+    emit(f"load_ini (10^4 keys): cold {cold_time * 1e3:8.2f} ms | "
+         f"warm {warm_time * 1e3:8.2f} ms | {cold_time / warm_time:5.2f}x")
+
+
+def bench_interpolation(number: int = 200, emit: Callable[[str], None] = print) -> None:
+    """Compares :meth:`Maps.parse_ini` against the original substitution
+    loop and walk on values with many environment references."""
+
+    os.environ.setdefault("HELIX_BENCH_ROOT", "/mnt/datasets")
+    value = "/".join(f"&HELIX_BENCH_ROOT&/shard{i}" for i in range(50))
+    parser = ConfigParser(interpolation=None)
+    parser.read_dict({"paths": {f"option-{i}": value for i in range(100)}})
+
+    def legacy_parse() -> dict:
+        return _legacy_maps({
+            section: {option: _legacy_interpolate(value) for option, value in parser.items(section)}
+            for section in parser.sections()
+        })
+
+    legacy = _time(legacy_parse, number)
+    current = _time(lambda: Maps.parse_ini(parser), number)
+
+    emit(f"parse_ini (50 refs/value): legacy {legacy * 1e3:8.2f} ms | "
+         f"Maps {current * 1e3:8.2f} ms | {legacy / current:5.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks helix.utils.dictutils.")
+    parser.add_argument(
+        "--max-keys",
+        type=int,
+        default=SIZES[-1],
+        help="the largest config size to benchmark (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--output",
+        default="bench_output.txt",
+        help="the file the results are written to (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--skip-comparisons",
+        action="store_true",
+        help="only run the suite, not the comparisons against the original code"
+    )
+    args = parser.parse_args()
+
+    sizes = tuple(size for size in SIZES if size <= args.max_keys)
+
+    with open(args.output, "w") as output:
+
+        def emit(line: str) -> None:
+            print(line)
+            output.write(f"{line}\n")
+            output.flush()
+
+        emit(f"# helix.utils.dictutils benchmarks, {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        emit(f"# Python {platform.python_version()} ({platform.python_implementation()}), "
+             f"{platform.platform()}")
+        emit("")
+        bench_suite(sizes, emit)
+
+        if not args.skip_comparisons:
+            emit("")
+            bench_construction(emit=emit)
+            bench_reads(emit=emit)
+            bench_paths(emit=emit)
+            bench_load_ini(emit=emit)
+            bench_interpolation(emit=emit)
+
+
+if __name__ == "__main__":
+    main()
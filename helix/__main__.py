@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Starts the application.
+
+Only Qt and the main window are imported before the window is shown.
+Heavy dependencies (TensorFlow, image codecs, training code) belong to
+the pages of the annotate, train and evaluate modes, which are imported
+the first time each page is shown (see 'PageManager.register').
+
+Usage:
+    $ python -m helix
+    $ python -m helix --profile-startup
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+import time
+
+# Taken before any other import so the profile covers the whole startup
+_START = time.perf_counter()
+
+import argparse
+import builtins
+import sys
+from typing import Any, Callable, List, Optional, Tuple
+
+
+# Modules that must not be imported before the window is first painted
+_HEAVY_MODULES = ("tensorflow", "numpy", "cv2", "PIL", "skimage", "scipy")
+
+
+class _ImportProfiler(object):
+    """Times every module imported while it is installed.
+
+    Each timing is recorded both inclusive of the modules the import
+    pulled in and exclusive of them (self time).
+    """
+
+    def __init__(self) -> None:
+        self.timings: List[Tuple[str, float, float]] = []
+        self._children: List[float] = []
+        self._import = builtins.__import__
+
+    def _profiled_import(self,
+                         name: str,
+                         globals: Optional[dict] = None,
+                         locals: Optional[dict] = None,
+                         fromlist: Tuple[str, ...] = (),
+                         level: int = 0) -> Any:
+        if level == 0 and name in sys.modules and not fromlist:
+            return self._import(name, globals, locals, fromlist, level)
+
+        loaded = len(sys.modules)
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+
+            if len(sys.modules) > loaded:
+                if level:
+                    package = (globals or {}).get('__package__') or ''
+                    name = f"{package}.{name}" if name else package
+                self.timings.append((name, elapsed, elapsed - children))
+
+    def report(self, first_paint: float, limit: int = 25) -> str:
+        """Formats the slowest imports and the time-to-first-paint."""
+
+        lines = [f"{'self (ms)':>10} {'total (ms)':>11}  module"]
+        for name, total, own in sorted(self.timings, key=lambda timing: -timing[2])[:limit]:
+            lines.append(f"{own * 1e3:10.2f} {total * 1e3:11.2f}  {name}")
+
+        imports = sum(own for _, _, own in self.timings)
+        lines.append(f"{len(self.timings)} imports took {imports * 1e3:.1f} ms")
+        lines.append(f"time to first paint: {first_paint * 1e3:.1f} ms")
+
+        heavy = [name for name in _HEAVY_MODULES if name in sys.modules]
+        if heavy:
+            lines.append(f"warning: imported before first paint: {', '.join(heavy)}")
+        return "\n".join(lines)
+
+    def start(self) -> None:
+        builtins.__import__ = self._profiled_import
+
+    def stop(self) -> None:
+        builtins.__import__ = self._import
+
+
+def _on_first_paint(window: Any, callback: Callable[[], None]) -> None:
+    # Calls 'callback' once the window has been painted for the first time
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+
+    class FirstPaintFilter(QObject):
+
+        def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+            if event.type() == QEvent.Paint:
+                window.removeEventFilter(self)
+                # Reported once the paint event has been handled
+                QTimer.singleShot(0, callback)
+            return False
+
+    window._first_paint_filter = FirstPaintFilter(window)
+    window.installEventFilter(window._first_paint_filter)
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> Tuple[argparse.Namespace, List[str]]:
+    parser = argparse.ArgumentParser(
+        prog="helix",
+        description="Annotate, train and evaluate models in one application."
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="report the time taken by each import and the time to the first paint"
+    )
+    # Anything else is left to Qt (e.g. '-style')
+    return parser.parse_known_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Shows the main window and runs the event loop.
+
+    Returns:
+        int:
+            The exit code of the application.
+    """
+
+    args, qt_args = _parse_args(argv)
+
+    profiler = None
+    if args.profile_startup:
+        profiler = _ImportProfiler()
+        profiler.start()
+
+    from PyQt5.QtWidgets import QApplication
+    from helix.windows.mainwindow.view import HelixWindowView
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = HelixWindowView()
+
+    if profiler is not None:
+        def report() -> None:
+            first_paint = time.perf_counter() - _START
+            profiler.stop()
+            print(profiler.report(first_paint), file=sys.stderr)
+
+        _on_first_paint(window, report)
+
+    window.show()
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Steps through the images of a dataset without blocking the GUI.
+
+'DatasetBrowser' decodes images on a thread pool and prefetches the
+images ahead in the direction the user is stepping, so showing the
+next or previous image is usually instant. Decoded images are handed to
+the view as QImages through signals; QPixmaps must still be created on
+the GUI thread.
+
+Example Usage:
+    >>> browser = DatasetBrowser(prefetch=4, target_size=QSize(1920, 1080))
+    >>> browser.image_ready.connect(lambda index, path, image: view.show(image))
+    >>> browser.open_directory("/data/train")
+    >>> next_image_btn.clicked.connect(browser.next)
+    >>> previous_image_btn.clicked.connect(browser.previous)
+
+If importing all (i.e. 'from browser import *'), only 'DatasetBrowser'
+and 'decode_image' will be imported as defined in the '__all__'
+attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["DatasetBrowser", "decode_image"]
+
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from PyQt5.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+from helix.core.imagecache import ImageCache
+
+
+def decode_image(path: str, target_size: Optional[QSize] = None) -> QImage:
+    """
+    Decodes the image at :term:`path`, honouring its EXIF orientation.
+
+    Args:
+        path (:obj:`str`):
+            The path of the image.
+        target_size (:obj:`QSize`, optional):
+            The size the image is displayed at. Larger images are
+            scaled down while decoding (keeping their aspect ratio),
+            which most codecs do far faster than a full decode.
+
+    Returns:
+        QImage:
+            The decoded image.
+
+    Raises:
+        OSError:
+            The image cannot be read or decoded.
+    """
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+
+    if target_size is not None and target_size.isValid():
+        size = reader.size()
+        if size.isValid() and (size.width() > target_size.width() or size.height() > target_size.height()):
+            reader.setScaledSize(size.scaled(target_size, Qt.KeepAspectRatio))
+
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"cannot decode '{path}': {reader.errorString()}")
+    return image
+
+
+class DatasetBrowser(QObject):
+    """Decodes and prefetches the images of a dataset.
+
+    Only the current image and the prefetched ones are kept decoded.
+    Every method must be called from the thread the browser lives in,
+    usually the GUI thread.
+
+    Args:
+        parent (:obj:`QObject`, optional):
+            The parent object.
+        prefetch (:obj:`int`):
+            The number of images decoded ahead in the direction of
+            navigation. One image behind is kept as well.
+        target_size (:obj:`QSize`, optional):
+            The size images are displayed at; see :func:`decode_image`.
+        workers (:obj:`int`, optional):
+            The number of decoding threads. Defaults to half the CPUs.
+        cache (:obj:`ImageCache`, optional):
+            Keeps decoded images beyond the prefetch window, so images
+            visited again are not decoded again.
+
+    Attributes:
+        current_changed (:obj:`pyqtSignal`):
+            The signal fired with the index and path of the new current
+            image as soon as it changes, before it is decoded.
+        image_ready (:obj:`pyqtSignal`):
+            The signal fired with the index, path and :obj:`QImage` of
+            the current image once it is decoded.
+        image_failed (:obj:`pyqtSignal`):
+            The signal fired with the index, path and error message of
+            a current image that cannot be decoded.
+    """
+
+    current_changed = pyqtSignal(int, str)
+    image_ready = pyqtSignal(int, str, QImage)
+    image_failed = pyqtSignal(int, str, str)
+
+    # Carries worker results back to the browser's thread
+    _decoded = pyqtSignal(int, int, object, str)
+
+    _direction: int
+    _generation: int
+    _images: Dict[int, QImage]
+    _index: int
+    _paths: List[str]
+    _pending: Dict[int, Future]
+
+    def __init__(self,
+                 parent: Optional[QObject] = None,
+                 prefetch: int = 4,
+                 target_size: Optional[QSize] = None,
+                 workers: Optional[int] = None,
+                 cache: Optional[ImageCache] = None) -> None:
+        super().__init__(parent)
+
+        self.cache = cache
+        self.prefetch = prefetch
+        self.target_size = target_size
+
+        self._direction = 1
+        self._generation = 0
+        self._images = {}
+        self._index = -1
+        self._paths = []
+        self._pending = {}
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or max(2, (os.cpu_count() or 2) // 2),
+            thread_name_prefix="helix-decode"
+        )
+        self._decoded.connect(self._on_decoded, Qt.QueuedConnection)
+
+    # Internal methods
+
+    def _decode(self, generation: int, index: int, path: str) -> None:
+        # Runs on a worker thread; results are only applied on the
+        # browser's thread
+        try:
+            if self.cache is not None:
+                image = self.cache.get_or_decode(path, self.target_size, decode_image)
+            else:
+                image = decode_image(path, self.target_size)
+        except Exception as error:
+            self._decoded.emit(generation, index, None, str(error))
+        else:
+            self._decoded.emit(generation, index, image, '')
+
+    def _on_decoded(self, generation: int, index: int, image: Optional[QImage], error: str) -> None:
+        if generation != self._generation:
+            return
+        self._pending.pop(index, None)
+
+        if image is None:
+            if index == self._index:
+                self.image_failed.emit(index, self._paths[index], error)
+            return
+
+        if index in self._window():
+            self._images[index] = image
+        if index == self._index:
+            self.image_ready.emit(index, self._paths[index], image)
+
+    def _schedule(self) -> None:
+        # Decodes the current image first, then the ones ahead
+        window = self._window()
+
+        # Decodes already running finish; their results only reach the
+        # cache
+        for index in [index for index in self._pending if index not in window]:
+            self._pending.pop(index).cancel()
+        for index in [index for index in self._images if index not in window]:
+            del self._images[index]
+
+        for index in window:
+            if index in self._images or index in self._pending:
+                continue
+
+            image = None
+            if self.cache is not None:
+                # The decode, if any, counts the miss
+                image = self.cache.peek(self._paths[index], self.target_size)
+            if image is not None:
+                self._images[index] = image
+            else:
+                self._pending[index] = self._executor.submit(
+                    self._decode, self._generation, index, self._paths[index]
+                )
+
+    def _window(self) -> List[int]:
+        # The indexes kept decoded, in the order they are needed
+        if self._index < 0:
+            return []
+
+        ahead = (self._index + self._direction * step for step in range(1, self.prefetch + 1))
+        window = [self._index]
+        window.extend(index for index in ahead if 0 <= index < len(self._paths))
+        behind = self._index - self._direction
+        if 0 <= behind < len(self._paths):
+            window.append(behind)
+        return window
+
+    # Public methods
+
+    @property
+    def current_index(self) -> int:
+        """The index of the current image, or -1 if none is open."""
+
+        return self._index
+
+    @property
+    def current_path(self) -> Optional[str]:
+        """The path of the current image, if any."""
+
+        return self._paths[self._index] if self._index >= 0 else None
+
+    def go_to(self, index: int) -> None:
+        """
+        Makes image :term:`index` current. Its :obj:`QImage` is sent
+        through :attr:`image_ready` right away if it is already decoded.
+
+        Raises:
+            IndexError:
+                :obj:`index` is out of range.
+        """
+
+        if not 0 <= index < len(self._paths):
+            raise IndexError(f"image index out of range: {index}")
+
+        if index != self._index and self._index >= 0:
+            self._direction = 1 if index > self._index else -1
+        self._index = index
+        self.current_changed.emit(index, self._paths[index])
+
+        self._schedule()
+
+        image = self._images.get(index)
+        if image is not None:
+            self.image_ready.emit(index, self._paths[index], image)
+
+    def next(self) -> None:
+        """Steps to the next image, if there is one."""
+
+        if self._index + 1 < len(self._paths):
+            self.go_to(self._index + 1)
+
+    def open(self, paths: Iterable[str], index: int = 0) -> None:
+        """
+        Opens a list of images, showing image :term:`index`.
+
+        Decodes still running for the previous dataset are dropped.
+        """
+
+        for future in self._pending.values():
+            future.cancel()
+
+        self._generation += 1
+        self._direction = 1
+        self._images = {}
+        self._index = -1
+        self._paths = list(paths)
+        self._pending = {}
+
+        if self._paths:
+            self.go_to(index)
+
+    def open_directory(self, directory: str, index: int = 0) -> None:
+        """Opens every image in :term:`directory` that Qt can decode,
+        sorted by name."""
+
+        formats = {bytes(extension).decode().lower() for extension in QImageReader.supportedImageFormats()}
+        paths = sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and os.path.splitext(entry.name)[1][1:].lower() in formats
+        )
+        self.open(paths, index)
+
+    @property
+    def paths(self) -> List[str]:
+        """The paths of the open images."""
+
+        return list(self._paths)
+
+    def previous(self) -> None:
+        """Steps to the previous image, if there is one."""
+
+        if self._index > 0:
+            self.go_to(self._index - 1)
+
+    def shutdown(self) -> None:
+        """Stops the decoding threads. Queued decodes are dropped."""
+
+        self._generation += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Caches decoded images within a memory budget.
+
+'ImageCache' keeps the most recently used decoded images until their
+total size in bytes reaches a limit, so a 4K image weighs as much as
+the sixteen 1080p thumbnails it could be traded for. Entries are keyed
+on the path, modification time and display size of the image, so an
+edited file or a resized view never returns a stale image. Files that
+never change, such as cached tiles, may be keyed without a stat.
+
+Example Usage:
+    >>> cache = ImageCache(max_bytes=1 << 30)
+    >>> image = cache.get_or_decode(path, QSize(1920, 1080), decode_image)
+    >>> cache.peek(path, QSize(1920, 1080))
+    >>> cache.stats()
+
+    Output: {'hits': 12, 'misses': 3, 'evictions': 0, ...}
+
+If importing all (i.e. 'from imagecache import *'), only 'ImageCache'
+will be imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["ImageCache"]
+
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImage
+
+
+# (path, modification time in ns or -1, display width, display height)
+_Key = Tuple[str, int, int, int]
+
+
+def _image_bytes(image: QImage) -> int:
+    # 'sizeInBytes' replaced 'byteCount' in Qt 5.10
+    if hasattr(image, 'sizeInBytes'):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+class ImageCache(object):
+    """A thread-safe LRU cache of decoded images bounded by bytes.
+
+    Args:
+        max_bytes (:obj:`int`):
+            The total size of the decoded images kept. An image larger
+            than this is never cached. Default is 512 MiB.
+
+    Attributes:
+        hits (:obj:`int`):
+            The number of lookups that found an image.
+        misses (:obj:`int`):
+            The number of lookups that did not. Probes made with
+            :meth:`peek` count as neither, so a miss is usually one
+            decode.
+        evictions (:obj:`int`):
+            The number of images dropped to stay within the budget.
+
+    Raises:
+        ValueError:
+            An argument is of a legal type but is an illegal value.
+    """
+
+    _entries: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_bytes: int = 512 << 20) -> None:
+        super().__init__()
+
+        if max_bytes <= 0:
+            raise ValueError(f"argument 'max_bytes' must be positive: {max_bytes}")
+
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Key -> (image, size in bytes), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: _Key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Internal methods
+
+    def _evict(self) -> None:
+        # Caller holds the lock
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def _lookup(self, key: Optional[_Key], count: bool) -> Optional[QImage]:
+        # Finds an image and marks it as recently used, counting the
+        # lookup if asked to
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def _store(self, key: Optional[_Key], image: QImage) -> bool:
+        image_bytes = _image_bytes(image)
+        if key is None or image_bytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self._entries[key] = (image, image_bytes)
+            self.current_bytes += image_bytes
+            self._evict()
+        return True
+
+    # Public methods
+
+    def clear(self) -> None:
+        """Drops every image. The counters are kept."""
+
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get(self, path: str, size: Optional[QSize] = None, stat: bool = True) -> Optional[QImage]:
+        """
+        Returns the cached image of :term:`path` decoded for display at
+        :term:`size`, or None.
+
+        A file that was modified since it was cached, or that cannot be
+        accessed, counts as a miss. See :meth:`key` for :term:`stat`.
+        """
+
+        return self._lookup(self.key(path, size, stat), True)
+
+    def get_or_decode(self,
+                      path: str,
+                      size: Optional[QSize],
+                      decode: Callable[[str, Optional[QSize]], QImage],
+                      stat: bool = True) -> QImage:
+        """
+        Returns the cached image of :term:`path`, decoding and caching
+        it with :term:`decode` on a miss.
+
+        Decoding runs without holding the cache's lock, so several
+        threads may decode different images at once. The file is only
+        stat'ed once, before decoding, so a file rewritten meanwhile is
+        cached under its previous time and decoded again on next use.
+        """
+
+        key = self.key(path, size, stat)
+        image = self._lookup(key, True)
+        if image is None:
+            image = decode(path, size)
+            self._store(key, image)
+        return image
+
+    @staticmethod
+    def key(path: str, size: Optional[QSize] = None, stat: bool = True) -> Optional[_Key]:
+        """
+        Returns the key of :term:`path` at display :term:`size`, or None
+        if the file cannot be accessed.
+
+        Unless :term:`stat` is set, the file is assumed never to change
+        and is keyed on its path alone, without touching the disk.
+        """
+
+        if not stat:
+            modified = -1
+        else:
+            try:
+                modified = os.stat(path).st_mtime_ns
+            except OSError:
+                return None
+        if size is None or not size.isValid():
+            return (path, modified, -1, -1)
+        return (path, modified, size.width(), size.height())
+
+    def peek(self, path: str, size: Optional[QSize] = None, stat: bool = True) -> Optional[QImage]:
+        """
+        Returns the cached image of :term:`path` at :term:`size`, or
+        None, like :meth:`get` but without counting a hit or a miss.
+
+        Meant for probes that do not decode on a miss, such as repaints
+        or checks made before scheduling :meth:`get_or_decode`.
+        """
+
+        return self._lookup(self.key(path, size, stat), False)
+
+    def put(self, path: str, image: QImage, size: Optional[QSize] = None, stat: bool = True) -> bool:
+        """
+        Caches :term:`image` as :term:`path` decoded for display at
+        :term:`size`, evicting the least recently used images as needed.
+
+        Returns:
+            bool:
+                Whether the image was cached. Images larger than
+                :attr:`max_bytes` and files that cannot be accessed are
+                not.
+        """
+
+        return self._store(self.key(path, size, stat), image)
+
+    def resize(self, max_bytes: int) -> None:
+        """Changes the budget, evicting images if it shrinks."""
+
+        if max_bytes <= 0:
+            raise ValueError(f"argument 'max_bytes' must be positive: {max_bytes}")
+
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the counters, the memory used and the hit rate."""
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "images": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Indexes dataset directories and their thumbnails.
+
+'DatasetIndexer' brings the 'DatasetManifest' of a directory up to date
+on a background thread and sends every image's thumbnail to the view.
+Only images new or changed since the manifest was last refreshed are
+hashed, and thumbnails are only generated, in a process pool, for
+content missing from the 'ThumbnailDB', an SQLite database keyed by
+content hash. Reopening a dataset (or a copy of it) therefore sends its
+thumbnails straight from the database. Images edited in place leave
+their directory untouched, so only 'verify()', which stats every image,
+finds them. While a dataset is open its
+directories are watched, through inotify where available, and refreshed
+as they change; changes reported during a scan are refreshed once it
+ends rather than interrupting it.
+
+Example Usage:
+    >>> indexer = DatasetIndexer()
+    >>> indexer.scanned.connect(filmstrip.set_paths)
+    >>> indexer.thumbnail_ready.connect(filmstrip.set_thumbnail)
+    >>> indexer.open_directory("/data/train")
+
+If importing all (i.e. 'from indexer import *'), only 'DatasetIndexer'
+and 'ThumbnailDB' will be imported as defined in the '__all__'
+attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["DatasetIndexer", "ThumbnailDB"]
+
+
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from PyQt5.QtCore import QBuffer, QByteArray, QFileSystemWatcher, QIODevice, QObject, QSize, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+from helix.core.manifest import DatasetManifest
+
+
+# (path, size, modification time in ns, hash, width, height, thumbnail)
+_Thumbnail = Tuple[str, int, int, str, int, int, Optional[bytes]]
+
+
+def _default_database() -> str:
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'helix', 'thumbnails.db')
+
+
+def _make_thumbnails(paths: List[str], size: int, format: str) -> List[_Thumbnail]:
+    # Runs in a worker process. Each file is read once, both to hash it
+    # and to decode it
+    thumbnails = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+            with open(path, 'rb') as file:
+                content = file.read()
+        except OSError:
+            continue
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+
+        data = QByteArray(content)
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        reader.setAutoTransform(True)
+
+        dimensions = reader.size()
+        if dimensions.isValid():
+            reader.setScaledSize(dimensions.scaled(QSize(size, size), Qt.KeepAspectRatio))
+        image = reader.read()
+
+        thumbnail = None
+        if not image.isNull():
+            if not dimensions.isValid():
+                dimensions = image.size()
+                image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            encoded = QByteArray()
+            output = QBuffer(encoded)
+            output.open(QIODevice.WriteOnly)
+            image.save(output, format, 85)
+            thumbnail = bytes(encoded)
+
+        thumbnails.append((
+            path,
+            info.st_size,
+            info.st_mtime_ns,
+            digest,
+            dimensions.width(),
+            dimensions.height(),
+            thumbnail
+        ))
+    return thumbnails
+
+
+class ThumbnailDB(object):
+    """An SQLite database of thumbnails keyed by content hash.
+
+    A connection is only usable from the thread that opened the
+    database.
+
+    Args:
+        path (:obj:`str`, optional):
+            The database file. Defaults to
+            '$XDG_CACHE_HOME/helix/thumbnails.db' (or '~/.cache/...').
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        super().__init__()
+
+        self.path = path or _default_database()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                hash TEXT PRIMARY KEY,
+                data BLOB
+            );
+            """
+        )
+
+    def __enter__(self) -> ThumbnailDB:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Commits pending writes and closes the database."""
+
+        self._connection.commit()
+        self._connection.close()
+
+    def lookup(self, digest: str) -> Tuple[bool, Optional[bytes]]:
+        """
+        Returns whether the content hashed as :term:`digest` is known
+        and its encoded thumbnail, which is None if it cannot be
+        decoded.
+        """
+
+        row = self._connection.execute("SELECT data FROM thumbnails WHERE hash = ?", (digest,)).fetchone()
+        return (False, None) if row is None else (True, row[0])
+
+    def store(self, thumbnails: Iterable[Tuple[str, Optional[bytes]]]) -> None:
+        """Records the encoded thumbnails of content, given as (hash,
+        thumbnail), and commits them."""
+
+        self._connection.executemany("INSERT OR REPLACE INTO thumbnails VALUES (?, ?)", thumbnails)
+        self._connection.commit()
+
+
+class DatasetIndexer(QObject):
+    """Scans dataset directories and sends their thumbnails.
+
+    Scanning runs on a background thread and thumbnails missing from
+    the database are generated in a process pool. Only one directory is
+    indexed at a time; opening another stops the current scan, drops its
+    remaining results and starts once it has ended.
+
+    Args:
+        parent (:obj:`QObject`, optional):
+            The parent object.
+        database (:obj:`str`, optional):
+            The path of the :obj:`ThumbnailDB`.
+        thumbnail_size (:obj:`int`):
+            The largest width or height of a thumbnail.
+        workers (:obj:`int`, optional):
+            The number of processes generating thumbnails. Defaults to
+            the number of CPUs.
+        batch_size (:obj:`int`):
+            The number of images sent to a worker process at once.
+        watch (:obj:`bool`):
+            Whether to refresh the open dataset as its directories
+            change.
+
+    Attributes:
+        scanned (:obj:`pyqtSignal`):
+            The signal fired with the sorted paths of every image found,
+            when a dataset is opened and whenever images are added or
+            removed.
+        thumbnail_ready (:obj:`pyqtSignal`):
+            The signal fired with the index, path and :obj:`QImage`
+            thumbnail of an image. Once a dataset is open, it only fires
+            for images added or edited since; receivers keep the other
+            thumbnails by path.
+        progress (:obj:`pyqtSignal`):
+            The signal fired with the number of images indexed and the
+            total.
+        finished (:obj:`pyqtSignal`):
+            The signal fired once every image is indexed.
+    """
+
+    scanned = pyqtSignal(list)
+    thumbnail_ready = pyqtSignal(int, str, QImage)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+    # Carry the results of a scan (with its stop event, the name of the
+    # signal and its arguments), the directories to watch and the end of
+    # a scan back to the indexer's thread
+    _deliver = pyqtSignal(object, str, tuple)
+    _watch = pyqtSignal(list)
+    _done = pyqtSignal(object)
+
+    _changed: Set[str]
+    _directory: Optional[str]
+    _next: Optional[Tuple[str, Optional[List[str]], bool]]
+    _scanning: bool
+
+    def __init__(self,
+                 parent: Optional[QObject] = None,
+                 database: Optional[str] = None,
+                 thumbnail_size: int = 128,
+                 workers: Optional[int] = None,
+                 batch_size: int = 16,
+                 watch: bool = True) -> None:
+        super().__init__(parent)
+
+        self.database = database
+        self.thumbnail_size = thumbnail_size
+        self.workers = workers or os.cpu_count() or 2
+        self.batch_size = batch_size
+
+        self._changed = set()
+        self._directory = None
+        self._next = None
+        self._scanning = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._watcher: Optional[QFileSystemWatcher] = None
+        if watch:
+            self._watcher = QFileSystemWatcher(self)
+            self._watcher.directoryChanged.connect(self._on_directory_changed)
+            self._watch.connect(self._on_watch, Qt.QueuedConnection)
+        self._deliver.connect(self._on_deliver, Qt.QueuedConnection)
+        self._done.connect(self._on_done, Qt.QueuedConnection)
+
+        # Changes come in bursts, e.g. while a dataset is being copied
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(500)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self._refresh)
+
+    # Internal methods
+
+    def _emit(self, stop: threading.Event, signal: str, *args) -> None:
+        # Runs on the scanning thread
+        if not stop.is_set():
+            self._deliver.emit(stop, signal, args)
+
+    def _emit_thumbnail(self, stop: threading.Event, index: int, path: str, data: Optional[bytes]) -> None:
+        if data is not None:
+            self._emit(stop, 'thumbnail_ready', index, path, QImage.fromData(data))
+
+    def _generate(self,
+                  manifest: DatasetManifest,
+                  database: ThumbnailDB,
+                  paths: List[str],
+                  indexes: Dict[str, int],
+                  done: int,
+                  stop: threading.Event) -> None:
+        # Qt must not be forked once initialised, so workers are spawned
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(max_workers=min(self.workers, len(paths)), mp_context=context)
+        futures = [
+            pool.submit(_make_thumbnails, paths[start:start + self.batch_size], self.thumbnail_size, 'jpg')
+            for start in range(0, len(paths), self.batch_size)
+        ]
+        try:
+            for future in as_completed(futures):
+                if stop.is_set():
+                    break
+                thumbnails = future.result()
+                database.store((digest, data) for _, _, _, digest, _, _, data in thumbnails)
+                manifest.record(thumbnail[:6] for thumbnail in thumbnails)
+
+                for path, *_, data in thumbnails:
+                    self._emit_thumbnail(stop, indexes[path], path, data)
+                done += len(thumbnails)
+                self._emit(stop, 'progress', done, len(indexes))
+        finally:
+            for future in futures:
+                future.cancel()
+            # A stopped scan leaves the batches being made to finish on
+            # their own; their thumbnails are dropped
+            pool.shutdown(wait=not stop.is_set())
+
+    def _index(self, directory: str, stop: threading.Event, changed: Optional[List[str]], full: bool) -> None:
+        # Runs on the scanning thread. Each scan has its own event, so a
+        # stopped scan cannot be revived by the next one
+        try:
+            self._scan(directory, stop, changed, full)
+        finally:
+            self._done.emit(stop)
+
+    def _on_directory_changed(self, directory: str) -> None:
+        self._changed.add(directory)
+        self._refresh_timer.start()
+
+    def _on_deliver(self, stop: threading.Event, signal: str, args: tuple) -> None:
+        # Results of a scan stopped since are dropped
+        if stop is self._stop and not stop.is_set():
+            getattr(self, signal).emit(*args)
+
+    def _on_done(self, stop: threading.Event) -> None:
+        # Starts the scan waiting for this one to end or, unless it was
+        # stopped, refreshes the directories that changed meanwhile
+        if stop is not self._stop:
+            return
+        self._scanning = False
+        if self._next is not None:
+            next_scan, self._next = self._next, None
+            self._start(*next_scan)
+        elif not stop.is_set():
+            self._refresh()
+
+    def _on_watch(self, directories: List[str]) -> None:
+        watched = set(self._watcher.directories())
+        if self._directory is not None and os.path.abspath(self._directory) in directories:
+            new = [directory for directory in directories if directory not in watched]
+            if new:
+                self._watcher.addPaths(new)
+
+    def _refresh(self) -> None:
+        # Changes found during a scan wait for its end, as stopping it
+        # would leave the rest of a first scan unindexed
+        if self._scanning:
+            return
+        changed, self._changed = list(self._changed), set()
+        if self._directory is not None and changed:
+            self._start(self._directory, changed)
+
+    def _scan(self, directory: str, stop: threading.Event, changed: Optional[List[str]], full: bool) -> None:
+        with DatasetManifest(directory) as manifest, ThumbnailDB(self.database) as database:
+            if full:
+                changes, everything = manifest.refresh(full=True), False
+            else:
+                changes, everything = manifest.refresh(directories=changed), changed is None
+            if not self._send(manifest, database, changes, everything, stop):
+                return
+
+        self._emit(stop, 'finished')
+
+    def _send(self,
+              manifest: DatasetManifest,
+              database: ThumbnailDB,
+              changes: Tuple[List[str], List[str], List[str]],
+              everything: bool,
+              stop: threading.Event) -> bool:
+        # Sends the paths and thumbnails of every image, or only of those
+        # added or modified; returns whether the scan was not stopped
+        added, modified, removed = changes
+        if stop.is_set():
+            return False
+
+        entries = manifest.entries()
+        if everything or added or removed:
+            self._emit(stop, 'scanned', [path for path, *_ in entries])
+        if self._watcher is not None:
+            self._watch.emit(manifest.subdirectories())
+
+        indexes = {path: index for index, (path, *_) in enumerate(entries)}
+        if not everything:
+            # The view keeps the thumbnails of the other images by path,
+            # wherever their index moved
+            fresh = set(added).union(modified)
+            entries = [entry for entry in entries if entry[0] in fresh]
+
+        missing = []
+        for path, _, _, digest, _, _ in entries:
+            if stop.is_set():
+                return False
+
+            known, data = database.lookup(digest) if digest is not None else (False, None)
+            if known:
+                self._emit_thumbnail(stop, indexes[path], path, data)
+            else:
+                missing.append(path)
+
+        done = len(indexes) - len(missing)
+        self._emit(stop, 'progress', done, len(indexes))
+        if missing:
+            self._generate(manifest, database, missing, indexes, done, stop)
+        return not stop.is_set()
+
+    def _start(self, directory: str, changed: Optional[List[str]] = None, full: bool = False) -> None:
+        # Two scans would write the manifest at once, so a running scan
+        # is stopped and this one started once it ends. Waiting for it
+        # here would block the GUI until its thumbnail batches are made
+        if self._scanning:
+            self._stop.set()
+            self._next = (directory, changed, full)
+            return
+
+        self._stop = threading.Event()
+        self._scanning = True
+        self._thread = threading.Thread(
+            target=self._index,
+            args=(directory, self._stop, changed, full),
+            name="helix-indexer",
+            daemon=True
+        )
+        self._thread.start()
+
+    # Public methods
+
+    def open_directory(self, directory: str) -> None:
+        """Indexes the images in :term:`directory` and its
+        subdirectories on a background thread."""
+
+        if self._watcher is not None:
+            watched = self._watcher.directories()
+            if watched:
+                self._watcher.removePaths(watched)
+        self._changed = set()
+        self._directory = directory
+
+        self._start(directory)
+
+    def stop(self, wait: bool = False) -> None:
+        """Stops indexing. Thumbnails already generated are kept."""
+
+        self._next = None
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def verify(self) -> None:
+        """
+        Stats every image of the open dataset on a background thread and
+        sends the thumbnails of those edited in place, which neither
+        opening the dataset nor watching it notices. Listing a large
+        dataset this way is slow on network storage, so it only runs
+        when asked to.
+        """
+
+        if self._directory is not None:
+            self._start(self._directory, full=True)
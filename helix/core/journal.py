@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Saves annotation edits as they are made, in an append-only journal.
+
+'AnnotationJournal' records every edit of an 'AnnotationStore' as one
+line appended to a journal file, so saving costs as much as the edit
+rather than as much as the dataset. Lines are written and fsynced in
+batches by a background thread, so a crash loses at most the last
+fraction of a second of work. Once the journal grows large it is
+compacted: the store is saved as a snapshot and the journal lines it
+contains are dropped.
+
+Opening a journal loads the snapshot and replays the journal after it.
+Each line carries a checksum, so a line torn by a crash is ignored
+rather than corrupting the annotations. Every session appends to a
+journal segment of its own, created on its first write, and a segment is
+only deleted once a snapshot holding its edits is on disk, so a crash at
+any point loses no saved edit.
+
+Example Usage:
+    >>> journal = AnnotationJournal(AnnotationJournal.default_directory("/data/train"))
+    >>> journal.store.add_box("0001.jpg", "car", 10, 10, 120, 80)
+    >>> view.closed.connect(lambda event: journal.close())
+
+If importing all (i.e. 'from journal import *'), only
+'AnnotationJournal' will be imported as defined in the '__all__'
+attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["AnnotationJournal"]
+
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from helix.core.annotations import AnnotationStore
+from helix.utils.dictutils import _schedule_next_tick
+
+
+# Bumped when the layout of the snapshot or the journal changes
+_JOURNAL_VERSION = 1
+_SNAPSHOT = "snapshot.npz"
+_SEGMENT = "journal-{:06d}.log"
+
+
+def _encode(sequence: int, record: list) -> bytes:
+    # <crc32 of the payload, in hex> <payload>, one edit per line
+    payload = json.dumps([sequence] + record, separators=(',', ':'), ensure_ascii=False).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode(line: bytes) -> Optional[list]:
+    # Returns the [sequence, *record] of a line, or None if it is torn
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class AnnotationJournal(object):
+    """The journal and snapshot of the annotations of a dataset.
+
+    Edits must be made from a single thread, usually the GUI thread;
+    only writing the journal and the snapshots happens in the
+    background.
+
+    Args:
+        directory (:obj:`str`):
+            The directory holding the snapshot and the journal.
+        flush_interval (:obj:`float`):
+            The longest time in seconds an edit waits before it is
+            written and fsynced.
+        compact_bytes (:obj:`int`):
+            The size of the journal past which it is compacted into a
+            new snapshot.
+        cell_size (:obj:`float`):
+            The cell size of the spatial index of the store; see
+            :obj:`AnnotationStore`.
+
+    Attributes:
+        store (:obj:`AnnotationStore`):
+            The annotations, as of the last edit.
+
+    Raises:
+        OSError:
+            The directory or the snapshot cannot be read.
+        ValueError:
+            The snapshot is not one this version can read.
+    """
+
+    store: AnnotationStore
+
+    _file: Optional[BinaryIO]
+    _pending: List[bytes]
+    _rotations: List[Tuple[List[bytes], Dict[str, np.ndarray], int]]
+    _snapshots: List[Tuple[Dict[str, np.ndarray], int, int]]
+
+    def __init__(self,
+                 directory: str,
+                 flush_interval: float = 0.5,
+                 compact_bytes: int = 16 << 20,
+                 cell_size: float = 128.0) -> None:
+        super().__init__()
+
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._closed = False
+        self._compact_due = False
+        # Guards the pending lines, rotations and snapshots handed to
+        # the writer
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Serialises writing the journal file
+        self._write_lock = threading.Lock()
+
+        self._journal_bytes = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._rotations = []
+        self._sequence = 0
+        self._snapshots = []
+
+        self.store = self._load(cell_size)
+
+        # Every session appends to a segment of its own, so a torn
+        # line ends the segment it is in rather than the journal. It is
+        # only created once there is something to write
+        segments = self._segments()
+        self._segment = segments[-1][0] + 1 if segments else 1
+        self._file = None
+
+        self._thread = threading.Thread(target=self._run, name="helix-journal", daemon=True)
+        self._thread.start()
+
+        self.store.observe(self._append)
+        if self._journal_bytes > self.compact_bytes:
+            self.compact()
+
+    def __enter__(self) -> AnnotationJournal:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Internal methods
+
+    def _append(self, record: list, inverse: list) -> None:
+        # Called by the store after every edit
+        self._sequence += 1
+        line = _encode(self._sequence, record)
+
+        with self._lock:
+            self._pending.append(line)
+            self._pending_bytes += len(line)
+            if self._pending_bytes >= 1 << 16:
+                self._wake.notify()
+
+        # Copying the store would stall the edit that crossed the limit,
+        # so compacting waits for the next tick of the event loop
+        self._journal_bytes += len(line)
+        if self._journal_bytes > self.compact_bytes and not self._compact_due:
+            self._compact_due = True
+            _schedule_next_tick(self._compact_later)
+
+    def _compact_later(self) -> None:
+        self._compact_due = False
+        if not self._closed and self._journal_bytes > self.compact_bytes:
+            self.compact()
+
+    def _flush_locked(self) -> None:
+        # Caller holds the write lock. Segments are ended where the store
+        # was compacted, and their snapshots handed to the writer
+        with self._lock:
+            rotations, self._rotations = self._rotations, []
+            pending, self._pending = self._pending, []
+            self._pending_bytes = 0
+
+        for lines, arrays, sequence in rotations:
+            self._write(lines)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._segment += 1
+            with self._lock:
+                self._snapshots.append((arrays, sequence, self._segment))
+        self._write(pending)
+
+    def _load(self, cell_size: float) -> AnnotationStore:
+        # Loads the snapshot, then replays the edits made after it
+        snapshot = os.path.join(self.directory, _SNAPSHOT)
+        if os.path.exists(snapshot):
+            with np.load(snapshot, allow_pickle=False) as arrays:
+                version, sequence = arrays['journal'].tolist()
+                if version != _JOURNAL_VERSION:
+                    raise ValueError(f"unsupported annotation snapshot version: {version}")
+                store = AnnotationStore.from_arrays(dict(arrays), cell_size)
+            self._sequence = sequence
+        else:
+            store = AnnotationStore(cell_size)
+
+        for _, path in self._segments():
+            with open(path, 'rb') as file:
+                for line in file:
+                    self._journal_bytes += len(line)
+                    decoded = _decode(line)
+                    if decoded is None:
+                        break
+
+                    sequence, *record = decoded
+                    if sequence <= self._sequence:
+                        continue
+                    store.apply(record)
+                    self._sequence = sequence
+        return store
+
+    def _open_segment(self, segment: int) -> BinaryIO:
+        return open(os.path.join(self.directory, _SEGMENT.format(segment)), 'ab')
+
+    def _run(self) -> None:
+        # Runs on the writer thread
+        while True:
+            with self._lock:
+                if not self._closed and not self._rotations:
+                    self._wake.wait(self.flush_interval)
+                closed = self._closed
+
+            self.flush()
+            with self._lock:
+                snapshots, self._snapshots = self._snapshots, []
+            for arrays, sequence, segment in snapshots:
+                try:
+                    self._write_snapshot(arrays, sequence, segment)
+                except OSError:
+                    # The segments are kept, so nothing is lost; the
+                    # next compaction tries again
+                    pass
+            if closed:
+                return
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        # The (number, path) of every journal segment, oldest first
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, "journal-*.log")):
+            try:
+                segments.append((int(os.path.basename(path)[8:-4]), path))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def _write(self, lines: List[bytes]) -> None:
+        # Caller holds the write lock
+        if not lines:
+            return
+        if self._file is None:
+            self._file = self._open_segment(self._segment)
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_snapshot(self, arrays: Dict[str, np.ndarray], sequence: int, segment: int) -> None:
+        # Saves the snapshot atomically, then deletes the segments it
+        # holds every edit of
+        arrays['journal'] = np.array([_JOURNAL_VERSION, sequence], dtype=np.int64)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=".snapshot-", suffix=".npz")
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                np.savez(file, **arrays)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, os.path.join(self.directory, _SNAPSHOT))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+        for number, path in self._segments():
+            if number < segment:
+                os.unlink(path)
+
+    # Public methods
+
+    def close(self) -> None:
+        """Writes every edit and any snapshot in progress, then stops the
+        writer thread. Later edits of the store are no longer saved."""
+
+        # The store outlives the journal; its other observers keep
+        # seeing its edits
+        self.store.unobserve(self._append)
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def compact(self) -> None:
+        """
+        Saves the store as a snapshot and drops the journal before it.
+
+        The store is copied right away; the writer thread ends the
+        journal segment after the edits made so far and writes the
+        snapshot. Edits made meanwhile go to a new segment.
+        """
+
+        arrays = self.store.to_arrays()
+
+        with self._lock:
+            self._rotations.append((self._pending, arrays, self._sequence))
+            self._pending = []
+            self._pending_bytes = 0
+            self._wake.notify()
+        self._journal_bytes = 0
+
+    @staticmethod
+    def default_directory(dataset: str) -> str:
+        """
+        Returns the directory the annotations of the dataset directory
+        :term:`dataset` are kept in by default: one per dataset in
+        '$XDG_DATA_HOME/helix/annotations' (or '~/.local/share/...').
+        """
+
+        root = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+        digest = hashlib.blake2b(os.path.abspath(dataset).encode(), digest_size=16).hexdigest()
+        return os.path.join(root, 'helix', 'annotations', digest)
+
+    def flush(self) -> None:
+        """Writes and fsyncs the edits not yet on disk."""
+
+        with self._write_lock:
+            self._flush_locked()
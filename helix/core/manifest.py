@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Keeps a persistent manifest of the images of a dataset.
+
+'DatasetManifest' records the path, size, modification time, content
+hash and dimensions of every image of a dataset directory in an SQLite
+database, along with the modification time of every directory. Adding,
+removing or renaming an entry changes the modification time of its
+directory, so a refresh only lists the directories that changed and
+stats one directory per unchanged one rather than every file; on
+network storage this turns minutes into seconds.
+
+A directory's modification time only has the granularity of its file
+system (2 s on FAT, whole seconds on some network storage), so one
+modified shortly before it was listed is listed again by the next
+refresh, in case it changed within the same tick.
+
+Editing a file in place does not change its directory, so a quick
+refresh misses it; 'refresh(full=True)' stats every file, and is what
+'DatasetIndexer.verify()' runs. While the dataset is open, the indexer
+watches its directories (through inotify where available) and refreshes
+them as they change.
+
+Example Usage:
+    >>> with DatasetManifest("/data/train") as manifest:
+    ...     added, changed, removed = manifest.refresh()
+    ...     paths = manifest.paths()
+
+If importing all (i.e. 'from manifest import *'), only 'DatasetManifest'
+will be imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["DatasetManifest"]
+
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from PyQt5.QtGui import QImageReader
+
+
+# (path, size, modification time in ns, hash, width, height); the hash
+# and dimensions are None until the image is indexed
+_Entry = Tuple[str, int, int, Optional[str], Optional[int], Optional[int]]
+
+# (added, changed, removed) paths
+_Changes = Tuple[List[str], List[str], List[str]]
+
+# The coarsest modification time granularity of common file systems
+_MTIME_GRANULARITY_NS = 2 * 10 ** 9
+
+
+def _default_database(directory: str) -> str:
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    digest = hashlib.blake2b(os.path.abspath(directory).encode(), digest_size=16).hexdigest()
+    return os.path.join(root, 'helix', 'manifests', f"{digest}.db")
+
+
+class DatasetManifest(object):
+    """The manifest of the images of a dataset directory.
+
+    A connection is only usable from the thread that opened the
+    manifest.
+
+    Args:
+        directory (:obj:`str`):
+            The dataset directory; subdirectories are included.
+        path (:obj:`str`, optional):
+            The database file. Defaults to one per dataset in
+            '$XDG_CACHE_HOME/helix/manifests' (or '~/.cache/...').
+    """
+
+    def __init__(self, directory: str, path: Optional[str] = None) -> None:
+        super().__init__()
+
+        self.directory = os.path.abspath(directory)
+        self.path = path or _default_database(directory)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._formats = {bytes(extension).decode().lower() for extension in QImageReader.supportedImageFormats()}
+
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS directories (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                directory TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT,
+                width INTEGER,
+                height INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+            """
+        )
+
+    def __enter__(self) -> DatasetManifest:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    # Internal methods
+
+    def _forget_directory(self, directory: str, removed: List[str]) -> None:
+        # Drops a deleted directory and everything below it
+        pattern = directory.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + os.sep + '%'
+        removed.extend(
+            path for path, in self._connection.execute(
+                "SELECT path FROM files WHERE directory = ? OR directory LIKE ? ESCAPE '\\'",
+                (directory, pattern)
+            )
+        )
+        self._connection.execute(
+            "DELETE FROM files WHERE directory = ? OR directory LIKE ? ESCAPE '\\'",
+            (directory, pattern)
+        )
+        self._connection.execute(
+            "DELETE FROM directories WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+            (directory, pattern)
+        )
+
+    def _list_directory(self, directory: str, changes: _Changes) -> List[str]:
+        # Lists a directory and records its images; returns its
+        # subdirectories
+        added, changed, removed = changes
+        known = {
+            path: (size, mtime_ns) for path, size, mtime_ns in self._connection.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE directory = ?",
+                (directory,)
+            )
+        }
+
+        subdirectories = []
+        updates = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                    continue
+                if os.path.splitext(entry.name)[1][1:].lower() not in self._formats:
+                    continue
+
+                info = entry.stat()
+                previous = known.pop(entry.path, None)
+                if previous == (info.st_size, info.st_mtime_ns):
+                    continue
+                (added if previous is None else changed).append(entry.path)
+                updates.append((entry.path, directory, info.st_size, info.st_mtime_ns))
+
+        # The hash and dimensions of changed images are stale
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO files (path, directory, size, mtime_ns) VALUES (?, ?, ?, ?)",
+            updates
+        )
+        removed.extend(known)
+        self._connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in known])
+
+        for subdirectory in self._subdirectories(directory).difference(subdirectories):
+            self._forget_directory(subdirectory, removed)
+        return subdirectories
+
+    def _subdirectories(self, directory: str) -> Set[str]:
+        return {
+            path for path, in self._connection.execute(
+                "SELECT path FROM directories WHERE parent = ?",
+                (directory,)
+            )
+        }
+
+    # Public methods
+
+    def close(self) -> None:
+        """Commits pending writes and closes the manifest."""
+
+        self._connection.commit()
+        self._connection.close()
+
+    def entries(self) -> List[_Entry]:
+        """Returns the entries of every image, sorted by path."""
+
+        return self._connection.execute(
+            "SELECT path, size, mtime_ns, hash, width, height FROM files ORDER BY path"
+        ).fetchall()
+
+    def entry(self, path: str) -> Optional[_Entry]:
+        """Returns the entry of the image at :term:`path`, or None."""
+
+        return self._connection.execute(
+            "SELECT path, size, mtime_ns, hash, width, height FROM files WHERE path = ?",
+            (path,)
+        ).fetchone()
+
+    def paths(self) -> List[str]:
+        """Returns the path of every image, sorted."""
+
+        return [path for path, in self._connection.execute("SELECT path FROM files ORDER BY path")]
+
+    def record(self, indexed: Iterable[Tuple[str, int, int, str, int, int]]) -> None:
+        """
+        Records the hash and dimensions of indexed images, given as
+        (path, size, modification time in ns, hash, width, height).
+
+        Images that changed again since they were indexed are skipped,
+        so they are indexed again.
+        """
+
+        self._connection.executemany(
+            "UPDATE files SET hash = ?, width = ?, height = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+            [(digest, width, height, path, size, mtime_ns) for path, size, mtime_ns, digest, width, height in indexed]
+        )
+        self._connection.commit()
+
+    def refresh(self, full: bool = False, directories: Optional[Iterable[str]] = None) -> _Changes:
+        """
+        Brings the manifest up to date with the dataset directory.
+
+        Args:
+            full (:obj:`bool`):
+                Whether to list every directory and stat every image,
+                rather than only the directories whose modification time
+                changed. Only a full refresh notices images edited in
+                place.
+            directories (:obj:`Iterable`, optional):
+                The directories known to have changed, e.g. from a file
+                system watcher. Only these are listed (not their
+                subdirectories, unless they are new).
+
+        Returns:
+            tuple:
+                The sorted paths of the images added, changed and
+                removed.
+        """
+
+        changes: _Changes = ([], [], [])
+        recorded = dict(self._connection.execute("SELECT path, mtime_ns FROM directories"))
+
+        if directories is None:
+            stack = [self.directory]
+            recurse = True
+        else:
+            stack = [os.path.abspath(directory) for directory in directories]
+            recurse = False
+
+        while stack:
+            directory = stack.pop()
+            listed_ns = time.time_ns()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                if directory in recorded:
+                    self._forget_directory(directory, changes[2])
+                continue
+
+            if full or recorded.get(directory) != mtime_ns:
+                try:
+                    subdirectories = self._list_directory(directory, changes)
+                except OSError:
+                    continue
+                parent = os.path.dirname(directory) if directory != self.directory else None
+                # Changes within the same tick as the listing keep the
+                # same time, so a recent one is recorded as older than it
+                # is and the directory is listed again
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                    (directory, parent, min(mtime_ns, listed_ns - _MTIME_GRANULARITY_NS))
+                )
+            else:
+                subdirectories = self._subdirectories(directory)
+
+            stack.extend(
+                subdirectory for subdirectory in subdirectories
+                if recurse or subdirectory not in recorded
+            )
+
+        self._connection.commit()
+        for paths in changes:
+            paths.sort()
+        return changes
+
+    def subdirectories(self) -> List[str]:
+        """Returns every directory of the dataset, including its root."""
+
+        return [path for path, in self._connection.execute("SELECT path FROM directories ORDER BY path")]
@@ -0,0 +1,513 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Splits very large images into a cached multi-resolution pyramid.
+
+'TilePyramid' cuts an image into square tiles at full resolution
+(level 0) and at every power-of-two reduction (levels 1, 2, ...) until
+the image fits in a single tile. Tiles are stored on disk, keyed on the
+image's path, size and modification time, so an image is only tiled
+once. Level 0 is read in bands of whole tile rows, as many as fit in a
+pixel budget, and every other level is built from the level below it, so
+building takes the memory of one band rather than of the whole image.
+TIFFs are read strip by strip (or tile by tile) through libtiff. Other
+formats whose codec cannot decode part of an image (e.g. PNG and BMP)
+are decoded whole instead, which is refused above the pixel budget.
+
+Example Usage:
+    >>> pyramid = TilePyramid("/data/slide.tif")
+    >>> if not pyramid.is_built():
+    ...     pyramid.build()
+    >>> level = pyramid.level_for_scale(0.1)
+    >>> pyramid.tile_path(level, 0, 0)
+
+If importing all (i.e. 'from tiles import *'), only 'TilePyramid' will
+be imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["TilePyramid"]
+
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from PyQt5.QtCore import QByteArray, QPoint, QRect, Qt
+from PyQt5.QtGui import QImage, QImageIOHandler, QImageReader, QPainter
+
+
+# Bumped when the layout of the cache changes
+_PYRAMID_VERSION = 1
+_MANIFEST = "pyramid.json"
+
+
+# TIFF tags read through libtiff
+_TIFFTAG_IMAGEWIDTH = 256
+_TIFFTAG_IMAGELENGTH = 257
+_TIFFTAG_ROWSPERSTRIP = 278
+_TIFFTAG_TILEWIDTH = 322
+_TIFFTAG_TILELENGTH = 323
+
+_libtiff_handle: Optional[ctypes.CDLL] = None
+_libtiff_loaded = False
+
+
+def _default_cache_dir() -> str:
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'helix', 'tiles')
+
+
+def _libtiff() -> Optional[ctypes.CDLL]:
+    # Loads libtiff once, or returns None if it is not installed
+    global _libtiff_handle, _libtiff_loaded
+
+    if _libtiff_loaded:
+        return _libtiff_handle
+    _libtiff_loaded = True
+
+    name = ctypes.util.find_library('tiff') or ctypes.util.find_library('libtiff')
+    if name is None:
+        return None
+    try:
+        lib = ctypes.CDLL(name)
+    except OSError:
+        return None
+
+    lib.TIFFOpen.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+    lib.TIFFOpen.restype = ctypes.c_void_p
+    lib.TIFFClose.argtypes = [ctypes.c_void_p]
+    lib.TIFFClose.restype = None
+    lib.TIFFIsTiled.argtypes = [ctypes.c_void_p]
+    lib.TIFFReadRGBAStrip.argtypes = [ctypes.c_void_p, ctypes.c_uint32, ctypes.c_void_p]
+    lib.TIFFReadRGBATile.argtypes = [ctypes.c_void_p, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_void_p]
+    # Unknown tags and the like would otherwise be printed to stderr
+    lib.TIFFSetWarningHandler.argtypes = [ctypes.c_void_p]
+    lib.TIFFSetWarningHandler(None)
+
+    _libtiff_handle = lib
+    return lib
+
+
+class _TiffReader(object):
+    # Decodes bands of rows of a TIFF through libtiff, one strip (or one
+    # row of tiles) at a time, as RGBA. libtiff returns each strip or
+    # tile bottom-up, so rows are flipped while copied into the band.
+
+    def __init__(self, lib: ctypes.CDLL, path: str, max_pixels: int) -> None:
+        self._lib = lib
+        self.path = path
+        self._tiff = lib.TIFFOpen(os.fsencode(path), b'r')
+        if not self._tiff:
+            raise OSError(f"cannot decode '{path}': libtiff cannot open it")
+
+        try:
+            self.width = self._field(_TIFFTAG_IMAGEWIDTH)
+            self.height = self._field(_TIFFTAG_IMAGELENGTH)
+            self._tiled = bool(lib.TIFFIsTiled(self._tiff))
+            if self._tiled:
+                self._chunk_width = self._field(_TIFFTAG_TILEWIDTH)
+                self._chunk_height = self._field(_TIFFTAG_TILELENGTH)
+            else:
+                self._chunk_width = self.width
+                self._chunk_height = min(self._field(_TIFFTAG_ROWSPERSTRIP, defaulted=True), self.height)
+            # libtiff decodes a whole strip or tile at once, and a TIFF
+            # written as a single strip is a single chunk
+            if self._chunk_width * self._chunk_height > max_pixels:
+                raise OSError(
+                    f"cannot tile '{path}': its {self._chunk_width}x{self._chunk_height} "
+                    f"strips or tiles exceed {max_pixels} pixels"
+                )
+        except OSError:
+            self.close()
+            raise
+        self._raster = (ctypes.c_uint32 * (self._chunk_width * self._chunk_height))()
+
+        # The last chunk row decoded, as chunks straddle bands
+        self._cached_top = -1
+        self._cached = bytearray()
+
+    def _chunk_row(self, top: int) -> bytearray:
+        # Returns rows 'top' to the end of their chunk, top-down, as
+        # tightly packed RGBA
+        if top == self._cached_top:
+            return self._cached
+
+        rows = min(self._chunk_height, self.height - top)
+        stride = 4 * self.width
+        chunk = bytearray(stride * rows)
+        raster = memoryview(self._raster).cast('B')
+        pitch = 4 * self._chunk_width
+
+        for left in range(0, self.width, self._chunk_width):
+            if self._tiled:
+                ok = self._lib.TIFFReadRGBATile(self._tiff, left, top, self._raster)
+                # Tiles are padded to their full height
+                bottom = self._chunk_height
+            else:
+                ok = self._lib.TIFFReadRGBAStrip(self._tiff, top, self._raster)
+                bottom = rows
+            if not ok:
+                raise OSError(f"cannot decode '{self.path}': libtiff failed at row {top}")
+
+            width = 4 * min(self._chunk_width, self.width - left)
+            for row in range(rows):
+                source = (bottom - 1 - row) * pitch
+                target = row * stride + 4 * left
+                chunk[target:target + width] = raster[source:source + width]
+
+        self._cached_top, self._cached = top, chunk
+        return chunk
+
+    def _field(self, tag: int, defaulted: bool = False) -> int:
+        value = ctypes.c_uint32()
+        get = self._lib.TIFFGetFieldDefaulted if defaulted else self._lib.TIFFGetField
+        if not get(ctypes.c_void_p(self._tiff), ctypes.c_uint32(tag), ctypes.byref(value)):
+            raise OSError(f"cannot decode '{self.path}': TIFF tag {tag} is missing")
+        return value.value
+
+    def close(self) -> None:
+        if self._tiff:
+            self._lib.TIFFClose(self._tiff)
+            self._tiff = None
+
+    def read(self, top: int, height: int) -> QImage:
+        band = QImage(self.width, height, QImage.Format_RGBA8888)
+        bits = band.bits()
+        bits.setsize(band.sizeInBytes())
+        view = memoryview(bits)
+        stride = 4 * self.width
+
+        # QImage rows are 32-bit aligned, as are RGBA rows, so the band
+        # is as tightly packed as the chunks
+        row = top
+        while row < top + height:
+            first = row - row % self._chunk_height
+            chunk = self._chunk_row(first)
+            start = row - first
+            end = min(len(chunk) // stride, top + height - first)
+            view[(row - top) * stride:(first + end - top) * stride] = chunk[start * stride:end * stride]
+            row = first + end
+        return band
+
+
+class TilePyramid(object):
+    """The tile pyramid of an image, cached on disk.
+
+    Args:
+        path (:obj:`str`):
+            The path of the image.
+        cache_dir (:obj:`str`, optional):
+            The directory pyramids are stored in. Defaults to
+            '$XDG_CACHE_HOME/helix/tiles' (or '~/.cache/...').
+        tile_size (:obj:`int`):
+            The width and height of a tile in pixels.
+        format (:obj:`str`):
+            The format tiles are saved in, e.g. 'png' (lossless) or
+            'jpg' (smaller and faster to decode).
+        max_pixels (:obj:`int`):
+            The number of pixels decoded at once, in bands of whole tile
+            rows (4 bytes per pixel). An image whose codec cannot decode
+            part of it is refused above it, as it is then held in memory
+            whole. Default is 2^27, i.e. 512 MiB.
+
+    Raises:
+        OSError:
+            The image cannot be accessed.
+    """
+
+    def __init__(self,
+                 path: str,
+                 cache_dir: Optional[str] = None,
+                 tile_size: int = 256,
+                 format: str = 'png',
+                 max_pixels: int = 1 << 27) -> None:
+        super().__init__()
+
+        self.path = path
+        self.tile_size = tile_size
+        self.format = format
+        self.max_pixels = max_pixels
+
+        info = os.stat(path)
+        digest = hashlib.blake2b(
+            f"{os.path.abspath(path)}\0{info.st_size}\0{info.st_mtime_ns}\0"
+            f"{tile_size}\0{format}\0{_PYRAMID_VERSION}".encode(),
+            digest_size=16
+        )
+        self.directory = os.path.join(cache_dir or _default_cache_dir(), digest.hexdigest())
+
+        self.width = 0
+        self.height = 0
+        self.levels = 0
+        self._load_manifest()
+
+    # Internal methods
+
+    def _build_level(self, directory: str, level: int) -> None:
+        # Halves 2x2 blocks of tiles of the level below
+        size = self.tile_size
+        columns, rows = self.tile_grid(level)
+
+        for row in range(rows):
+            for column in range(columns):
+                block = QImage(2 * size, 2 * size, QImage.Format_ARGB32_Premultiplied)
+                block.fill(Qt.transparent)
+                width = height = 0
+
+                painter = QPainter(block)
+                for dy in (0, 1):
+                    for dx in (0, 1):
+                        child = QImage(self._tile_file(directory, level - 1, 2 * column + dx, 2 * row + dy))
+                        if child.isNull():
+                            continue
+                        painter.drawImage(QPoint(dx * size, dy * size), child)
+                        width = max(width, dx * size + child.width())
+                        height = max(height, dy * size + child.height())
+                painter.end()
+
+                tile = block.copy(0, 0, width, height).scaled(
+                    max(1, math.ceil(width / 2)),
+                    max(1, math.ceil(height / 2)),
+                    Qt.IgnoreAspectRatio,
+                    Qt.SmoothTransformation
+                )
+                self._save_tile(tile, directory, level, column, row)
+
+    def _band_reader(self) -> Tuple[Callable[[int, int], QImage], Callable[[], None], int]:
+        # Returns a function decoding 'height' rows from 'top', one
+        # releasing the decoder, and the number of tile rows per band
+        size = self.tile_size
+        rows = self.tile_grid(0)[1]
+        band = max(1, min(rows, self.max_pixels // (self.width * size)))
+
+        reader = QImageReader(self.path)
+        if reader.supportsOption(QImageIOHandler.ClipRect):
+            return (lambda top, height: self._read(reader, QRect(0, top, self.width, height))), (lambda: None), band
+
+        lib = _libtiff()
+        if lib is not None and reader.format() == QByteArray(b'tiff'):
+            tiff = _TiffReader(lib, self.path, self.max_pixels)
+            return tiff.read, tiff.close, band
+
+        if self.width * self.height > self.max_pixels:
+            raise OSError(
+                f"cannot tile '{self.path}': its format must be decoded whole and "
+                f"{self.width}x{self.height} exceeds {self.max_pixels} pixels"
+            )
+        image = self._read(reader)
+        return (lambda top, height: image.copy(0, top, self.width, height)), (lambda: None), rows
+
+    def _cut_base(self, directory: str, progress: Callable[[float], None], total: int) -> int:
+        # Cuts level 0 from bands of whole tile rows
+        size = self.tile_size
+        columns, rows = self.tile_grid(0)
+        done = 0
+
+        read, close, band = self._band_reader()
+        try:
+            for first in range(0, rows, band):
+                top = first * size
+                image = read(top, min(band * size, self.height - top))
+
+                for row in range(first, min(rows, first + band)):
+                    height = min(size, self.height - row * size)
+                    for column in range(columns):
+                        width = min(size, self.width - column * size)
+                        tile = image.copy(column * size, row * size - top, width, height)
+                        self._save_tile(tile, directory, 0, column, row)
+
+                    done += columns
+                    progress(done / total)
+        finally:
+            close()
+        return done
+
+    def _load_manifest(self) -> None:
+        try:
+            with open(os.path.join(self.directory, _MANIFEST)) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return
+        if manifest.get('version') == _PYRAMID_VERSION:
+            self.width = manifest['width']
+            self.height = manifest['height']
+            self.levels = manifest['levels']
+
+    def _read(self, reader: QImageReader, clip: Optional[QRect] = None) -> QImage:
+        # A reader's device only decodes once, so it is reopened for
+        # each band
+        reader.setFileName(self.path)
+        reader.setAutoTransform(False)
+        if clip is not None:
+            reader.setClipRect(clip)
+
+        image = reader.read()
+        if image.isNull():
+            raise OSError(f"cannot decode '{self.path}': {reader.errorString()}")
+        return image
+
+    def _save_tile(self, tile: QImage, directory: str, level: int, column: int, row: int) -> None:
+        path = self._tile_file(directory, level, column, row)
+        if not tile.save(path, self.format):
+            raise OSError(f"cannot write tile '{path}'")
+
+    def _tile_file(self, directory: str, level: int, column: int, row: int) -> str:
+        return os.path.join(directory, str(level), f"{column}_{row}.{self.format}")
+
+    # Public methods
+
+    def build(self, progress: Optional[Callable[[float], None]] = None) -> None:
+        """
+        Builds the pyramid unless it is already cached.
+
+        The pyramid is built in a temporary directory and moved into
+        place once complete, so an interrupted build is never used and
+        concurrent builds of the same image do not interfere.
+
+        Args:
+            progress (:obj:`Callable`, optional):
+                Called with the fraction of tiles built, from 0 to 1.
+
+        Raises:
+            OSError:
+                The image cannot be decoded, must be decoded whole and is
+                larger than :attr:`max_pixels`, or a tile cannot be
+                written.
+        """
+
+        if self.is_built():
+            return
+        progress = progress or (lambda fraction: None)
+
+        reader = QImageReader(self.path)
+        size = reader.size()
+        if not size.isValid():
+            size = self._read(reader).size()
+        self.width, self.height = size.width(), size.height()
+        self.levels = 1 + max(0, math.ceil(math.log2(max(self.width, self.height) / self.tile_size)))
+
+        parent = os.path.dirname(self.directory)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix=".building-")
+        try:
+            for level in range(self.levels):
+                os.mkdir(os.path.join(staging, str(level)))
+
+            total = sum(columns * rows for columns, rows in map(self.tile_grid, range(self.levels)))
+            done = self._cut_base(staging, progress, total)
+            for level in range(1, self.levels):
+                self._build_level(staging, level)
+                columns, rows = self.tile_grid(level)
+                done += columns * rows
+                progress(done / total)
+
+            with open(os.path.join(staging, _MANIFEST), 'w') as file:
+                json.dump(
+                    {
+                        'version': _PYRAMID_VERSION,
+                        'width': self.width,
+                        'height': self.height,
+                        'levels': self.levels
+                    },
+                    file
+                )
+
+            try:
+                os.rename(staging, self.directory)
+            except OSError:
+                # Built concurrently by someone else; theirs is as good
+                if not os.path.exists(os.path.join(self.directory, _MANIFEST)):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def is_built(self) -> bool:
+        """Whether the pyramid is cached on disk."""
+
+        return self.levels > 0
+
+    def level_for_scale(self, scale: float) -> int:
+        """
+        Returns the coarsest level that still has at least one pixel per
+        screen pixel when the image is drawn at :term:`scale` (screen
+        pixels per image pixel).
+        """
+
+        if scale >= 1:
+            return 0
+        return min(self.levels - 1, int(math.floor(math.log2(1 / scale))))
+
+    def level_size(self, level: int) -> Tuple[int, int]:
+        """Returns the width and height of the image at :term:`level`."""
+
+        factor = 1 << level
+        return max(1, math.ceil(self.width / factor)), max(1, math.ceil(self.height / factor))
+
+    def tile_grid(self, level: int) -> Tuple[int, int]:
+        """Returns the number of tile columns and rows at
+        :term:`level`."""
+
+        width, height = self.level_size(level)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def tile_path(self, level: int, column: int, row: int) -> str:
+        """Returns the path of a tile of the built pyramid."""
+
+        return self._tile_file(self.directory, level, column, row)
+
+    def visible_tiles(self,
+                      level: int,
+                      left: float,
+                      top: float,
+                      right: float,
+                      bottom: float) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the (column, row) of every tile of :term:`level` that
+        overlaps the given rectangle, in full resolution image pixels.
+        Tiles near the centre of the rectangle come first.
+        """
+
+        scale = self.tile_size << level
+        columns, rows = self.tile_grid(level)
+
+        first_column, last_column = max(0, int(left // scale)), min(columns - 1, int(right // scale))
+        first_row, last_row = max(0, int(top // scale)), min(rows - 1, int(bottom // scale))
+
+        centre_column = (first_column + last_column) / 2
+        centre_row = (first_row + last_row) / 2
+        tiles: List[Tuple[int, int]] = [
+            (column, row)
+            for row in range(first_row, last_row + 1)
+            for column in range(first_column, last_column + 1)
+        ]
+        tiles.sort(key=lambda tile: abs(tile[0] - centre_column) + abs(tile[1] - centre_row))
+        return iter(tiles)
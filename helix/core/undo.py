@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Undoes and redoes the edits of an annotation store.
+
+'UndoStack' observes an 'AnnotationStore' and keeps, for each command,
+only the records undoing its edits (e.g. the old box of a resized one),
+never a copy of the annotations. Bursts of small edits of the same
+annotations, such as the hundreds of moves of a drag, are merged into
+one command whose inverse is a single record. The history is bounded by
+the approximate memory its records take rather than by a number of
+steps, dropping the oldest commands first.
+
+Example Usage:
+    >>> undo_stack = UndoStack(journal.store)
+    >>> with undo_stack.group("Paste"):
+    ...     for box in clipboard:
+    ...         journal.store.add_box(*box)
+    >>> undo_stack.undo()
+    >>> undo_stack.redo()
+
+If importing all (i.e. 'from undo import *'), only 'UndoStack' will be
+imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["UndoStack"]
+
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Iterator, List, Optional
+
+from helix.core.annotations import AnnotationStore
+
+
+# The name of a command, from its first edit
+_NAMES = {
+    "add": "Add",
+    "box": "Resize",
+    "label": "Relabel",
+    "move": "Move",
+    "polygon": "Reshape",
+    "remove": "Delete",
+    "restore": "Restore",
+}
+
+
+def _record_bytes(record: Any) -> int:
+    # A rough size of a record, counting what Python allocates for it
+    if isinstance(record, list):
+        return 56 + 8 * len(record) + sum(map(_record_bytes, record))
+    if isinstance(record, str):
+        return 49 + len(record)
+    return 24
+
+
+class _Command(object):
+    """The inverse records of the edits of one command, undone last to
+    first."""
+
+    __slots__ = ('name', 'records', 'size', 'time')
+
+    records: List[list]
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.records = []
+        self.size = 64
+        self.time = time.monotonic()
+
+    def add(self, inverse: list) -> None:
+        self.records.append(inverse)
+        self.size += _record_bytes(inverse)
+
+    def merge(self, inverse: list) -> bool:
+        # Merges an inverse into the last one if they undo edits of the
+        # same annotations; the combined record undoes both
+        if not self.records:
+            return False
+        last = self.records[-1]
+        if last[0] != inverse[0] or last[1] != inverse[1]:
+            return False
+
+        if inverse[0] == "move":
+            self.records[-1] = ["move", last[1], last[2] + inverse[2], last[3] + inverse[3]]
+            return True
+        # Undoing the older edit restores the older state
+        return inverse[0] in ("box", "label", "polygon")
+
+
+class UndoStack(object):
+    """The undo and redo history of an :obj:`AnnotationStore`.
+
+    Args:
+        store (:obj:`AnnotationStore`):
+            The store whose edits are recorded.
+        max_bytes (:obj:`int`):
+            The approximate memory the history may take. Default is
+            64 MiB.
+        merge_interval (:obj:`float`):
+            The longest time in seconds between two edits of the same
+            annotations for them to merge into one command.
+
+    Raises:
+        RuntimeError:
+            A command is undone or redone within a :meth:`group`.
+        ValueError:
+            An argument is of a legal type but is an illegal value.
+    """
+
+    _redo: List[_Command]
+    _undo: Deque[_Command]
+
+    def __init__(self, store: AnnotationStore, max_bytes: int = 64 << 20, merge_interval: float = 0.5) -> None:
+        super().__init__()
+
+        if max_bytes <= 0:
+            raise ValueError(f"argument 'max_bytes' must be positive: {max_bytes}")
+
+        self.store = store
+        self.max_bytes = max_bytes
+        self.merge_interval = merge_interval
+        self.current_bytes = 0
+
+        # Set while a group is open or a command is undone or redone
+        self._group: Optional[_Command] = None
+        self._depth = 0
+        self._replaying: Optional[_Command] = None
+
+        self._redo = []
+        self._undo = deque()
+
+        store.observe(self._on_edit)
+
+    # Internal methods
+
+    def _check_idle(self) -> None:
+        if self._group is not None:
+            raise RuntimeError("cannot undo or redo within a group")
+
+    def _on_edit(self, record: list, inverse: list) -> None:
+        if self._replaying is not None:
+            self._replaying.add(inverse)
+            return
+
+        if self._redo:
+            self.current_bytes -= sum(command.size for command in self._redo)
+            self._redo = []
+
+        now = time.monotonic()
+        command = self._group
+        if command is None:
+            last = self._undo[-1] if self._undo else None
+            if last is not None and now - last.time <= self.merge_interval and last.merge(inverse):
+                last.time = now
+                return
+            command = _Command(_NAMES.get(record[0], record[0]))
+            self._push(command)
+        elif command.merge(inverse):
+            return
+
+        before = command.size
+        command.add(inverse)
+        command.time = now
+        self.current_bytes += command.size - before
+        self._trim()
+
+    def _push(self, command: _Command) -> None:
+        self._undo.append(command)
+        self.current_bytes += command.size
+
+    def _replay(self, command: _Command) -> _Command:
+        # Applies the records of a command, last to first, and returns
+        # the command undoing that
+        replayed = _Command(command.name)
+        self._replaying = replayed
+        try:
+            for record in reversed(command.records):
+                self.store.apply(record)
+        except BaseException:
+            # Puts back the records already applied, so the command is
+            # kept whole; the rollback itself is not recorded
+            self._replaying = _Command(command.name)
+            for record in reversed(replayed.records):
+                self.store.apply(record)
+            raise
+        finally:
+            self._replaying = None
+        return replayed
+
+    def _seal(self) -> None:
+        # Stops the last command from merging later edits
+        if self._undo:
+            self._undo[-1].time = float('-inf')
+
+    def _trim(self) -> None:
+        # Drops the oldest commands, then the redo commands furthest
+        # from the present, until the history fits; the next command to
+        # undo and the next to redo are always kept
+        while self.current_bytes > self.max_bytes and len(self._undo) > 1:
+            self.current_bytes -= self._undo.popleft().size
+        while self.current_bytes > self.max_bytes and len(self._redo) > 1:
+            self.current_bytes -= self._redo.pop(0).size
+
+    # Public methods
+
+    def can_redo(self) -> bool:
+        """Whether there is a command to redo."""
+
+        return bool(self._redo)
+
+    def can_undo(self) -> bool:
+        """Whether there is a command to undo."""
+
+        return bool(self._undo)
+
+    def close(self) -> None:
+        """Stops recording the edits of the store and forgets the
+        history."""
+
+        self.store.unobserve(self._on_edit)
+        self.clear()
+
+    def clear(self) -> None:
+        """Forgets the whole history."""
+
+        self._redo = []
+        self._undo.clear()
+        self.current_bytes = 0
+
+    @contextmanager
+    def group(self, name: str) -> Iterator[None]:
+        """Makes every edit within the block a single command named
+        :term:`name`. Groups may nest; the outermost one counts."""
+
+        if self._depth == 0:
+            self._group = _Command(name)
+            self._push(self._group)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                group, self._group = self._group, None
+                if group.records:
+                    self._seal()
+                else:
+                    self._undo.remove(group)
+                    self.current_bytes -= group.size
+
+    def redo(self) -> bool:
+        """Redoes the last command undone. Returns whether there was
+        one."""
+
+        self._check_idle()
+        if not self._redo:
+            return False
+
+        command = self._redo[-1]
+        replayed = self._replay(command)
+        # Popped only once replayed, so a command that fails to apply
+        # stays in the history
+        self._redo.pop()
+        self.current_bytes -= command.size
+        self._push(replayed)
+        self._seal()
+        self._trim()
+        return True
+
+    def redo_text(self) -> str:
+        """The name of the command :meth:`redo` would redo, or ''."""
+
+        return self._redo[-1].name if self._redo else ''
+
+    def undo(self) -> bool:
+        """Undoes the last command. Returns whether there was one."""
+
+        self._check_idle()
+        if not self._undo:
+            return False
+
+        command = self._undo[-1]
+        redo = self._replay(command)
+        # Popped only once replayed, so a command that fails to apply
+        # stays in the history
+        self._undo.pop()
+        self.current_bytes -= command.size
+        self._redo.append(redo)
+        self.current_bytes += redo.size
+        self._seal()
+        self._trim()
+        return True
+
+    def undo_text(self) -> str:
+        """The name of the command :meth:`undo` would undo, or ''."""
+
+        return self._undo[-1].name if self._undo else ''
@@ -25,9 +25,15 @@ drgrib's GitHub: https://github.com/drgrib/dotmap
 
 'Maps' is the coversion class that converts dictionaries. It also has a
 'parse_ini' function to parse and convert the configparser object to a
-dictionary or Maps object.
-
-Importing everything from this module will only import the Maps class
+dictionary or Maps object. 'FrozenMaps' is an immutable, slotted
+counterpart of 'Maps' for read-heavy code paths, and 'LayeredMaps'
+overlays a stack of Maps objects without copying them. 'ChangeTracker'
+reports which dotted paths of a Maps tree were modified, and 'MapsPath'
+is a dotted path compiled once for repeated lookups. 'SharedMaps' is a
+read-only copy of a Maps tree in shared memory for worker processes.
+
+Importing everything from this module will only import the Maps,
+FrozenMaps, LayeredMaps, ChangeTracker, MapsPath and SharedMaps classes
 (as defined by the '__all__' attribute).
 """
 
@@ -38,17 +44,484 @@ from __future__ import division
 from __future__ import print_function
 
 
-__all__ = ["Maps"]
+__all__ = ["ChangeTracker", "FrozenMaps", "LayeredMaps", "Maps", "MapsPath", "SharedMaps"]
 
 
 import ast
+import asyncio
+import functools
+import hashlib
 import os
+import pickle
 import re
+import struct
+import tempfile
+import threading
 from collections import OrderedDict
-from collections.abc import MutableMapping
-from configparser import ConfigParser
+from collections.abc import Mapping, MutableMapping
+from contextlib import ExitStack, contextmanager
+from configparser import DEFAULTSECT, ConfigParser, DuplicateSectionError
+from copy import deepcopy
 from inspect import ismethod
-from typing import Any, Callable, Generator, Iterable, Iterator, NoReturn, Optional, Tuple, Union
+from keyword import iskeyword
+from multiprocessing import shared_memory
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    NoReturn,
+    Optional,
+    Tuple,
+    Union
+)
+
+
+# Key sanitization
+_INVALID_KEY_CHARS = re.compile('[^0-9a-zA-Z]+')
+_KEY_CACHE_SIZE = 65536
+_key_cache: Dict[str, str] = {}
+
+# Value coercion
+_INT_LITERAL = re.compile('[+-]?(?:0+|[1-9][0-9]*)')
+_FLOAT_LITERAL = re.compile(
+    r'[+-]?(?:(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[0-9]+[eE][+-]?[0-9]+)'
+)
+_STRING_PREFIX = re.compile('[bBrRuU]{1,2}[\'"]')
+_LITERAL_STARTS = frozenset('0123456789.+-([{\'"')
+_KEYWORD_LITERALS = {"true": True, "false": False}
+
+# Environment interpolation, i.e. '&VAR&' or '&VAR:default&'
+_ENV_REFERENCE = re.compile(r'&([^&:\s]+)(?::([^&]*))?&')
+_MISSING_ENV_POLICIES = ('leave', 'empty', 'error')
+
+# INI snapshots
+_INI_CACHE_VERSION = 2
+_SNAPSHOT_ERRORS = (
+    AttributeError,
+    EOFError,
+    ImportError,
+    IndexError,
+    KeyError,
+    OSError,
+    TypeError,
+    ValueError,
+    pickle.UnpicklingError
+)
+
+# Marks a key missing from a layer
+_MISSING = object()
+
+# Attributes of a LayeredMaps object rather than keys of its layers
+_LAYERED_ATTRS = frozenset(('_layers', '_parent', '_key'))
+
+# Generated FrozenMaps layouts; past this, new keysets share one layout
+_FROZEN_LAYOUTS_SIZE = 1024
+
+# Path segments that also look up an integer key, e.g. '0' or '-1'
+_PATH_INDEX = re.compile('-?[0-9]+')
+
+# Shared memory blocks, attached once per process
+_SHARED_HEADER = struct.Struct('<4sIQ')
+_SHARED_MAGIC = b'HXMP'
+_SHARED_VERSION = 1
+_shared_blocks: Dict[str, _SharedBlock] = {}
+
+# Attributes stored on the instance rather than in the mapping
+_INTERNAL_ATTRS = frozenset(
+    (
+        '_map',
+        '_dynamic',
+        '_lazy',
+        '_pending',
+        '_tracked',
+        '_watchers',
+        "_ipython_canary_method_should_not_exist_"
+    )
+)
+
+
+def _sanitize_key(key: str) -> str:
+    """Replaces every run of non-alphanumeric characters in 'key' with
+    a single underscore, memoizing the result."""
+
+    clean = _key_cache.get(key)
+    if clean is None:
+        clean = _INVALID_KEY_CHARS.sub('_', key)
+        if len(_key_cache) >= _KEY_CACHE_SIZE:
+            _key_cache.clear()
+        _key_cache[key] = clean
+    return clean
+
+
+def _default_cache_dir() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'helix', 'ini')
+
+
+def _file_digest(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def _write_ini_snapshot(snapshot: str, header: dict, ini_dict: dict) -> None:
+    # Written to a temporary file first so readers never see a partial
+    # snapshot; failing to write only costs the next launch a re-parse
+    try:
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(snapshot), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(ini_dict, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, snapshot)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except (OSError, pickle.PicklingError):
+        pass
+
+
+def _interpolate_env(value: str, missing_env: str = 'leave') -> str:
+    """Substitutes every '&VAR&' or '&VAR:default&' reference in 'value'
+    with the environment variable's value in a single pass.
+
+    A missing variable without a default is left untouched, replaced
+    with an empty string or raises a :obj:`KeyError`, depending on
+    'missing_env'.
+    """
+
+    if '&' not in value:
+        return value
+
+    environ = os.environ
+
+    def substitute(match: re.Match) -> str:
+        name, default = match.group(1, 2)
+        replacement = environ.get(name)
+        if replacement is not None:
+            return replacement
+        if default is not None:
+            return default
+        if missing_env == 'leave':
+            return match.group(0)
+        if missing_env == 'empty':
+            return ''
+        raise KeyError(f"environment variable '{name}' is not set")
+
+    return _ENV_REFERENCE.sub(substitute, value)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _split_path(path: str) -> List[str]:
+    # Splits a dotted path at every '.' not escaped with a '\'
+    if '\\' not in path:
+        return path.split('.')
+
+    segments = []
+    segment = []
+    characters = iter(path)
+    for character in characters:
+        if character == '\\':
+            character = next(characters, character)
+        elif character == '.':
+            segments.append(''.join(segment))
+            segment = []
+            continue
+        segment.append(character)
+    segments.append(''.join(segment))
+    return segments
+
+
+def _rebuild_tree(root: Any,
+                  node_type: Union[type, Tuple[type, ...]],
+                  new_node: Callable[[Any], Tuple[Any, MutableMapping, Iterable]],
+                  convert_value: Callable[[Any], Any],
+                  memo: Dict[int, Any],
+                  sequence_types: Tuple[type, ...] = (list, tuple),
+                  convert_items: bool = False,
+                  freeze_sequences: bool = False) -> Any:
+    """Rebuilds a tree of mappings and sequences without recursion.
+
+    Instances of 'node_type' are rebuilt by 'new_node', which returns
+    the replacement object, the mapping its items are written into and
+    the (key, value) pairs to convert. Lists and tuples are rebuilt with
+    their items converted; any other value of a mapping is passed
+    through 'convert_value', while other sequence items are kept unless
+    'convert_items' is set. Lists are rebuilt as tuples if
+    'freeze_sequences' is set; a list holding itself other than through
+    a mapping then raises ValueError, as no tuple can hold itself.
+
+    Every rebuilt container is recorded in 'memo' by the identity of its
+    source, so shared subtrees are converted once and cycles resolve to
+    the same replacement. The memo has the same layout as the one used
+    by :func:`copy.deepcopy`.
+    """
+
+    result, store, items = new_node(root)
+    memo[id(root)] = result
+
+    # Frames: (pending items, store, is sequence, tuple source, parent, key in parent)
+    stack = [(iter(items), store, False, None, None, None)]
+    # Identity -> number of frames building a tuple from that source
+    building: Dict[int, int] = {}
+
+    while stack:
+        items, store, in_sequence, source, parent, parent_key = stack[-1]
+
+        for key, value in items:
+            value_id = id(value)
+            if value_id in memo:
+                store[key] = memo[value_id]
+            elif isinstance(value, node_type):
+                child, child_store, child_items = new_node(value)
+                memo[value_id] = child
+                store[key] = child
+                stack.append((iter(child_items), child_store, False, None, None, None))
+                break
+            elif type(value) in sequence_types:
+                child_store = [None] * len(value)
+                if type(value) is tuple or freeze_sequences:
+                    # Immutable, so it is built once all items are converted.
+                    # Reached again within itself, it is built anew; that
+                    # ends at the first mapping, which is in the memo
+                    if value_id in building:
+                        for frame in reversed(stack):
+                            if not frame[2]:
+                                break
+                            if frame[3] is value:
+                                raise ValueError("a sequence holding itself cannot be rebuilt as a tuple")
+                    building[value_id] = building.get(value_id, 0) + 1
+                    stack.append((iter(enumerate(value)), child_store, True, value, store, key))
+                else:
+                    memo[value_id] = child_store
+                    store[key] = child_store
+                    stack.append((iter(enumerate(value)), child_store, True, None, None, None))
+                break
+            elif not in_sequence or convert_items:
+                store[key] = convert_value(value)
+            else:
+                store[key] = value
+        else:
+            stack.pop()
+            if source is not None:
+                source_id = id(source)
+                building[source_id] -= 1
+                if not building[source_id]:
+                    del building[source_id]
+                parent[parent_key] = memo[source_id] = tuple(store)
+
+    return result
+
+
+def _plain_node(node: Union[dict, Maps]) -> Tuple[dict, dict, Iterable]:
+    # Node factory converting Maps objects to stdlib dictionaries
+    if isinstance(node, Maps):
+        node._resolve_all()
+        node = node._map
+    new_dict = {}
+    return new_dict, new_dict, node.items()
+
+
+def _to_plain(value: Any) -> Any:
+    # Converts a Maps object, or a list or tuple holding some, to stdlib
+    # types
+    if not isinstance(value, (Maps, list, tuple)):
+        return value
+    return _rebuild_tree({None: value}, Maps, _plain_node, _identity, {})[None]
+
+
+def _from_plain(value: Any, dynamic: bool = True) -> Any:
+    # Converts a dictionary, or a list holding some, to Maps objects
+    # without sanitizing keys or coercing values
+    if not isinstance(value, (dict, list)):
+        return value
+
+    def new_node(source: dict) -> Tuple[Maps, OrderedDict, Iterable]:
+        node = Maps(_dynamic=dynamic)
+        return node, node._map, source.items()
+
+    return _rebuild_tree({None: value}, dict, new_node, _identity, {}, sequence_types=(list,))._map[None]
+
+
+def _unpickle_maps(cls: type, dynamic: bool) -> Maps:
+    # Creates the instance pickled by 'Maps.__reduce__'; its mapping is
+    # set by '__setstate__'
+    node = cls.__new__(cls)
+    node.__dict__.update(_dynamic=dynamic, _lazy=False, _pending=set(), _tracked=None, _watchers=None)
+    return node
+
+
+class _SharedRef(object):
+    # Stands in for a nested Maps object in a node of a shared block
+    __slots__ = ('index',)
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+    def __reduce__(self) -> tuple:
+        return (_SharedRef, (self.index,))
+
+
+class _SharedBlock(object):
+    """A shared memory block holding an encoded Maps tree.
+
+    The block starts with a header followed by a table of (offset, size)
+    pairs, one per node, read in place. Each node is a pickled
+    dictionary whose nested Maps objects are replaced by references to
+    other nodes, so a node is only decoded when it is first read.
+    """
+
+    __slots__ = ('memory', 'nodes', 'owner', 'table', 'view')
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool) -> None:
+        self.memory = memory
+        self.owner = owner
+        self.view = memory.buf
+
+        magic, version, count = _SHARED_HEADER.unpack_from(self.view)
+        if magic != _SHARED_MAGIC or version != _SHARED_VERSION:
+            self.view = None
+            memory.close()
+            raise ValueError(f"shared memory block '{memory.name}' does not hold a Maps object")
+
+        self.table = self.view[_SHARED_HEADER.size:_SHARED_HEADER.size + 16 * count].cast('Q')
+        self.nodes: Dict[int, SharedMaps] = {}
+
+    @classmethod
+    def attach(cls, name: str) -> _SharedBlock:
+        # Each process attaches to a block once
+        block = _shared_blocks.get(name)
+        if block is None:
+            try:
+                memory = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # 'track' was added in Python 3.13
+                memory = shared_memory.SharedMemory(name=name)
+            block = _shared_blocks[name] = cls(memory, owner=False)
+        return block
+
+    @classmethod
+    def create(cls, root: Maps, name: Optional[str] = None) -> _SharedBlock:
+        stores: List[dict] = []
+
+        def new_node(node: Maps) -> Tuple[_SharedRef, dict, Iterable]:
+            node._resolve_all()
+            store: dict = {}
+            stores.append(store)
+            return _SharedRef(len(stores) - 1), store, node._map.items()
+
+        _rebuild_tree(root, Maps, new_node, _identity, {})
+        blobs = [pickle.dumps(store, protocol=pickle.HIGHEST_PROTOCOL) for store in stores]
+
+        offset = _SHARED_HEADER.size + 16 * len(blobs)
+        size = offset + sum(len(blob) for blob in blobs)
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        view = memory.buf
+        _SHARED_HEADER.pack_into(view, 0, _SHARED_MAGIC, _SHARED_VERSION, len(blobs))
+        table = view[_SHARED_HEADER.size:offset].cast('Q')
+        for index, blob in enumerate(blobs):
+            table[2 * index] = offset
+            table[2 * index + 1] = len(blob)
+            view[offset:offset + len(blob)] = blob
+            offset += len(blob)
+        table.release()
+        del view
+
+        block = _shared_blocks[memory.name] = cls(memory, owner=True)
+        return block
+
+    def close(self) -> None:
+        if self.view is None:
+            return
+        _shared_blocks.pop(self.memory.name, None)
+        for node in self.nodes.values():
+            object.__setattr__(node, '_map', None)
+        self.nodes.clear()
+        self.table.release()
+        self.view = self.table = None
+        self.memory.close()
+
+    def decode(self, index: int) -> dict:
+        if self.view is None:
+            raise ValueError(f"shared memory block '{self.memory.name}' is closed")
+
+        offset, size = self.table[2 * index], self.table[2 * index + 1]
+        store = pickle.loads(self.view[offset:offset + size])
+        for key, value in store.items():
+            if isinstance(value, _SharedRef):
+                store[key] = self.node(value.index)
+            elif isinstance(value, (list, tuple)):
+                store[key] = self._resolve_refs(value)
+        return store
+
+    def node(self, index: int) -> SharedMaps:
+        node = self.nodes.get(index)
+        if node is None:
+            node = self.nodes[index] = SharedMaps._view(self, index)
+        return node
+
+    def _resolve_refs(self, value: Union[list, tuple]) -> Union[list, tuple]:
+        # References nested in sequences are rare, so they are only
+        # searched for here
+        def new_node(source: Any) -> Tuple[Any, dict, Iterable]:
+            if isinstance(source, _SharedRef):
+                return self.node(source.index), {}, ()
+            new_dict: dict = {}
+            return new_dict, new_dict, source.items()
+
+        return _rebuild_tree({None: value}, _SharedRef, new_node, _identity, {})[None]
+
+
+def _coerce_value(value: Any) -> Any:
+    """Converts a string to the Python base-type it represents.
+
+    Non-string values are returned untouched. Plain integers, floats,
+    bools and None are recognized without invoking the parser; anything
+    else that could be a literal falls back to :func:`ast.literal_eval`.
+    Bools are matched case-insensitively. If the value cannot be
+    converted, it is kept as a string.
+    """
+
+    if not isinstance(value, str) or not value:
+        return value
+
+    first = value[0]
+    if first in _LITERAL_STARTS:
+        if _INT_LITERAL.fullmatch(value):
+            try:
+                return int(value)
+            except ValueError:
+                # Exceeds the int string conversion limit
+                return value
+        if _FLOAT_LITERAL.fullmatch(value):
+            return float(value)
+    elif first.isalpha() or first == '_':
+        stripped = value.strip()
+        if stripped == "None":
+            return None
+        keyword = _KEYWORD_LITERALS.get(stripped.lower())
+        if keyword is not None:
+            return keyword
+        if not (_STRING_PREFIX.match(value) or ',' in value or '#' in value):
+            # A bare name can never be a literal
+            return value
+    elif not first.isspace():
+        return value
+
+    try:
+        return ast.literal_eval(value)
+    except (MemoryError, RecursionError, SyntaxError, TypeError, ValueError):
+        # Cannot eval this value
+        return value
 
 
 class Maps(MutableMapping):
@@ -90,6 +563,14 @@ class Maps(MutableMapping):
 
         Output: Maps(hello_joh_n="hi computer")
 
+        >>> # Lazy mode defers converting nested values until they
+        >>> # are first accessed
+        >>> test = {"shard": {"images": ["a.png", "b.png"]}}
+        >>> maps = Maps(test, _lazy=True)
+        >>> print(maps.shard.images)
+
+        Output: ['a.png', 'b.png']
+
     Raises:
         ValueError:
             An argument is of a legal type but is, or contains, an
@@ -98,21 +579,33 @@ class Maps(MutableMapping):
 
     # Class-level variables
     _dynamic: bool
+    _lazy: bool
     _map: OrderedDict
+    _pending: set
+    _tracked: Optional[Dict[int, Tuple[dict, Maps]]]
+    _watchers: Optional[Dict[ChangeTracker, str]]
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__()
 
         self._dynamic = True
+        self._lazy = False
         self._map = OrderedDict()
+        self._pending = set()
+        self._tracked = None
+        self._watchers = None
 
         if kwargs:
             for key, value in self._get_items(kwargs):
-                key = re.sub('[^0-9a-zA-Z]+', '_', key)
-                if key != '_dynamic':
-                    self._map[key] = value
-                else:
+                key = _sanitize_key(key)
+                if key == '_dynamic':
                     self._dynamic = value
+                elif key == '_lazy':
+                    self._lazy = value
+                elif key == '_tracked':
+                    self._tracked = value
+                else:
+                    self._map[key] = value
 
         if args:
             dictionary = args[0]
@@ -123,42 +616,39 @@ class Maps(MutableMapping):
                     f"'{type(dictionary).__name__}'"
                 )
 
-            # Recursive handling
-            tracked_ids = {id(dictionary): self}
-            for key, value in self._get_items(dictionary):
-                if isinstance(key, str):
-                    key = re.sub('[^0-9a-zA-Z]+', '_', key)
-
-                value_id = id(value)
-                if isinstance(value, dict):
-                    if value_id in tracked_ids:
-                        value = tracked_ids[value_id]
+            if self._lazy:
+                # Store raw values; they are converted on first access.
+                # The raw dicts already wrapped are shared by the whole
+                # tree so shared subtrees and cycles are wrapped once
+                if self._tracked is None:
+                    self._tracked = {}
+                self._tracked[id(dictionary)] = (dictionary, self)
+
+                for key, value in self._get_items(dictionary):
+                    if isinstance(key, str):
+                        key = _sanitize_key(key)
+
+                    tracked = self._tracked.get(id(value))
+                    if tracked is not None:
+                        value = tracked[1]
+                        self._pending.discard(key)
+                    elif isinstance(value, (str, dict, list)):
+                        self._pending.add(key)
                     else:
-                        value = self.__class__(value, _dynamic=self._dynamic)
-                        tracked_ids[value_id] = value
-
-                if isinstance(value, list):
-                    listed_items = []
-
-                    for item in value:
-                        temp_item = item
-                        if isinstance(item, dict):
-                            temp_item = self.__class__(item, _dynamic=self._dynamic)
-                        listed_items.append(temp_item)
-
-                    value = listed_items
-                try:
-                    self._map[key] = ast.literal_eval(value)
-                except NameError:
-                    if value.lower() == "false":
-                        self._map[key] = False
-                    elif value.lower() == "true":
-                        self._map[key] = True
-                    else:
-                        self._map[key] = value
-                except (SyntaxError, ValueError):
-                    # Cannot eval this value
+                        self._pending.discard(key)
+
                     self._map[key] = value
+                return
+
+            def new_node(source: dict) -> Tuple[Maps, OrderedDict, Iterable]:
+                node = self if source is dictionary else self.__class__(_dynamic=self._dynamic)
+                items = (
+                    (_sanitize_key(key) if isinstance(key, str) else key, value)
+                    for key, value in self._get_items(source)
+                )
+                return node, node._map, items
+
+            _rebuild_tree(dictionary, dict, new_node, _coerce_value, {}, sequence_types=(list,))
 
     # Dunder methods
 
@@ -178,20 +668,33 @@ class Maps(MutableMapping):
         return self._map.__contains__(name)
 
     def __copy__(self) -> Maps:
-        return self.__class__(self)
-
-    def __deepcopy__(self) -> Maps:
-        return self.copy()
-
-    def __delitem__(self,
-                    key: str,
-                    dict_delitem: Optional[Callable[..., Any]] = dict.__delitem__) -> Any:
-        return self._map.__delitem__(key, dict_delitem=dict_delitem)
+        return _rebuild_tree(self, Maps, self._copy_node_factory(), _identity, {})
+
+    def __deepcopy__(self, memo: dict) -> Maps:
+        return _rebuild_tree(
+            self,
+            Maps,
+            self._copy_node_factory(),
+            lambda value: deepcopy(value, memo),
+            memo,
+            convert_items=True
+        )
+
+    def __delitem__(self, key: str) -> None:
+        value = self._map[key]
+        self._map.__delitem__(key)
+        self._pending.discard(key)
+        if self._watchers is not None:
+            self._changed(key, value, _MISSING)
 
     def __dir__(self) -> Iterable:
         return self.keys()
 
     def __eq__(self, value: Any) -> bool:
+        self._resolve_all()
+        if isinstance(value, Maps):
+            # Values of a lazy Maps are converted as they are read
+            value._resolve_all()
         value = Maps.parse_value(value)
         if not isinstance(value, dict):
             return False
@@ -220,6 +723,9 @@ class Maps(MutableMapping):
         return self._map.__lt__(value)
 
     def __ne__(self, value: Any) -> bool:
+        self._resolve_all()
+        if isinstance(value, Maps):
+            value._resolve_all()
         value = Maps.parse_value(value)
         return self._map.__ne__(value)
 
@@ -227,6 +733,7 @@ class Maps(MutableMapping):
         return str(self)
 
     def __str__(self) -> str:
+        self._resolve_all()
         items = []
 
         for key, value in self._get_items(self._map):
@@ -241,10 +748,10 @@ class Maps(MutableMapping):
         return "{0}({1})".format(self.__class__.__name__, joined)
 
     def __delattr__(self, name: str) -> None:
-        self._map.__delitem__(name)
+        del self[name]
 
     def __getattr__(self, name: str) -> Any:
-        if name in ('_map', '_dynamic', "_ipython_canary_method_should_not_exist_"):
+        if name in _INTERNAL_ATTRS:
             return super().__getattr__(name)
 
         try:
@@ -255,7 +762,7 @@ class Maps(MutableMapping):
         return self[name]
 
     def __setattr__(self, name: str, value: Any) -> None:
-        if name in ('_map', '_dynamic', "_ipython_canary_method_should_not_exist_"):
+        if name in _INTERNAL_ATTRS:
             super().__setattr__(name, value)
         else:
             self[name] = value
@@ -266,39 +773,311 @@ class Maps(MutableMapping):
             self._dynamic and
             name != "_ipython_canary_method_should_not_exist_"
         ):
-            self[name] = self.__class__()
-
+            # Reading a missing key is not a change; writes into the new
+            # child are reported under its path
+            child = self._map[name] = self.__class__()
+            if self._watchers is not None:
+                for tracker, prefix in tuple(self._watchers.items()):
+                    tracker._attach(child, f"{prefix}{name}.")
+            return child
+
+        if name in self._pending:
+            return self._resolve(name)
         return self._map[name]
 
     def __setitem__(self, name: str, value: Any) -> None:
-        self._map[name] = value
-
-    def __getstate__(self) -> dict:
-        return self.__dict__
+        if self._watchers is not None:
+            previous = self._map.get(name, _MISSING)
+            self._map[name] = value
+            self._pending.discard(name)
+            self._changed(name, previous, value)
+            return
 
-    def __setstate__(self, value: dict) -> None:
-        self.__dict__.update(value)
+        self._map[name] = value
+        if self._pending:
+            self._pending.discard(name)
+
+    def __reduce__(self) -> tuple:
+        # Only the mapping is pickled, rather than every internal
+        # attribute. Deferred values are converted first, and observers
+        # are local to this process
+        self._resolve_all()
+        return (_unpickle_maps, (self.__class__, self._dynamic), self._map)
+
+    def __setstate__(self, value: Union[OrderedDict, dict]) -> None:
+        if type(value) is OrderedDict:
+            self._map = value
+        else:
+            # Pickles written before '__reduce__' hold the whole state
+            self.__dict__.update(value)
 
     # Internal methods
 
+    def _batch_changes(self) -> ExitStack:
+        # Holds back notifications of every tracker watching this object
+        stack = ExitStack()
+        for tracker in tuple(self._watchers or ()):
+            stack.enter_context(tracker.batch())
+        return stack
+
+    def _changed(self, key: Any, previous: Any, value: Any) -> None:
+        for tracker, prefix in tuple(self._watchers.items()):
+            path = f"{prefix}{key}"
+            if previous is not _MISSING:
+                tracker._detach(previous, f"{path}.")
+            if value is not _MISSING:
+                tracker._attach(value, f"{path}.")
+            tracker._mark(path)
+
     def _get_items(self, item: Any) -> Iterable:
         if hasattr(item, 'iteritems') and ismethod(getattr(item, 'iteritems')):
             return item.iteritems()
         else:
             return item.items()
 
+    def _copy_node_factory(self) -> Callable[[Maps], Tuple[Maps, OrderedDict, Iterable]]:
+        # Copies keep deferred values raw; the copied tree shares a new
+        # lazy-mode memo
+        tracked = None if self._tracked is None else {}
+
+        def new_node(node: Maps) -> Tuple[Maps, OrderedDict, Iterable]:
+            clone = node.__class__.__new__(node.__class__)
+            clone._dynamic = node._dynamic
+            clone._lazy = node._lazy
+            clone._map = OrderedDict()
+            clone._pending = set(node._pending)
+            clone._tracked = None if node._tracked is None else tracked
+            clone._watchers = None
+            return clone, clone._map, node._map.items()
+
+        return new_node
+
+    def _patch_parent(self, path: Tuple[Any, ...], create: bool) -> Maps:
+        # Returns the Maps object holding the last key of a patch path,
+        # creating the missing levels if asked to
+        node = self
+        for key in path[:-1]:
+            if key not in node._map:
+                if not create:
+                    raise KeyError(path)
+                node[key] = Maps(_dynamic=node._dynamic)
+            node = node[key]
+            if not isinstance(node, Maps):
+                raise KeyError(f"path does not lead to a 'Maps' object: {path!r}")
+        return node
+
+    def _resolve(self, key: str) -> Any:
+        # Converts a value deferred by lazy mode and caches the result
+        self._pending.discard(key)
+        value = self._map[key] = self._wrap(self._map[key])
+        if self._watchers is not None:
+            for tracker, prefix in tuple(self._watchers.items()):
+                tracker._attach(value, f"{prefix}{key}.")
+        return value
+
+    def _resolve_all(self) -> None:
+        for key in tuple(self._pending):
+            self._resolve(key)
+
+    def _wrap(self, value: Any) -> Any:
+        # Converts a raw value the way the constructor does
+        if isinstance(value, str):
+            return _coerce_value(value)
+        if isinstance(value, dict):
+            return self._wrap_dict(value)
+        if isinstance(value, list):
+            # Nested lists are rebuilt as the constructor rebuilds them;
+            # the dicts found are wrapped, their own values still deferred
+            holder = {None: value}
+
+            def new_node(source: dict) -> Tuple[Any, Optional[dict], Iterable]:
+                if source is holder:
+                    result = {}
+                    return result, result, source.items()
+                return self._wrap_dict(source), None, ()
+
+            return _rebuild_tree(holder, dict, new_node, _identity, {}, sequence_types=(list,))[None]
+        return value
+
+    def _wrap_dict(self, value: dict) -> Maps:
+        if self._tracked is not None:
+            tracked = self._tracked.get(id(value))
+            if tracked is not None:
+                return tracked[1]
+        return self.__class__(
+            value,
+            _dynamic=self._dynamic,
+            _lazy=self._lazy,
+            _tracked=self._tracked
+        )
+
     # Public methods
 
     def clear(self) -> None:
         """Remove all items from the Maps object."""
 
+        if self._watchers is not None:
+            with self._batch_changes():
+                for key in tuple(self._map):
+                    del self[key]
+            return
+
         self._map.clear()
+        self._pending.clear()
+
+    @staticmethod
+    def compile_path(path: str) -> MapsPath:
+        """
+        Compiles a dotted path into a reusable :obj:`MapsPath` accessor.
+
+        Compiled paths are cached, so compiling the same path again is
+        cheap.
+
+        Args:
+            path (:obj:`str`):
+                The dotted path, e.g. 'train.optimizer.lr'.
+
+        Returns:
+            MapsPath:
+                The compiled path.
+        """
+
+        return _compiled_path(path)
 
     def copy(self) -> Maps:
-        """Makes a copy of the Maps object in memory."""
+        """Makes a copy of the Maps object in memory.
+
+        Every nested :obj:`Maps` object, list and tuple is copied while
+        the remaining values are shared with the original. Shared
+        subtrees and cycles are preserved, and the copy is made without
+        recursion so arbitrarily deep trees can be copied.
+        """
 
         return self.__copy__()
 
+    def freeze(self) -> FrozenMaps:
+        """Returns an immutable :obj:`FrozenMaps` copy of the Maps
+        object."""
+
+        return FrozenMaps(self)
+
+    def share(self, name: Optional[str] = None) -> SharedMaps:
+        """
+        Copies the Maps object into a read-only shared memory block.
+
+        The returned :obj:`SharedMaps` object pickles as the name of the
+        block, so sending it to worker processes is cheap. Workers
+        attach to the block once and only decode the nodes they read.
+
+        Args:
+            name (:obj:`str`, optional):
+                The name of the block. A unique name is generated if
+                omitted.
+
+        Returns:
+            SharedMaps:
+                A view of the root of the shared copy. The block is
+                freed by :meth:`SharedMaps.unlink`, or by leaving the
+                view's context.
+
+        Raises:
+            FileExistsError:
+                A block named :obj:`name` already exists.
+        """
+
+        return _SharedBlock.create(self, name).node(0)
+
+    def diff(self, other: Maps) -> dict:
+        """
+        Compares the Maps object with :term:`other`, returning the patch
+        that turns this object into :term:`other`.
+
+        Subtrees both objects share are skipped without being compared,
+        so mostly-equal trees are compared in time proportional to their
+        differences. Values in the patch are stdlib types, so it can be
+        stored as is.
+
+        Args:
+            other (:obj:`Maps`):
+                The :obj:`Maps` object to compare against.
+
+        Returns:
+            dict:
+                The patch, with an 'added' and a 'changed' dictionary
+                mapping paths to their new values and a 'removed' list of
+                paths. A path is the tuple of the keys leading to a
+                value, so keys of any type round-trip unchanged.
+
+        Raises:
+            TypeError:
+                :obj:`other` is not a :obj:`Maps` object.
+        """
+
+        if not isinstance(other, Maps):
+            raise TypeError(
+                "argument 'other' must be of type 'Maps': "
+                f"'{type(other).__name__}'"
+            )
+
+        added = {}
+        removed = []
+        changed = {}
+
+        stack = [((), self, other)]
+        visited = set()
+
+        while stack:
+            prefix, left, right = stack.pop()
+            if left is right or (id(left), id(right)) in visited:
+                continue
+            visited.add((id(left), id(right)))
+
+            left._resolve_all()
+            right._resolve_all()
+
+            for key, value in left._map.items():
+                path = prefix + (key,)
+                new = right._map.get(key, _MISSING)
+                if new is _MISSING:
+                    removed.append(path)
+                elif value is new:
+                    continue
+                elif isinstance(value, Maps) and isinstance(new, Maps):
+                    stack.append((path, value, new))
+                elif type(value) is not type(new) or value != new:
+                    changed[path] = _to_plain(new)
+
+            for key, value in right._map.items():
+                if key not in left._map:
+                    added[prefix + (key,)] = _to_plain(value)
+
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+    def apply_patch(self, patch: dict) -> None:
+        """
+        Applies a patch created by :meth:`diff` to the Maps object in
+        place.
+
+        Changes are made through normal item assignment and deletion, so
+        they are reported to any :obj:`ChangeTracker` as one batch.
+
+        Args:
+            patch (:obj:`dict`):
+                The patch returned by :meth:`diff`.
+
+        Raises:
+            KeyError:
+                A path of the patch does not exist in the Maps object.
+        """
+
+        with self._batch_changes():
+            for path in patch.get('removed', ()):
+                del self._patch_parent(path, create=False)[path[-1]]
+
+            for values in (patch.get('changed', {}), patch.get('added', {})):
+                for path, value in values.items():
+                    self._patch_parent(path, create=True)[path[-1]] = _from_plain(value, self._dynamic)
+
     def empty(self) -> bool:
         """Returns whether the Maps object is empty."""
 
@@ -322,7 +1101,7 @@ class Maps(MutableMapping):
         """
 
         maps = cls()
-        maps.map = OrderedDict.fromkeys(iterable, value)
+        maps._map = OrderedDict.fromkeys(iterable, value)
 
         return maps
 
@@ -344,14 +1123,81 @@ class Maps(MutableMapping):
                 The value at :term:`key` or :term:default`.
         """
 
+        if key in self._pending:
+            return self._resolve(key)
         return self._map.get(key, default)
 
+    def get_path(self, path: str, default: Any = _MISSING) -> Any:
+        """
+        Returns the value at a dotted path, e.g. 'train.optimizer.lr'.
+
+        Unlike attribute access, missing levels are never created.
+
+        Args:
+            path (:obj:`str`):
+                The dotted path.
+            default (:obj:`obj`, optional):
+                The value to return if the path does not exist.
+
+        Returns:
+            Any:
+                The value at :term:`path`, otherwise :term:`default`.
+
+        Raises:
+            KeyError:
+                The path does not exist and no default is given.
+        """
+
+        return _compiled_path(path).get(self, default)
+
+    def get_paths(self, paths: Sequence[str], default: Any = _MISSING) -> List[Any]:
+        """
+        Returns the values at several dotted paths, traversing each
+        shared prefix only once.
+
+        Args:
+            paths (:obj:`Sequence`):
+                The dotted paths.
+            default (:obj:`obj`, optional):
+                The value to use for paths that do not exist.
+
+        Returns:
+            list:
+                The values, in the same order as :term:`paths`.
+
+        Raises:
+            KeyError:
+                A path does not exist and no default is given.
+        """
+
+        steps, outputs = _paths_program(tuple(paths))
+        child_of = MapsPath._child
+
+        # Each step reads one level from the result of an earlier step
+        results = [self]
+        for source, segment, number in steps:
+            node = results[source]
+            if node is not _MISSING:
+                node = child_of(node, segment, number)
+            results.append(node)
+
+        values = []
+        for path, output in zip(paths, outputs):
+            value = results[output]
+            if value is _MISSING:
+                if default is _MISSING:
+                    raise KeyError(path)
+                value = default
+            values.append(value)
+        return values
+
     def has_key(self, key: str) -> bool:
         return key in self._map
 
     def items(self) -> Generator[Tuple[str, Any]]:
         """Returns a generator yielding a (key, value) pair."""
 
+        self._resolve_all()
         return self._get_items(self._map)
 
     def iteritems(self) -> Iterator:
@@ -383,7 +1229,195 @@ class Maps(MutableMapping):
         return self._map.next()
 
     @classmethod
-    def parse_ini(cls, ini_dict: ConfigParser, to_maps=False) -> Union[dict, Maps]:
+    def iter_ini(cls,
+                 path: str,
+                 encoding: str = 'utf-8',
+                 missing_env: str = 'leave') -> Generator[Tuple[str, Maps], None, None]:
+        """
+        Reads an INI file incrementally, yielding each section as soon
+        as it has been read.
+
+        Only the section being read (and the 'DEFAULT' section) is held
+        in memory, so consumers can start working before a large file
+        has been read completely. Each section is converted exactly like
+        :meth:`parse_ini` converts it.
+
+        Note:
+            Section headers must start at the beginning of a line, and a
+            'DEFAULT' section only applies to the sections after it.
+
+        Args:
+            path (:obj:`str`):
+                The path to the INI file.
+            encoding (:obj:`str`):
+                The encoding of the INI file.
+            missing_env (:obj:`str`):
+                How to handle a missing environment variable. See
+                :meth:`parse_ini`.
+
+        Yields:
+            tuple:
+                The name of the section and its options as a :obj:`Maps`
+                object.
+
+        Raises:
+            configparser.Error:
+                The file is not a valid INI file.
+            KeyError:
+                A referenced environment variable is not set and
+                :obj:`missing_env` is 'error'.
+            OSError:
+                The INI file cannot be read.
+        """
+
+        defaults: List[str] = []
+        seen = set()
+        section = None
+        lines: List[str] = []
+
+        def convert(section: str, lines: List[str]) -> Maps:
+            parser = ConfigParser()
+            parser.read_string(''.join(defaults + lines), source=path)
+            return Maps(cls.parse_ini(parser, missing_env=missing_env)[section])
+
+        with open(path, encoding=encoding) as file:
+            for line in file:
+                match = ConfigParser.SECTCRE.match(line) if line[:1] not in ' \t' else None
+                if match is None:
+                    lines.append(line)
+                    continue
+
+                if section is None:
+                    if lines:
+                        # Raises if there are options without a section
+                        ConfigParser().read_string(''.join(lines), source=path)
+                elif section == DEFAULTSECT:
+                    defaults.extend(lines)
+                else:
+                    yield section, convert(section, lines)
+
+                section = match.group('header')
+                if section in seen and section != DEFAULTSECT:
+                    raise DuplicateSectionError(section, path)
+                seen.add(section)
+                lines = [line]
+
+        if section == DEFAULTSECT:
+            defaults.extend(lines)
+        elif section is not None:
+            yield section, convert(section, lines)
+
+    @classmethod
+    def load_ini(cls,
+                 path: str,
+                 to_maps: bool = False,
+                 cache_dir: Optional[str] = None,
+                 encoding: str = 'utf-8',
+                 missing_env: str = 'leave') -> Union[dict, Maps]:
+        """
+        Loads an INI file and converts it with :meth:`parse_ini`,
+        keeping a binary snapshot of the result so later loads skip
+        parsing entirely.
+
+        The snapshot is reused while the file's modification time and
+        size are unchanged (or, if they changed, its content hash still
+        matches) and every environment variable referenced with '&'
+        has the same value as when the snapshot was written.
+
+        Args:
+            path (:obj:`str`):
+                The path to the INI file.
+            to_maps (:obj:`bool`):
+                Return a :obj:`Maps` object instead of a :obj:`dict`.
+            cache_dir (:obj:`str`, optional):
+                The directory holding the snapshots. Defaults to
+                'helix/ini' in the user's cache directory.
+            encoding (:obj:`str`):
+                The encoding of the INI file.
+            missing_env (:obj:`str`):
+                How to handle a missing environment variable. See
+                :meth:`parse_ini`.
+
+        Returns:
+            dict or Maps:
+                The same result :meth:`parse_ini` returns for the file.
+
+        Raises:
+            KeyError:
+                A referenced environment variable is not set and
+                :obj:`missing_env` is 'error'.
+            OSError:
+                The INI file cannot be read.
+        """
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        snapshot = os.path.join(
+            cache_dir or _default_cache_dir(),
+            hashlib.sha1(path.encode('utf-8')).hexdigest() + '.pickle'
+        )
+
+        content = None
+        try:
+            with open(snapshot, 'rb') as file:
+                header = pickle.load(file)
+
+                if (
+                    header['version'] == _INI_CACHE_VERSION and
+                    header['path'] == path and
+                    header['encoding'] == encoding and
+                    header['missing_env'] == missing_env and
+                    all(os.environ.get(name) == value for name, value in header['environ'].items())
+                ):
+                    if (header['mtime'], header['size']) == (stat.st_mtime_ns, stat.st_size):
+                        ini_dict = pickle.load(file)
+                        return Maps(ini_dict) if to_maps else ini_dict
+
+                    with open(path, 'rb') as ini_file:
+                        content = ini_file.read()
+
+                    if _file_digest(content) == header['hash']:
+                        # Touched but unchanged; refresh the header
+                        ini_dict = pickle.load(file)
+                        header.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+                        _write_ini_snapshot(snapshot, header, ini_dict)
+                        return Maps(ini_dict) if to_maps else ini_dict
+        except _SNAPSHOT_ERRORS:
+            # Missing, stale or corrupt snapshot
+            pass
+
+        if content is None:
+            with open(path, 'rb') as ini_file:
+                content = ini_file.read()
+        text = content.decode(encoding)
+
+        parser = ConfigParser()
+        parser.read_string(text, source=path)
+        ini_dict = cls.parse_ini(parser, missing_env=missing_env)
+
+        header = {
+            'version': _INI_CACHE_VERSION,
+            'path': path,
+            'encoding': encoding,
+            'missing_env': missing_env,
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': _file_digest(content),
+            'environ': {
+                match.group(1): os.environ.get(match.group(1))
+                for match in _ENV_REFERENCE.finditer(text)
+            },
+        }
+        _write_ini_snapshot(snapshot, header, ini_dict)
+
+        return Maps(ini_dict) if to_maps else ini_dict
+
+    @classmethod
+    def parse_ini(cls,
+                  ini_dict: ConfigParser,
+                  to_maps=False,
+                  missing_env: str = 'leave') -> Union[dict, Maps]:
         """
         Converts the values from an INI file from all strings to their
         actual Python base-types (i.e. int, float, bool, etc).
@@ -392,6 +1426,10 @@ class Maps(MutableMapping):
         If a value of the key:value pairs is not a string, its type is
         maintained.
 
+        Environment variables are substituted before conversion. Use
+        '&VAR&' to insert the value of 'VAR', or '&VAR:default&' to fall
+        back to 'default' when 'VAR' is not set.
+
         Note:
             Any meant-to-be-bool values in the key:value pairs that are
             not exactly 'False' or 'True', but are similar like 'false'
@@ -403,6 +1441,11 @@ class Maps(MutableMapping):
                 is loaded.
             to_maps (:obj:`bool`):
                 Return a :obj:`Maps` object instead of a :obj:`dict`.
+            missing_env (:obj:`str`):
+                How to handle a missing environment variable without a
+                default: 'leave' keeps the reference as written,
+                'empty' replaces it with an empty string and 'error'
+                raises a :obj:`KeyError`. Default is 'leave'.
 
         Returns:
             dict or Maps:
@@ -412,8 +1455,13 @@ class Maps(MutableMapping):
                 :obj:`Maps` object.
 
         Raises:
+            KeyError:
+                A referenced environment variable is not set and
+                :obj:`missing_env` is 'error'.
             TypeError:
                 An argument is of an illegal type.
+            ValueError:
+                :obj:`missing_env` is not a known policy.
         """
 
         # Check for dict because of recursion; ini_dict is only meant
@@ -424,6 +1472,11 @@ class Maps(MutableMapping):
                 "argument 'ini_dict' must be of type 'ConfigParser': "
                 f"{type(ini_dict).__name__}"
             )
+        if missing_env not in _MISSING_ENV_POLICIES:
+            raise ValueError(
+                f"argument 'missing_env' must be one of {_MISSING_ENV_POLICIES}: "
+                f"'{missing_env}'"
+            )
         if isinstance(ini_dict, ConfigParser):
             ini_dict_ = {}
             for section in ini_dict.sections():
@@ -433,42 +1486,21 @@ class Maps(MutableMapping):
                     option_value = ini_dict.get(section, option)
 
                     # Parse using os environ
-                    matches = [(m.start(0), m.end(0)) for m in re.finditer("&", option_value)]
-                    if len(matches) > 0 and len(matches) % 2 == 0:
-                        i = 0
-                        while True:
-                            try:
-                                index_end = matches.pop(i + 1)[1]
-                                index_start = matches.pop(i)[0]
-                                sub = option_value[index_start:index_end]
-                                sub_replace = os.environ[sub[1:-1]]
-                                option_value = option_value.replace(sub, sub_replace)
-                            except IndexError:
-                                break
-                            except KeyError:
-                                pass
+                    try:
+                        option_value = _interpolate_env(option_value, missing_env)
+                    except KeyError as error:
+                        raise KeyError(
+                            f"{error.args[0]} (section '{section}', option '{option}')"
+                        ) from None
                     ini_dict_[section][option] = option_value
             ini_dict = ini_dict_
 
         for key, value in ini_dict.items():
             if isinstance(value, dict):
                 # Recursively parse dict
-                ini_dict[key] = Maps.parse_ini(value, to_maps=to_maps)
+                ini_dict[key] = Maps.parse_ini(value, to_maps=to_maps, missing_env=missing_env)
             else:
-                if not isinstance(value, str):
-                    continue
-                try:
-                    ini_dict[key] = ast.literal_eval(value)
-                except NameError:
-                    if value.lower() == "false":
-                        ini_dict[key] = False
-                    elif value.lower() == "true":
-                        ini_dict[key] = True
-                    else:
-                        ini_dict[key] = value
-                except (SyntaxError, ValueError):
-                    # Cannot eval this value
-                    ini_dict[key] = value
+                ini_dict[key] = _coerce_value(value)
         return Maps(ini_dict) if to_maps else ini_dict
 
     @classmethod
@@ -489,7 +1521,7 @@ class Maps(MutableMapping):
         """
 
         if issubclass(type(value), Maps):
-            return value.map
+            return value._map
         else:
             return value
 
@@ -510,7 +1542,13 @@ class Maps(MutableMapping):
                 The value at :term:`key`, otherwise :term:`default`.
         """
 
-        return self._map.pop()
+        if key in self._pending:
+            self._resolve(key)
+        if self._watchers is not None and key in self._map:
+            value = self._map[key]
+            del self[key]
+            return value
+        return self._map.pop(key, default)
 
     def popitem(self) -> Any:
         """Removes and returns an arbitrary (key, value) pair from the
@@ -525,7 +1563,13 @@ class Maps(MutableMapping):
                 The :obj:`Maps` object is empty.
         """
 
-        return self._map.popitem()
+        key, value = self._map.popitem()
+        if key in self._pending:
+            self._pending.discard(key)
+            value = self._wrap(value)
+        if self._watchers is not None:
+            self._changed(key, value, _MISSING)
+        return key, value
 
     def setdefault(self, key: str, default=None) -> Any:
         """
@@ -545,45 +1589,86 @@ class Maps(MutableMapping):
                     otherwise.
         """
 
+        if key in self._pending:
+            return self._resolve(key)
+        if self._watchers is not None and key not in self._map:
+            self[key] = default
         return self._map.setdefault(key, default)
 
+    def track_changes(self,
+                      callback: Optional[Callable[[FrozenSet[str]], Any]] = None,
+                      schedule: Optional[Callable[[Callable[[], None]], Any]] = None) -> ChangeTracker:
+        """Starts tracking changes made to the Maps object and every
+        :obj:`Maps` object nested in it.
+
+        Args:
+            callback (:obj:`Callable`, optional):
+                An observer to subscribe right away. See
+                :meth:`ChangeTracker.subscribe`.
+            schedule (:obj:`Callable`, optional):
+                Schedules a batch of notifications. See
+                :obj:`ChangeTracker`.
+
+        Returns:
+            ChangeTracker:
+                The tracker; call :meth:`ChangeTracker.detach` to stop
+                tracking.
+        """
+
+        tracker = ChangeTracker(self, schedule=schedule)
+        if callback is not None:
+            tracker.subscribe(callback)
+        return tracker
+
+    def set_path(self, path: str, value: Any) -> None:
+        """
+        Sets the value at a dotted path, creating the missing levels as
+        empty :obj:`Maps` objects.
+
+        Args:
+            path (:obj:`str`):
+                The dotted path.
+            value (:obj:`obj`):
+                The value to set.
+
+        Raises:
+            KeyError:
+                A level of the path exists but is not a :obj:`Maps`
+                object.
+        """
+
+        _compiled_path(path).set(self, value)
+
     def to_dict(self) -> Union[dict, NoReturn]:
         """Converts the :obj:`Maps` object to a stdlib dictionary.
 
+        Nested :obj:`Maps` objects are converted without recursion, and
+        a subtree shared by several keys (or referencing itself) is
+        converted once so the result keeps the same structure.
+
         Returns:
             dict:
                 The converted :obj:`Maps` object as a dictionary.
         """
 
-        new_dict = {}
-
-        for key, value in self.items():
-            if issubclass(type(value), Maps):
-                if id(value) == id(self):
-                    value = new_dict
-                else:
-                    value = value.to_dict()
-            elif isinstance(value, (tuple, list)):
-                new_list = []
-
-                for item in value:
-                    temp_item = item
-                    if issubclass(type(item), Maps):
-                        temp_item = item.to_dict()
-                    new_list.append(temp_item)
-
-                if isinstance(value, tuple):
-                    value = tuple(new_list)
-                else:
-                    value = new_list
-
-            new_dict[key] = value
-        return new_dict
+        return _rebuild_tree(self, Maps, _plain_node, _identity, {})
 
     def update(self, *args, **kwargs) -> None:
         """Adds or changes existing values using a dictionary or
         iterator of key:value pairs."""
 
+        if self._watchers is not None:
+            with self._batch_changes():
+                for key, value in OrderedDict(*args, **kwargs).items():
+                    self[key] = value
+            return
+
+        if self._pending:
+            other = OrderedDict(*args, **kwargs)
+            self._pending.difference_update(other)
+            self._map.update(other)
+            return
+
         if len(args) != 0:
             self._map.update(*args)
         self._map.update(kwargs)
@@ -591,6 +1676,7 @@ class Maps(MutableMapping):
     def values(self) -> Any:
         """Returns the values of the :obj:`Maps` object."""
 
+        self._resolve_all()
         return self._map.values()
 
     def viewitems(self) -> Any:
@@ -608,3 +1694,1071 @@ class Maps(MutableMapping):
         """Returns a new view of the :obj:`Maps` object's values."""
 
         return self._map.viewvalues()
+
+
+class FrozenMaps(Mapping):
+    """
+    An immutable, slotted version of :obj:`Maps` meant for read-heavy
+    code paths, such as config lookups inside training loops.
+
+    Each distinct set of keys gets its own generated subclass with one
+    slot per key, so dotted reads are plain slot lookups instead of
+    going through :meth:`__getattr__`. Missing keys raise instead of
+    being created, and lists are frozen into tuples.
+
+    Note:
+        Keys that are not valid identifiers or that shadow a method
+        (e.g. 'keys') do not get a slot and are only accessible via
+        normal dictionary indexing. Defining :meth:`__getattr__` as a
+        fallback would stop CPython from specializing attribute reads.
+        Once 1024 keysets have a subclass, further keysets share one
+        that does read keys through :meth:`__getattr__`, so keys
+        driven by data cannot generate classes without bound.
+
+    Examples:
+        >>> test = {"optimizer": {"lr": "0.001"}}
+        >>> frozen = FrozenMaps(test)
+        >>> print(frozen.optimizer.lr)
+
+        Output: 0.001
+
+        >>> frozen = Maps(test).freeze()
+        >>> frozen.optimizer.lr = 0.1
+
+        AttributeError: 'FrozenMaps' object is immutable
+
+    Raises:
+        ValueError:
+            An argument is of a legal type but is, or contains, an
+            illegal value.
+    """
+
+    __slots__ = ('_map',)
+
+    # Class-level variables
+    _layouts: Dict[Tuple[type, Tuple[Any, ...]], type] = {}
+    _map: Dict[Any, Any]
+
+    def __new__(cls, *args, **kwargs) -> FrozenMaps:
+        items = []
+
+        if args:
+            dictionary = args[0]
+
+            if not isinstance(dictionary, Mapping):
+                raise ValueError(
+                    "object passed to constructor must be of type 'dict': "
+                    f"'{type(dictionary).__name__}'"
+                )
+
+            items.extend(cls._source_items(dictionary))
+
+        if kwargs:
+            items.extend((_sanitize_key(key), value) for key, value in kwargs.items())
+
+        root = args[0] if args else {}
+        instances = []
+
+        def new_node(node: Union[dict, Maps]) -> Tuple[FrozenMaps, dict, Iterable]:
+            # Values are filled in once every node exists, as the slots
+            # of an instance cannot be set afterwards
+            node_items = items if node is root else list(cls._source_items(node))
+            instance = cls._rebuild(tuple(key for key, _ in node_items))
+            instances.append(instance)
+            return instance, instance._map, node_items
+
+        result = _rebuild_tree(root, (dict, Maps), new_node, _identity, {}, freeze_sequences=True)
+        for instance in instances:
+            instance._fill(instance._map)
+        return result
+
+    # Dunder methods
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._map
+
+    def __copy__(self) -> FrozenMaps:
+        return self
+
+    def __deepcopy__(self, memo: dict) -> FrozenMaps:
+        return self
+
+    def __delattr__(self, name: str) -> NoReturn:
+        raise AttributeError(f"'{type(self).__name__}' object is immutable")
+
+    def __eq__(self, value: Any) -> bool:
+        if isinstance(value, FrozenMaps):
+            value = value._map
+        elif isinstance(value, Mapping):
+            value = dict(value.items())
+        return self._map == value
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._map[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._map)
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __ne__(self, value: Any) -> bool:
+        return not self == value
+
+    def __reduce__(self) -> tuple:
+        # Values are pickled as state so cyclic references resolve to
+        # the already unpickled instance
+        return (FrozenMaps._rebuild, (tuple(self._map),), tuple(self._map.values()))
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __setattr__(self, name: str, value: Any) -> NoReturn:
+        raise AttributeError(f"'{type(self).__name__}' object is immutable")
+
+    def __setstate__(self, values: Tuple[Any, ...]) -> None:
+        self._fill(dict(zip(self._map, values)))
+
+    def __str__(self) -> str:
+        items = []
+
+        for key, value in self._map.items():
+
+            # Recursive assignment case
+            if value is self:
+                items.append("{0}={1}(...)".format(key, type(self).__name__))
+            else:
+                items.append("{0}={1}".format(key, repr(value)))
+
+        joined = ", ".join(items)
+        return "{0}({1})".format(type(self).__name__, joined)
+
+    # Internal methods
+
+    def _fill(self, frozen: Dict[Any, Any]) -> None:
+        object.__setattr__(self, '_map', frozen)
+        for name in type(self).__slots__:
+            object.__setattr__(self, name, frozen[name])
+
+    @classmethod
+    def _layout(cls, keys: Tuple[Any, ...]) -> type:
+        # Returns the generated subclass holding a slot for each key
+        layout = cls._layouts.get((cls, keys))
+        if layout is None and len(cls._layouts) >= _FROZEN_LAYOUTS_SIZE:
+            return cls._shared_layout()
+        if layout is None:
+            slots = tuple(
+                key for key in keys
+                if isinstance(key, str) and key.isidentifier() and
+                not iskeyword(key) and not hasattr(cls, key)
+            )
+            layout = type(
+                cls.__name__,
+                (cls,),
+                {'__slots__': slots, '__module__': cls.__module__, '__qualname__': cls.__qualname__}
+            )
+            cls._layouts[(cls, keys)] = layout
+        return layout
+
+    @classmethod
+    def _rebuild(cls, keys: Tuple[Any, ...]) -> FrozenMaps:
+        # Creates an instance whose values are filled by __setstate__
+        instance = object.__new__(cls._layout(keys))
+        object.__setattr__(instance, '_map', dict.fromkeys(keys))
+        return instance
+
+    @classmethod
+    def _shared_layout(cls) -> type:
+        # Returns the subclass reading every key from the mapping, shared
+        # by the keysets past the cap
+        layout = cls._layouts.get((cls, None))
+        if layout is None:
+
+            def __getattr__(self, name: str) -> Any:
+                # Only reached for names that are not attributes
+                if name != '_map':
+                    try:
+                        return self._map[name]
+                    except KeyError:
+                        pass
+                raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+            layout = type(
+                cls.__name__,
+                (cls,),
+                {
+                    '__slots__': (),
+                    '__getattr__': __getattr__,
+                    '__module__': cls.__module__,
+                    '__qualname__': cls.__qualname__
+                }
+            )
+            cls._layouts[(cls, None)] = layout
+        return layout
+
+    @staticmethod
+    def _source_items(dictionary: Mapping) -> Iterable[Tuple[Any, Any]]:
+        # Plain dicts are converted the same way Maps converts them
+        if isinstance(dictionary, dict):
+            return (
+                (_sanitize_key(key) if isinstance(key, str) else key, _coerce_value(value))
+                for key, value in dictionary.items()
+            )
+        return dictionary.items()
+
+    # Public methods
+
+    def get(self, key: Any, default: Optional[Any] = None) -> Any:
+        """
+        Returns the value of 'key'.
+
+        If :term:`key` does not exist, :term:default` is returned
+        instead.
+        """
+
+        return self._map.get(key, default)
+
+    def items(self) -> Iterable:
+        """Returns a view of the FrozenMaps object's (key, value)
+        pairs."""
+
+        return self._map.items()
+
+    def keys(self) -> Iterable:
+        """Returns a view of the FrozenMaps object's keys."""
+
+        return self._map.keys()
+
+    def to_dict(self) -> dict:
+        """Converts the :obj:`FrozenMaps` object to a stdlib dictionary.
+
+        Returns:
+            dict:
+                The converted :obj:`FrozenMaps` object as a dictionary.
+                Frozen lists are kept as tuples.
+        """
+
+        def new_node(node: FrozenMaps) -> Tuple[dict, dict, Iterable]:
+            new_dict = {}
+            return new_dict, new_dict, node._map.items()
+
+        return _rebuild_tree(self, FrozenMaps, new_node, _identity, {}, sequence_types=(tuple,))
+
+    def values(self) -> Iterable:
+        """Returns a view of the FrozenMaps object's values."""
+
+        return self._map.values()
+
+
+class SharedMaps(Mapping):
+    """
+    A read-only view of a :obj:`Maps` tree stored in shared memory,
+    created by :meth:`Maps.share`.
+
+    Pickling a SharedMaps object only pickles the name of its block, so
+    a process pool can receive the config with every task. Each process
+    attaches to the block once and decodes a nested object the first
+    time one of its keys is read.
+
+    Note:
+        Values are decoded into the reading process, so changing a
+        mutable value (e.g. a list) does not affect other processes.
+
+    Examples:
+        >>> maps = Maps({"loader": {"batch_size": "32"}})
+        >>> with maps.share() as shared:
+        ...     pool.map(load_shard, [(shared, shard) for shard in shards])
+        >>> # In the worker
+        >>> print(shared.loader.batch_size)
+
+        Output: 32
+    """
+
+    __slots__ = ('_block', '_index', '_map')
+
+    # Class-level variables
+    _block: _SharedBlock
+    _index: int
+    _map: Optional[dict]
+
+    def __new__(cls, *args, **kwargs) -> NoReturn:
+        raise TypeError("use 'Maps.share' to create a SharedMaps object")
+
+    # Dunder methods
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._items()
+
+    def __enter__(self) -> SharedMaps:
+        return self
+
+    def __eq__(self, value: Any) -> bool:
+        if isinstance(value, SharedMaps):
+            return (self._block is value._block and self._index == value._index) or \
+                self._items() == value._items()
+        if isinstance(value, Mapping):
+            return self._items() == dict(value.items())
+        return NotImplemented
+
+    def __exit__(self, *exc_info) -> None:
+        if self._block.owner:
+            self.unlink()
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._items()[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._items()[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._items())
+
+    def __len__(self) -> int:
+        return len(self._items())
+
+    def __ne__(self, value: Any) -> bool:
+        return not self == value
+
+    def __reduce__(self) -> tuple:
+        return (SharedMaps._attach, (self.name, self._index))
+
+    def __repr__(self) -> str:
+        if self._block.view is None:
+            return f"{type(self).__name__}(<closed>)"
+        return f"{type(self).__name__}({self.name!r})"
+
+    def __setattr__(self, name: str, value: Any) -> NoReturn:
+        raise AttributeError(f"'{type(self).__name__}' object is read-only")
+
+    # Internal methods
+
+    @staticmethod
+    def _attach(name: str, index: int) -> SharedMaps:
+        return _SharedBlock.attach(name).node(index)
+
+    def _items(self) -> dict:
+        items = self._map
+        if items is None:
+            items = self._block.decode(self._index)
+            object.__setattr__(self, '_map', items)
+        return items
+
+    @classmethod
+    def _view(cls, block: _SharedBlock, index: int) -> SharedMaps:
+        view = object.__new__(cls)
+        object.__setattr__(view, '_block', block)
+        object.__setattr__(view, '_index', index)
+        object.__setattr__(view, '_map', None)
+        return view
+
+    # Public methods
+
+    def close(self) -> None:
+        """Detaches this process from the shared memory block.
+
+        Every view of the block in this process stops working. The block
+        itself lives on until :meth:`unlink` is called.
+        """
+
+        self._block.close()
+
+    def get(self, key: Any, default: Optional[Any] = None) -> Any:
+        """
+        Returns the value of 'key'.
+
+        If :term:`key` does not exist, :term:default` is returned
+        instead.
+        """
+
+        return self._items().get(key, default)
+
+    def items(self) -> Iterable:
+        """Returns a view of the SharedMaps object's (key, value)
+        pairs."""
+
+        return self._items().items()
+
+    def keys(self) -> Iterable:
+        """Returns a view of the SharedMaps object's keys."""
+
+        return self._items().keys()
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block."""
+
+        return self._block.memory.name
+
+    def to_maps(self) -> Maps:
+        """Copies the shared tree into a new, writable :obj:`Maps`
+        object."""
+
+        def new_node(node: SharedMaps) -> Tuple[Maps, OrderedDict, Iterable]:
+            maps = Maps()
+            return maps, maps._map, node._items().items()
+
+        return _rebuild_tree(self, SharedMaps, new_node, _identity, {})
+
+    def unlink(self) -> None:
+        """Frees the shared memory block once every process has closed
+        it. Only call this once, usually in the process that created
+        the block."""
+
+        self._block.memory.unlink()
+
+    def values(self) -> Iterable:
+        """Returns a view of the SharedMaps object's values."""
+
+        return self._items().values()
+
+
+class LayeredMaps(MutableMapping):
+    """
+    Resolves lookups through a stack of :obj:`Maps` layers without
+    copying them, like :obj:`collections.ChainMap` but recursively for
+    nested :obj:`Maps` objects.
+
+    The last layer is the top of the stack and takes priority. Reading
+    a nested :obj:`Maps` object returns a view merging that key across
+    every layer, unless a higher layer overrides it with a non-Maps
+    value. Writes and deletes only ever touch the top layer; writing
+    through a nested view creates the missing levels in the top layer
+    only.
+
+    Examples:
+        >>> base = Maps({"train": {"lr": "0.1", "epochs": "10"}})
+        >>> variant = LayeredMaps(base, Maps())
+        >>> variant.train.lr = 0.01
+        >>> print(variant.train.lr, variant.train.epochs, base.train.lr)
+
+        Output: 0.01 10 0.1
+
+        >>> print(variant.flatten())
+
+        Output: Maps(train=Maps(lr=0.01, epochs=10))
+
+    Raises:
+        TypeError:
+            A layer is not a :obj:`Maps` object or a dictionary.
+    """
+
+    # Class-level variables
+    _layers: List[Maps]
+    _parent: Optional[LayeredMaps]
+    _key: Any
+
+    def __init__(self, *layers: Union[dict, Maps]) -> None:
+        super().__init__()
+
+        object.__setattr__(self, '_layers', [self._as_layer(layer) for layer in layers])
+        object.__setattr__(self, '_parent', None)
+        object.__setattr__(self, '_key', None)
+
+    # Dunder methods
+
+    def __contains__(self, key: Any) -> bool:
+        return any(key in layer for layer in self.layers)
+
+    def __delattr__(self, name: str) -> None:
+        del self[name]
+
+    def __delitem__(self, key: Any) -> None:
+        top = self._top(create=False)
+        if top is None or key not in top:
+            raise KeyError(f"key is not in the top layer: {key!r}")
+        del top[key]
+
+    def __getattr__(self, name: str) -> Any:
+        # Protocol lookups (e.g. by copy and pickle) and internal
+        # attributes not yet set must not be read from the layers, which
+        # need those attributes
+        if name not in _LAYERED_ATTRS and not (name.startswith('__') and name.endswith('__')):
+            try:
+                return self[name]
+            except KeyError:
+                pass
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __getitem__(self, key: Any) -> Any:
+        for layer in reversed(self.layers):
+            value = layer.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+            if isinstance(value, Maps):
+                return self._view(key)
+            return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator:
+        seen = set()
+        for layer in self.layers:
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        return len(set().union(*self.layers))
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self[name] = value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._top(create=True)[key] = value
+
+    def __str__(self) -> str:
+        items = ", ".join("{0}={1}".format(key, repr(self[key])) for key in self)
+        return "{0}({1})".format(type(self).__name__, items)
+
+    # Internal methods
+
+    @staticmethod
+    def _as_layer(layer: Union[dict, Maps]) -> Maps:
+        if isinstance(layer, Maps):
+            return layer
+        if isinstance(layer, dict):
+            return Maps(layer)
+        raise TypeError(
+            "layers must be of type 'Maps' or 'dict': "
+            f"'{type(layer).__name__}'"
+        )
+
+    def _top(self, create: bool) -> Optional[Maps]:
+        # Returns the top layer's Maps object at this level, creating
+        # the missing levels along the way if requested
+        if self._parent is None:
+            if not self._layers:
+                if not create:
+                    return None
+                self._layers.append(Maps())
+            return self._layers[-1]
+
+        parent = self._parent._top(create)
+        if parent is None:
+            return None
+
+        value = parent.get(self._key, _MISSING)
+        if not isinstance(value, Maps):
+            if not create:
+                return None
+            value = parent[self._key] = Maps(_dynamic=parent._dynamic)
+        return value
+
+    def _view(self, key: Any) -> LayeredMaps:
+        view = object.__new__(type(self))
+        object.__setattr__(view, '_layers', None)
+        object.__setattr__(view, '_parent', self)
+        object.__setattr__(view, '_key', key)
+        return view
+
+    # Public methods
+
+    @property
+    def layers(self) -> List[Maps]:
+        """The :obj:`Maps` objects visible at this level, from the
+        bottom of the stack to the top.
+
+        For a nested view, a layer whose value is not a :obj:`Maps`
+        object hides every layer below it.
+        """
+
+        if self._parent is None:
+            return self._layers
+
+        layers = []
+        for layer in reversed(self._parent.layers):
+            value = layer.get(self._key, _MISSING)
+            if value is _MISSING:
+                continue
+            if not isinstance(value, Maps):
+                break
+            layers.append(value)
+        layers.reverse()
+        return layers
+
+    def flatten(self) -> Maps:
+        """Merges the layers into a single :obj:`Maps` object.
+
+        Nested :obj:`Maps` objects are merged into new ones, while every
+        other value is shared with the layer it came from.
+
+        Returns:
+            Maps:
+                The merged layers.
+        """
+
+        flat = Maps()
+        stack = [(self, flat)]
+
+        while stack:
+            view, target = stack.pop()
+            for key in view:
+                value = view[key]
+                if isinstance(value, LayeredMaps):
+                    child = target._map[key] = Maps()
+                    stack.append((value, child))
+                else:
+                    target._map[key] = value
+        return flat
+
+    def new_child(self, layer: Optional[Union[dict, Maps]] = None) -> LayeredMaps:
+        """Returns a new :obj:`LayeredMaps` object sharing every layer
+        of this one with :term:`layer` pushed on top.
+
+        Args:
+            layer (:obj:`Maps` or :obj:`dict`, optional):
+                The new top layer. Defaults to an empty :obj:`Maps`
+                object.
+
+        Returns:
+            LayeredMaps:
+                The new stack of layers.
+
+        Raises:
+            TypeError:
+                Called on a nested view.
+        """
+
+        if self._parent is not None:
+            raise TypeError("layers can only be added to the root 'LayeredMaps' object")
+        return type(self)(*self._layers, Maps() if layer is None else layer)
+
+    def pop(self, *args) -> Any:
+        """
+        Without arguments, removes and returns the top layer. Otherwise
+        behaves like :meth:`dict.pop` on the top layer.
+
+        Raises:
+            IndexError:
+                There are no layers to remove.
+            KeyError:
+                The key is not in the top layer and no default is given.
+            TypeError:
+                A layer is removed from a nested view.
+        """
+
+        if args:
+            return super().pop(*args)
+        if self._parent is not None:
+            raise TypeError("layers can only be removed from the root 'LayeredMaps' object")
+        return self._layers.pop()
+
+    def push(self, layer: Optional[Union[dict, Maps]] = None) -> Maps:
+        """Pushes :term:`layer` on top of the stack.
+
+        Args:
+            layer (:obj:`Maps` or :obj:`dict`, optional):
+                The new top layer. Defaults to an empty :obj:`Maps`
+                object.
+
+        Returns:
+            Maps:
+                The new top layer.
+
+        Raises:
+            TypeError:
+                Called on a nested view.
+        """
+
+        if self._parent is not None:
+            raise TypeError("layers can only be added to the root 'LayeredMaps' object")
+        layer = Maps() if layer is None else self._as_layer(layer)
+        self._layers.append(layer)
+        return layer
+
+    def to_dict(self) -> dict:
+        """Converts the merged layers to a stdlib dictionary."""
+
+        return self.flatten().to_dict()
+
+
+@functools.lru_cache(maxsize=4096)
+def _compiled_path(path: str) -> MapsPath:
+    return MapsPath(path)
+
+
+@functools.lru_cache(maxsize=256)
+def _paths_program(paths: Tuple[str, ...]) -> Tuple[List[tuple], List[int]]:
+    # Compiles several paths into steps reading one level each, so a
+    # prefix shared by several paths is only read once. Result 0 is the
+    # root; step i produces result i + 1
+    steps: List[tuple] = []
+    results: Dict[Tuple[int, Tuple[str, Optional[int]]], int] = {}
+    outputs = []
+
+    for path in paths:
+        result = 0
+        for segment in _compiled_path(path)._segments:
+            step = results.get((result, segment))
+            if step is None:
+                steps.append((result, *segment))
+                step = results[(result, segment)] = len(steps)
+            result = step
+        outputs.append(result)
+
+    return steps, outputs
+
+
+class MapsPath(object):
+    """
+    A dotted path compiled once and reused to read or write the same
+    location in many :obj:`Maps` trees, or in one tree many times.
+
+    The path is split only once, and each level is read straight from
+    the underlying mapping, so repeated deep reads skip attribute
+    lookups entirely. Missing levels are never created when reading.
+    Segments that look like integers also match integer keys, and a '.'
+    or '\\' within a key is escaped with a '\\', e.g. 'files.a\\.png'.
+
+    Examples:
+        >>> lr = Maps.compile_path("train.optimizer.lr")
+        >>> maps = Maps({"train": {"optimizer": {"lr": "0.001"}}})
+        >>> print(lr.get(maps))
+
+        Output: 0.001
+
+        >>> lr.set(maps, 0.01)
+        >>> print(maps.train.optimizer.lr)
+
+        Output: 0.01
+
+    Attributes:
+        path (:obj:`str`):
+            The dotted path.
+    """
+
+    __slots__ = ('path', '_segments')
+
+    path: str
+    _segments: Tuple[Tuple[str, Optional[int]], ...]
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+
+        if not isinstance(path, str) or not path:
+            raise ValueError(f"path must be a non-empty string: {path!r}")
+
+        self.path = path
+        self._segments = tuple(
+            (segment, int(segment) if _PATH_INDEX.fullmatch(segment) else None)
+            for segment in _split_path(path)
+        )
+
+    # Dunder methods
+
+    def __call__(self, maps: Mapping, default: Any = _MISSING) -> Any:
+        return self.get(maps, default)
+
+    def __eq__(self, value: Any) -> bool:
+        return isinstance(value, MapsPath) and value.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path!r})"
+
+    # Internal methods
+
+    @staticmethod
+    def _child(node: Any, segment: str, number: Optional[int]) -> Any:
+        # Returns the value of one level of the path, or _MISSING
+        if isinstance(node, Maps):
+            key = segment
+            value = node._map.get(key, _MISSING)
+            if value is _MISSING:
+                if number is None:
+                    return _MISSING
+                key = number
+                value = node._map.get(key, _MISSING)
+                if value is _MISSING:
+                    return _MISSING
+            if node._pending and key in node._pending:
+                return node._resolve(key)
+            return value
+
+        if isinstance(node, Mapping):
+            value = node.get(segment, _MISSING)
+            if value is _MISSING and number is not None:
+                value = node.get(number, _MISSING)
+            return value
+
+        return _MISSING
+
+    def _parent(self, maps: Maps, create: bool) -> Tuple[Maps, Any]:
+        # Returns the Maps object holding the last level, and its key
+        node = maps
+        for segment, number in self._segments[:-1]:
+            child = self._child(node, segment, number)
+            if child is _MISSING:
+                if not create:
+                    raise KeyError(self.path)
+                child = node[segment] = Maps(_dynamic=node._dynamic)
+            elif not isinstance(child, Maps):
+                raise KeyError(f"path does not lead to a 'Maps' object: '{self.path}'")
+            node = child
+
+        if not isinstance(node, Maps):
+            raise KeyError(f"path does not lead to a 'Maps' object: '{self.path}'")
+
+        segment, number = self._segments[-1]
+        if segment not in node._map and number is not None and number in node._map:
+            return node, number
+        return node, segment
+
+    # Public methods
+
+    def delete(self, maps: Maps) -> None:
+        """Deletes the value at the path.
+
+        Raises:
+            KeyError:
+                The path does not exist.
+        """
+
+        node, key = self._parent(maps, create=False)
+        del node[key]
+
+    def get(self, maps: Mapping, default: Any = _MISSING) -> Any:
+        """
+        Returns the value at the path.
+
+        Args:
+            maps (:obj:`Maps`):
+                The object to read from. Any mapping, such as a
+                :obj:`FrozenMaps` object, is also accepted.
+            default (:obj:`obj`, optional):
+                The value to return if the path does not exist.
+
+        Returns:
+            Any:
+                The value at the path, otherwise :term:`default`.
+
+        Raises:
+            KeyError:
+                The path does not exist and no default is given.
+        """
+
+        node = maps
+        for segment, number in self._segments:
+            # Fast path for fully converted Maps objects
+            if isinstance(node, Maps) and not node._pending:
+                value = node._map.get(segment, _MISSING)
+                if value is not _MISSING:
+                    node = value
+                    continue
+
+            node = self._child(node, segment, number)
+            if node is _MISSING:
+                if default is _MISSING:
+                    raise KeyError(self.path)
+                return default
+        return node
+
+    def set(self, maps: Maps, value: Any) -> None:
+        """
+        Sets the value at the path, creating the missing levels as empty
+        :obj:`Maps` objects.
+
+        Raises:
+            KeyError:
+                A level of the path exists but is not a :obj:`Maps`
+                object.
+        """
+
+        node, key = self._parent(maps, create=True)
+        node[key] = value
+
+
+def _schedule_next_tick(flush: Callable[[], None]) -> None:
+    # Runs 'flush' on the next iteration of the running event loop; with
+    # no event loop to defer to, changes are delivered right away
+    try:
+        asyncio.get_running_loop().call_soon(flush)
+        return
+    except RuntimeError:
+        pass
+
+    try:
+        from PyQt5.QtCore import QCoreApplication, QThread, QTimer
+    except ImportError:
+        pass
+    else:
+        app = QCoreApplication.instance()
+        if app is not None and QThread.currentThread() is app.thread():
+            QTimer.singleShot(0, flush)
+            return
+
+    flush()
+
+
+class ChangeTracker(object):
+    """
+    Records the dotted paths modified in a :obj:`Maps` tree and notifies
+    observers in batches.
+
+    Every write, delete or update made through a tracked :obj:`Maps`
+    object (including nested ones, and ones added later) marks its
+    dotted path as dirty, e.g. 'train.optimizer.lr'. The first change
+    schedules a flush; every change made before the flush runs is
+    coalesced into the same notification.
+
+    By default the flush is scheduled on the next tick of the running
+    asyncio event loop or, on the GUI thread, the Qt event loop. With
+    neither, changes are delivered immediately unless they are made
+    inside :meth:`batch`. Pass 'schedule' to use a different event loop;
+    it is called with the flush function.
+
+    Note:
+        Changes made directly to lists, or to a subtree that is shared
+        by several paths, are reported under the first path the subtree
+        was reached by.
+
+    Examples:
+        >>> maps = Maps({"train": {"lr": "0.1", "epochs": "10"}})
+        >>> tracker = maps.track_changes(print)
+        >>> with tracker.batch():
+        ...     maps.train.lr = 0.01
+        ...     maps.train.epochs = 20
+
+        Output: frozenset({'train.lr', 'train.epochs'})
+    """
+
+    def __init__(self,
+                 maps: Maps,
+                 schedule: Optional[Callable[[Callable[[], None]], Any]] = None) -> None:
+        super().__init__()
+
+        self._batches = 0
+        self._dirty: set = set()
+        self._lock = threading.RLock()
+        self._maps = maps
+        self._observers: List[Callable[[FrozenSet[str]], Any]] = []
+        self._schedule = schedule or _schedule_next_tick
+        self._scheduled = False
+
+        self._attach(maps, '')
+
+    # Internal methods
+
+    def _attach(self, value: Any, prefix: str) -> None:
+        stack = [(value, prefix)]
+        while stack:
+            value, prefix = stack.pop()
+            if isinstance(value, Maps):
+                if value._watchers is None:
+                    value._watchers = {}
+                elif self in value._watchers:
+                    continue
+                value._watchers[self] = prefix
+                children = value._map.items()
+            elif isinstance(value, (list, tuple)):
+                children = enumerate(value)
+            else:
+                continue
+
+            stack.extend(
+                (child, f"{prefix}{key}.") for key, child in children
+                if isinstance(child, (Maps, list, tuple))
+            )
+
+    def _detach(self, value: Any, prefix: str) -> None:
+        stack = [(value, prefix)]
+        while stack:
+            value, prefix = stack.pop()
+            if isinstance(value, Maps):
+                if value._watchers is None or value._watchers.get(self) != prefix:
+                    # Not tracked, or tracked through another path
+                    continue
+                del value._watchers[self]
+                if not value._watchers:
+                    value._watchers = None
+                children = value._map.items()
+            elif isinstance(value, (list, tuple)):
+                children = enumerate(value)
+            else:
+                continue
+
+            stack.extend(
+                (child, f"{prefix}{key}.") for key, child in children
+                if isinstance(child, (Maps, list, tuple))
+            )
+
+    def _mark(self, path: str) -> None:
+        with self._lock:
+            self._dirty.add(path)
+            if self._scheduled or self._batches:
+                return
+            self._scheduled = True
+        self._schedule(self.flush)
+
+    # Public methods
+
+    @contextmanager
+    def batch(self) -> Generator[ChangeTracker, None, None]:
+        """Holds back notifications until the block exits, then
+        schedules a single flush for every change made inside it."""
+
+        with self._lock:
+            self._batches += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batches -= 1
+                schedule = not self._batches and self._dirty and not self._scheduled
+                if schedule:
+                    self._scheduled = True
+            if schedule:
+                self._schedule(self.flush)
+
+    def detach(self) -> None:
+        """Stops tracking the :obj:`Maps` tree. Pending changes are
+        discarded."""
+
+        self._detach(self._maps, '')
+        with self._lock:
+            self._dirty.clear()
+
+    @property
+    def dirty(self) -> FrozenSet[str]:
+        """The dotted paths changed since the last flush."""
+
+        with self._lock:
+            return frozenset(self._dirty)
+
+    def flush(self) -> None:
+        """Notifies every observer of the paths changed since the last
+        flush, if any."""
+
+        with self._lock:
+            paths = frozenset(self._dirty)
+            self._dirty.clear()
+            self._scheduled = False
+
+        if paths:
+            for callback in tuple(self._observers):
+                callback(paths)
+
+    def subscribe(self, callback: Callable[[FrozenSet[str]], Any]) -> None:
+        """Registers an observer.
+
+        Args:
+            callback (:obj:`Callable`):
+                Called with a :obj:`frozenset` of the dotted paths that
+                changed since the last notification.
+        """
+
+        self._observers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[FrozenSet[str]], Any]) -> None:
+        """Removes an observer registered with :meth:`subscribe`."""
+
+        self._observers.remove(callback)
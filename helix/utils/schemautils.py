@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Validates configs once and compiles them into typed records.
+
+A 'Schema' subclass declares its fields with 'Field'. Calling
+'compile' on the subclass validates a Maps object (or any mapping)
+against the declared types, defaults, ranges and choices, and returns an
+instance of the subclass: an immutable, slotted record. Every violation
+is collected and reported at once through a 'SchemaError'.
+
+Example Usage:
+    >>> class Optimizer(Schema):
+    ...     name = Field(str, choices=("adam", "sgd"))
+    ...     lr = Field(float, default=0.001, minimum=0)
+    ...
+    >>> class Train(Schema):
+    ...     epochs = Field(int, minimum=1)
+    ...     optimizer = Field(Optimizer)
+    ...
+    >>> train = Train.compile(Maps.load_ini("train.ini", to_maps=True).train)
+    >>> train.optimizer.lr
+    0.001
+
+Importing everything from this module will only import the Field,
+Schema and SchemaError classes (as defined by the '__all__' attribute).
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["Field", "Schema", "SchemaError"]
+
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, List, NoReturn, Optional, Tuple, Union
+
+
+# Marks a field without a default, i.e. a required field
+_REQUIRED = object()
+
+
+class SchemaError(ValueError):
+    """Raised when a config does not match a :obj:`Schema`.
+
+    Attributes:
+        violations (:obj:`list`):
+            Every (dotted path, message) pair found while compiling.
+    """
+
+    violations: List[Tuple[str, str]]
+
+    def __init__(self, violations: List[Tuple[str, str]]) -> None:
+        self.violations = violations
+
+        lines = "\n".join(f"  {path or '<root>'}: {message}" for path, message in violations)
+        super().__init__(f"{len(violations)} schema violation(s):\n{lines}")
+
+
+class Field(object):
+    """Declares a field of a :obj:`Schema`.
+
+    Args:
+        type (:obj:`type` or :obj:`tuple`, optional):
+            The accepted type(s), or a :obj:`Schema` subclass for a
+            nested record. An int is accepted for a float field and a
+            list is frozen into a tuple for a tuple field. Any type is
+            accepted if omitted.
+        default (:obj:`obj`, optional):
+            The value used when the key is missing. The field is
+            required if omitted.
+        minimum (:obj:`obj`, optional):
+            The smallest accepted value (inclusive).
+        maximum (:obj:`obj`, optional):
+            The largest accepted value (inclusive).
+        choices (:obj:`Iterable`, optional):
+            The only accepted values.
+        optional (:obj:`bool`):
+            Whether None is accepted.
+    """
+
+    __slots__ = ('type', 'default', 'minimum', 'maximum', 'choices', 'optional')
+
+    def __init__(self,
+                 type: Optional[Union[type, Tuple[type, ...]]] = None,
+                 default: Any = _REQUIRED,
+                 minimum: Optional[Any] = None,
+                 maximum: Optional[Any] = None,
+                 choices: Optional[Iterable] = None,
+                 optional: bool = False) -> None:
+        super().__init__()
+
+        self.type = type
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = None if choices is None else tuple(choices)
+        self.optional = optional
+
+    def __repr__(self) -> str:
+        name = getattr(self.type, '__name__', repr(self.type))
+        return f"{type(self).__name__}({name})"
+
+    @property
+    def required(self) -> bool:
+        """Whether the field has no default."""
+
+        return self.default is _REQUIRED
+
+    def convert(self, value: Any, path: str, violations: List[Tuple[str, str]]) -> Any:
+        """Validates :term:`value`, returning it converted to the field's
+        type. Violations are appended to :term:`violations`."""
+
+        if value is None:
+            if not self.optional:
+                violations.append((path, "must not be None"))
+            return None
+
+        expected = self.type
+        if isinstance(expected, SchemaMeta):
+            if not isinstance(value, Mapping):
+                violations.append((path, f"expected a mapping, got '{type(value).__name__}'"))
+                return None
+            return expected._compile(value, path, violations)
+
+        if expected is not None:
+            value = self._convert_type(value, expected)
+            if value is _REQUIRED:
+                return self._type_violation(path, violations)
+
+        if self.choices is not None and value not in self.choices:
+            violations.append((path, f"must be one of {self.choices}, got {value!r}"))
+        try:
+            if self.minimum is not None and value < self.minimum:
+                violations.append((path, f"must be >= {self.minimum!r}, got {value!r}"))
+            if self.maximum is not None and value > self.maximum:
+                violations.append((path, f"must be <= {self.maximum!r}, got {value!r}"))
+        except TypeError:
+            violations.append((path, f"cannot be compared with the range, got {value!r}"))
+
+        return value
+
+    def _convert_type(self, value: Any, expected: Union[type, Tuple[type, ...]]) -> Any:
+        # Returns the converted value, or _REQUIRED if it has the wrong
+        # type
+        types = expected if isinstance(expected, tuple) else (expected,)
+
+        # bool subclasses int, but a flag is never a valid number
+        if isinstance(value, bool) and bool not in types:
+            return _REQUIRED
+        if isinstance(value, types):
+            return value
+        if float in types and isinstance(value, int):
+            return float(value)
+        if tuple in types and isinstance(value, list):
+            return tuple(value)
+        return _REQUIRED
+
+    def _type_violation(self, path: str, violations: List[Tuple[str, str]]) -> None:
+        types = self.type if isinstance(self.type, tuple) else (self.type,)
+        names = " or ".join(f"'{expected.__name__}'" for expected in types)
+        violations.append((path, f"expected {names}"))
+
+
+class SchemaMeta(type):
+    """Turns the :obj:`Field` attributes of a :obj:`Schema` subclass
+    into slots."""
+
+    def __new__(mcls, name: str, bases: Tuple[type, ...], namespace: Dict[str, Any]) -> SchemaMeta:
+        fields: Dict[str, Field] = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, '_fields', {}))
+
+        own = {key: value for key, value in namespace.items() if isinstance(value, Field)}
+        for key in own:
+            del namespace[key]
+        fields.update(own)
+
+        namespace['__slots__'] = tuple(own)
+        namespace['_fields'] = fields
+        return super().__new__(mcls, name, bases, namespace)
+
+
+class Schema(object, metaclass=SchemaMeta):
+    """
+    The base class of schemas. Subclasses declare their fields with
+    :obj:`Field` class attributes; instances are the compiled, immutable
+    records.
+
+    Use :meth:`compile` to create a record.
+    """
+
+    __slots__ = ()
+
+    # Class-level variables
+    _fields: Dict[str, Field]
+
+    def __init__(self, *args, **kwargs) -> NoReturn:
+        raise TypeError(f"use '{type(self).__name__}.compile' to create a record")
+
+    # Dunder methods
+
+    def __delattr__(self, name: str) -> NoReturn:
+        raise AttributeError(f"'{type(self).__name__}' record is immutable")
+
+    def __eq__(self, value: Any) -> bool:
+        if type(value) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(value, name) for name in self._fields)
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, name) for name in self._fields))
+
+    def __reduce__(self) -> tuple:
+        return (type(self)._from_values, (tuple(getattr(self, name) for name in self._fields),))
+
+    def __repr__(self) -> str:
+        items = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({items})"
+
+    def __setattr__(self, name: str, value: Any) -> NoReturn:
+        raise AttributeError(f"'{type(self).__name__}' record is immutable")
+
+    # Internal methods
+
+    @classmethod
+    def _compile(cls,
+                 config: Mapping,
+                 path: str,
+                 violations: List[Tuple[str, str]],
+                 strict: bool = False) -> Schema:
+        record = object.__new__(cls)
+        prefix = f"{path}." if path else ''
+
+        for name, field in cls._fields.items():
+            value = config.get(name, _REQUIRED)
+            if value is _REQUIRED:
+                if field.required:
+                    violations.append((f"{prefix}{name}", "is required"))
+                    value = None
+                elif isinstance(field.type, SchemaMeta) and isinstance(field.default, Mapping):
+                    value = field.convert(field.default, f"{prefix}{name}", violations)
+                else:
+                    value = field.default
+            else:
+                value = field.convert(value, f"{prefix}{name}", violations)
+            object.__setattr__(record, name, value)
+
+        if strict:
+            for key in config:
+                if key not in cls._fields:
+                    violations.append((f"{prefix}{key}", "is not declared in the schema"))
+
+        return record
+
+    @classmethod
+    def _from_values(cls, values: Tuple[Any, ...]) -> Schema:
+        record = object.__new__(cls)
+        for name, value in zip(cls._fields, values):
+            object.__setattr__(record, name, value)
+        return record
+
+    # Public methods
+
+    @classmethod
+    def compile(cls, config: Mapping, strict: bool = False) -> Schema:
+        """
+        Validates :term:`config` against the schema and compiles it into
+        a record.
+
+        Args:
+            config (:obj:`Mapping`):
+                The config to compile, usually a :obj:`Maps` object.
+            strict (:obj:`bool`):
+                Whether keys that are not declared in the schema are
+                violations. Only checked at the top level.
+
+        Returns:
+            Schema:
+                The compiled record, an instance of the schema.
+
+        Raises:
+            SchemaError:
+                The config does not match the schema. Every violation is
+                listed.
+            TypeError:
+                :obj:`config` is not a mapping.
+        """
+
+        if not isinstance(config, Mapping):
+            raise TypeError(
+                "argument 'config' must be a mapping: "
+                f"'{type(config).__name__}'"
+            )
+
+        violations: List[Tuple[str, str]] = []
+        record = cls._compile(config, '', violations, strict=strict)
+        if violations:
+            raise SchemaError(violations)
+        return record
+
+    @classmethod
+    def fields(cls) -> Dict[str, Field]:
+        """Returns the declared fields, including inherited ones."""
+
+        return dict(cls._fields)
+
+    def to_dict(self) -> dict:
+        """Converts the record to a stdlib dictionary."""
+
+        new_dict = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            new_dict[name] = value.to_dict() if isinstance(value, Schema) else value
+        return new_dict
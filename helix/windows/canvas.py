@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Displays very large images from their tile pyramid.
+
+'TileCanvas' only draws the tiles of a 'TilePyramid' that are visible at
+the current zoom, from the level matching it. Tiles are decoded on a
+thread pool and kept in a byte-bounded 'ImageCache', so memory stays
+constant however large the image is. A tile never changes once built
+(an edited image gets a new pyramid), so repaints look tiles up by path
+without a stat. While a tile loads, the matching
+part of a coarser tile already in memory is drawn in its place.
+
+Example Usage:
+    >>> canvas = TileCanvas(parent)
+    >>> canvas.open("/data/slide.tif")
+
+If importing all (i.e. 'from canvas import *'), only 'TileCanvas' will
+be imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["TileCanvas"]
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+
+from PyQt5.QtCore import QPoint, QPointF, QRectF, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QMouseEvent, QPainter, QPaintEvent, QResizeEvent, QWheelEvent
+from PyQt5.QtWidgets import QWidget
+
+from helix.core.browser import decode_image
+from helix.core.imagecache import ImageCache
+from helix.core.tiles import TilePyramid
+
+
+class TileCanvas(QWidget):
+    """Pans and zooms over the tile pyramid of an image.
+
+    Drag to pan and use the mouse wheel to zoom about the cursor.
+
+    Args:
+        parent (:obj:`QWidget`, optional):
+            The parent widget.
+        cache (:obj:`ImageCache`, optional):
+            The cache of decoded tiles. Defaults to one of 256 MiB.
+        cache_dir (:obj:`str`, optional):
+            The directory pyramids are stored in; see
+            :obj:`TilePyramid`.
+        workers (:obj:`int`, optional):
+            The number of threads building pyramids and loading tiles.
+
+    Attributes:
+        pyramid_ready (:obj:`pyqtSignal`):
+            The signal fired with the path of an opened image once its
+            pyramid is built and it is shown.
+        pyramid_failed (:obj:`pyqtSignal`):
+            The signal fired with the path of an opened image and an
+            error message if its pyramid cannot be built.
+        progress (:obj:`pyqtSignal`):
+            The signal fired with the fraction of the pyramid built.
+    """
+
+    pyramid_ready = pyqtSignal(str)
+    pyramid_failed = pyqtSignal(str, str)
+    progress = pyqtSignal(float)
+
+    # Carry worker results back to the GUI thread
+    _built = pyqtSignal(int, object, str)
+    _tile_loaded = pyqtSignal(int)
+
+    _generation: int
+    _offset: QPointF
+    _pending: Set[str]
+    _pyramid: Optional[TilePyramid]
+    _scale: float
+    _wanted: Set[str]
+
+    def __init__(self,
+                 parent: Optional[QWidget] = None,
+                 cache: Optional[ImageCache] = None,
+                 cache_dir: Optional[str] = None,
+                 workers: Optional[int] = None) -> None:
+        super().__init__(parent)
+
+        self.cache = cache if cache is not None else ImageCache(256 << 20)
+        self.cache_dir = cache_dir
+        self.background = QColor(26, 30, 50)
+
+        self._drag_start: Optional[QPoint] = None
+        self._failed: Set[str] = set()
+        self._generation = 0
+        # The image pixel drawn at the top-left corner of the widget
+        self._offset = QPointF(0, 0)
+        self._pending = set()
+        self._pyramid = None
+        # Widget pixels per full resolution image pixel
+        self._scale = 1.0
+        self._wanted = set()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or max(2, (os.cpu_count() or 2) // 2),
+            thread_name_prefix="helix-tiles"
+        )
+        self._built.connect(self._on_built, Qt.QueuedConnection)
+        self._tile_loaded.connect(self._on_tile_loaded, Qt.QueuedConnection)
+
+        self.setMouseTracking(False)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    # Internal methods
+
+    def _build(self, generation: int, path: str) -> None:
+        # Runs on a worker thread
+        try:
+            pyramid = TilePyramid(path, cache_dir=self.cache_dir)
+            pyramid.build(self.progress.emit)
+        except Exception as error:
+            self._built.emit(generation, path, str(error))
+        else:
+            self._built.emit(generation, pyramid, '')
+
+    def _draw_fallback(self, painter: QPainter, level: int, column: int, row: int, target: QRectF) -> None:
+        # Draws the part of the closest coarser tile in memory covering
+        # the missing tile
+        size = self._pyramid.tile_size
+        for coarser in range(level + 1, self._pyramid.levels):
+            shift = coarser - level
+            parent = self.cache.peek(self._pyramid.tile_path(coarser, column >> shift, row >> shift), stat=False)
+            if parent is None:
+                continue
+
+            span = size / (1 << shift)
+            source = QRectF(
+                (column - ((column >> shift) << shift)) * span,
+                (row - ((row >> shift) << shift)) * span,
+                span,
+                span
+            ).intersected(QRectF(parent.rect()))
+            if source.isEmpty():
+                return
+
+            # Edge tiles are smaller than a full tile
+            scale = (1 << coarser) * self._scale
+            painter.drawImage(
+                QRectF(target.x(), target.y(), source.width() * scale, source.height() * scale),
+                parent,
+                source
+            )
+            return
+
+    def _load_tile(self, generation: int, path: str) -> None:
+        # Runs on a worker thread; tiles scrolled out of view while
+        # queued are skipped
+        if generation == self._generation and path in self._wanted:
+            try:
+                self.cache.get_or_decode(path, None, decode_image, stat=False)
+            except OSError:
+                # Not requested again, or the canvas would keep retrying
+                self._failed.add(path)
+        self._tile_loaded.emit(generation)
+
+    def _on_built(self, generation: int, pyramid: object, error: str) -> None:
+        if generation != self._generation:
+            return
+        if error:
+            self.pyramid_failed.emit(pyramid, error)
+            return
+
+        self._pyramid = pyramid
+        self.fit()
+        self.pyramid_ready.emit(pyramid.path)
+
+    def _on_tile_loaded(self, generation: int) -> None:
+        if generation == self._generation:
+            self.update()
+
+    def _request(self, path: str) -> None:
+        if path in self._failed:
+            return
+        self._wanted.add(path)
+        if path not in self._pending:
+            self._pending.add(path)
+            future = self._executor.submit(self._load_tile, self._generation, path)
+            future.add_done_callback(lambda _: self._pending.discard(path))
+
+    # Public methods
+
+    def fit(self) -> None:
+        """Zooms to show the whole image, centred."""
+
+        if self._pyramid is None:
+            return
+
+        width, height = self._pyramid.width, self._pyramid.height
+        self._scale = min(self.width() / width, self.height() / height) or 1.0
+        self._offset = QPointF(
+            (width - self.width() / self._scale) / 2,
+            (height - self.height() / self._scale) / 2
+        )
+        self.update()
+
+    def open(self, path: str) -> None:
+        """Shows the image at :term:`path`, building its pyramid on a
+        worker thread first if it is not cached."""
+
+        self._generation += 1
+        self._failed = set()
+        self._pyramid = None
+        self._wanted = set()
+        self.update()
+
+        self._executor.submit(self._build, self._generation, path)
+
+    @property
+    def pyramid(self) -> Optional[TilePyramid]:
+        """The pyramid of the image shown, if any."""
+
+        return self._pyramid
+
+    @property
+    def scale(self) -> float:
+        """The number of widget pixels per full resolution image
+        pixel."""
+
+        return self._scale
+
+    def set_scale(self, scale: float, anchor: Optional[QPointF] = None) -> None:
+        """Zooms to :term:`scale`, keeping the image point under the
+        widget point :term:`anchor` (the centre by default) in place."""
+
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+
+        anchored = self._offset + anchor / self._scale
+        self._scale = max(1e-4, min(scale, 32.0))
+        self._offset = anchored - anchor / self._scale
+        self.update()
+
+    def shutdown(self) -> None:
+        """Stops the worker threads. Queued work is dropped."""
+
+        self._generation += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Qt events
+
+    def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        if self._drag_start is not None:
+            delta = event.pos() - self._drag_start
+            self._drag_start = event.pos()
+            self._offset -= QPointF(delta) / self._scale
+            self.update()
+
+    def mousePressEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.LeftButton:
+            self._drag_start = event.pos()
+
+    def mouseReleaseEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.LeftButton:
+            self._drag_start = None
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.background)
+
+        pyramid = self._pyramid
+        if pyramid is None:
+            return
+
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+
+        level = pyramid.level_for_scale(self._scale)
+        span = pyramid.tile_size << level
+        left, top = self._offset.x(), self._offset.y()
+        right = left + self.width() / self._scale
+        bottom = top + self.height() / self._scale
+
+        wanted = set()
+        for column, row in pyramid.visible_tiles(level, left, top, right, bottom):
+            path = pyramid.tile_path(level, column, row)
+            tile = self.cache.peek(path, stat=False)
+
+            x = (column * span - left) * self._scale
+            y = (row * span - top) * self._scale
+            if tile is not None:
+                target = QRectF(x, y, tile.width() * (1 << level) * self._scale,
+                                tile.height() * (1 << level) * self._scale)
+                painter.drawImage(target, tile)
+            else:
+                wanted.add(path)
+                self._draw_fallback(painter, level, column, row, QRectF(x, y, span * self._scale,
+                                                                        span * self._scale))
+
+        # Tiles no longer visible are dropped from the queue
+        self._wanted = wanted
+        for path in wanted:
+            self._request(path)
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        super().resizeEvent(event)
+        if self._pyramid is not None and not event.oldSize().isValid():
+            self.fit()
+
+    def wheelEvent(self, event: QWheelEvent) -> None:
+        steps = event.angleDelta().y() / 120
+        self.set_scale(self._scale * 1.25 ** steps, QPointF(event.pos()))
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Compiles the Qt Designer sources into cached Python modules.
+
+'data/designer/resources.qrc' is compiled with pyrcc and
+'data/designer/helix.ui' with pyuic. The modules are written to the
+user's cache directory and only regenerated when a source (or an image
+listed in the resource file) changes, so the compilers run once per
+change rather than on every start.
+
+'load_resources' registers the compiled images under their ':/images/'
+paths and is called when the main window is built. 'load_ui' returns the
+module generated from 'helix.ui'.
+
+Run from the root of the repository to compile ahead of time:
+    $ python -m helix.windows.designer [--force]
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["compile_resources", "compile_ui", "load_resources", "load_ui"]
+
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from types import ModuleType
+from typing import List, Optional
+
+
+DESIGNER_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "designer"
+)
+RESOURCE_FILE = os.path.join(DESIGNER_DIR, "resources.qrc")
+UI_FILE = os.path.join(DESIGNER_DIR, "helix.ui")
+
+# The name pyuic imports the compiled resources by
+_RESOURCE_MODULE = "resources_rc"
+_UI_MODULE = "helix_ui"
+
+# Bumped when the way modules are generated changes
+_BUILD_VERSION = 1
+_STAMP_PREFIX = "# helix-build: "
+
+
+def _default_cache_dir() -> str:
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'helix', 'designer')
+
+
+def _resource_sources(path: str) -> List[str]:
+    # The resource file and every file it lists
+    directory = os.path.dirname(path)
+    sources = [path]
+    for node in ElementTree.parse(path).getroot().iter('file'):
+        sources.append(os.path.normpath(os.path.join(directory, node.text.strip())))
+    return sources
+
+
+def _stamp(sources: List[str]) -> str:
+    # Identifies the sources by their size and modification time, which
+    # is enough to notice an edit without reading every image
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{_BUILD_VERSION}\0".encode())
+    for source in sources:
+        info = os.stat(source)
+        digest.update(f"{source}\0{info.st_size}\0{info.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def _is_current(target: str, stamp: str) -> bool:
+    try:
+        with open(target, encoding='utf-8') as file:
+            return file.readline().rstrip('\n') == f"{_STAMP_PREFIX}{stamp}"
+    except OSError:
+        return False
+
+
+def _write_module(target: str, stamp: str, source: str) -> None:
+    # Written to a temporary file and moved into place so a concurrent
+    # start never imports a partial module
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            file.write(f"{_STAMP_PREFIX}{stamp}\n")
+            file.write(source)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _import_file(name: str, path: str) -> ModuleType:
+    module = sys.modules.get(name)
+    if module is not None and getattr(module, '__file__', None) == path:
+        return module
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def compile_resources(cache_dir: Optional[str] = None, force: bool = False) -> str:
+    """
+    Compiles 'resources.qrc' unless the cached module is up to date.
+
+    Args:
+        cache_dir (:obj:`str`, optional):
+            The directory the module is written to. Defaults to
+            '$XDG_CACHE_HOME/helix/designer' (or '~/.cache/...').
+        force (:obj:`bool`):
+            Compile even if the cached module is up to date.
+
+    Returns:
+        str:
+            The path of the compiled module.
+
+    Raises:
+        FileNotFoundError:
+            The resource file or an image it lists does not exist.
+    """
+
+    target = os.path.join(cache_dir or _default_cache_dir(), f"{_RESOURCE_MODULE}.py")
+    stamp = _stamp(_resource_sources(RESOURCE_FILE))
+    if not force and _is_current(target, stamp):
+        return target
+
+    from PyQt5.pyrcc_main import processResourceFile
+
+    # pyrcc only writes to a path, so the output is staged next to the
+    # target before being stamped
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    descriptor, staged = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.py')
+    os.close(descriptor)
+    try:
+        if not processResourceFile([RESOURCE_FILE], staged, False):
+            raise RuntimeError(f"failed to compile '{RESOURCE_FILE}'")
+        with open(staged, encoding='utf-8') as file:
+            source = file.read()
+    finally:
+        os.unlink(staged)
+
+    _write_module(target, stamp, source)
+    return target
+
+
+def compile_ui(cache_dir: Optional[str] = None, force: bool = False) -> str:
+    """
+    Compiles 'helix.ui' unless the cached module is up to date.
+
+    Args:
+        cache_dir (:obj:`str`, optional):
+            The directory the module is written to. Defaults to
+            '$XDG_CACHE_HOME/helix/designer' (or '~/.cache/...').
+        force (:obj:`bool`):
+            Compile even if the cached module is up to date.
+
+    Returns:
+        str:
+            The path of the compiled module.
+
+    Raises:
+        FileNotFoundError:
+            The UI file does not exist.
+    """
+
+    target = os.path.join(cache_dir or _default_cache_dir(), f"{_UI_MODULE}.py")
+    stamp = _stamp([UI_FILE])
+    if not force and _is_current(target, stamp):
+        return target
+
+    import io
+    from PyQt5.uic import compileUi
+
+    output = io.StringIO()
+    compileUi(UI_FILE, output)
+
+    _write_module(target, stamp, output.getvalue())
+    return target
+
+
+def load_resources(cache_dir: Optional[str] = None) -> bool:
+    """
+    Compiles the resources if needed and registers them with Qt, so the
+    ':/images/...' paths resolve. Loading twice is a no-op.
+
+    Returns:
+        bool:
+            Whether the resources are loaded. False if the designer
+            sources are not installed.
+    """
+
+    if _RESOURCE_MODULE in sys.modules:
+        return True
+    if not os.path.exists(RESOURCE_FILE):
+        return False
+
+    _import_file(_RESOURCE_MODULE, compile_resources(cache_dir))
+    return True
+
+
+def load_ui(cache_dir: Optional[str] = None) -> ModuleType:
+    """
+    Compiles 'helix.ui' if needed and imports it.
+
+    Returns:
+        ModuleType:
+            The generated module, holding the designer's 'Ui_Helix'
+            class.
+    """
+
+    # The generated module imports the resources by name
+    load_resources(cache_dir)
+    return _import_file(_UI_MODULE, compile_ui(cache_dir))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compiles the Qt Designer sources.")
+    parser.add_argument("--cache-dir", help="the directory the modules are written to")
+    parser.add_argument("--force", action="store_true", help="compile even if up to date")
+    args = parser.parse_args()
+
+    print(compile_resources(args.cache_dir, args.force))
+    print(compile_ui(args.cache_dir, args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Shows the thumbnails of a dataset in a single scrolling row.
+
+'Filmstrip' lists every image of a dataset as soon as its directory is
+scanned and fills in thumbnails as a 'DatasetIndexer' sends them, so a
+dataset of tens of thousands of images is browsable at once.
+
+Example Usage:
+    >>> filmstrip = Filmstrip(parent)
+    >>> filmstrip.set_indexer(indexer)
+    >>> filmstrip.image_selected.connect(browser.go_to)
+
+If importing all (i.e. 'from filmstrip import *'), only 'Filmstrip' will
+be imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["Filmstrip"]
+
+
+import os
+from typing import List, Optional
+
+from PyQt5.QtCore import QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QIcon, QImage, QPixmap
+from PyQt5.QtWidgets import QListView, QListWidget, QListWidgetItem, QWidget
+
+from helix.core.indexer import DatasetIndexer
+
+
+class Filmstrip(QListWidget):
+    """A horizontal strip of the thumbnails of a dataset.
+
+    Args:
+        parent (:obj:`QWidget`, optional):
+            The parent widget.
+        thumbnail_size (:obj:`int`):
+            The largest width or height a thumbnail is shown at.
+
+    Attributes:
+        image_selected (:obj:`pyqtSignal`):
+            The signal fired with the index of the image selected.
+    """
+
+    image_selected = pyqtSignal(int)
+
+    def __init__(self, parent: Optional[QWidget] = None, thumbnail_size: int = 128) -> None:
+        super().__init__(parent)
+
+        self.setFlow(QListView.LeftToRight)
+        self.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.setMovement(QListView.Static)
+        self.setViewMode(QListView.IconMode)
+        self.setWrapping(False)
+
+        # Lays out items in batches, and without measuring each of them,
+        # so huge datasets are listed at once
+        self.setBatchSize(500)
+        self.setLayoutMode(QListView.Batched)
+        self.setUniformItemSizes(True)
+
+        self.setFixedHeight(thumbnail_size + 2 * self.fontMetrics().height() + 16)
+        self.setHorizontalScrollMode(QListView.ScrollPerPixel)
+
+        self.currentRowChanged.connect(self._on_row_changed)
+
+    # Internal methods
+
+    def _on_row_changed(self, row: int) -> None:
+        if row >= 0:
+            self.image_selected.emit(row)
+
+    # Public methods
+
+    def set_indexer(self, indexer: DatasetIndexer) -> None:
+        """Shows the datasets indexed by :term:`indexer`."""
+
+        indexer.scanned.connect(self.set_paths)
+        indexer.thumbnail_ready.connect(self.set_thumbnail)
+
+    def set_paths(self, paths: List[str]) -> None:
+        """Lists :term:`paths`, keeping the thumbnails of those already
+        listed."""
+
+        icons = {}
+        for row in range(self.count()):
+            item = self.item(row)
+            if not item.icon().isNull():
+                icons[item.data(Qt.UserRole)] = item.icon()
+
+        self.clear()
+        for path in paths:
+            item = QListWidgetItem(os.path.basename(path))
+            item.setData(Qt.UserRole, path)
+            item.setToolTip(path)
+            if path in icons:
+                item.setIcon(icons[path])
+            self.addItem(item)
+
+    def set_thumbnail(self, index: int, path: str, image: QImage) -> None:
+        """Shows :term:`image` as the thumbnail of image
+        :term:`index`."""
+
+        item = self.item(index)
+        # Thumbnails of a dataset no longer shown are dropped
+        if item is not None and item.data(Qt.UserRole) == path:
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
@@ -53,6 +53,8 @@ from PyQt5.QtWidgets import (
     QWidget
 )
 
+from helix.windows.designer import load_resources
+
 
 class Ui_Helix(object):
     """Contains the widgets used in the main window of the application.
@@ -165,6 +167,9 @@ class Ui_Helix(object):
             ...         self.setup_ui(self)
         """
 
+        # Register the compiled ':/images/...' resources used by the icons
+        load_resources()
+
         # Create base window
         Helix.resize(1920, 1080)
         Helix.setMinimumSize(QSize(800, 600))
@@ -27,12 +27,142 @@ from __future__ import division
 from __future__ import print_function
 
 
+from typing import TYPE_CHECKING, Optional
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QCloseEvent, QKeyEvent, QKeySequence
+from PyQt5.QtWidgets import QFileDialog, QLabel, QShortcut, QVBoxLayout, QWidget
+
+from helix.core.indexer import DatasetIndexer
 from helix.windows.basewindows import BaseMainWindowView
+from helix.windows.filmstrip import Filmstrip
+from helix.windows.pagemanager import PageManager
 from .ui import Ui_Helix
 
+if TYPE_CHECKING:
+    # Imported when a dataset is opened; they load numpy, which would
+    # slow the first paint
+    from helix.core.journal import AnnotationJournal
+    from helix.core.undo import UndoStack
+
+
 class HelixWindowView(Ui_Helix, BaseMainWindowView):
+    """The main window of the application.
+
+    Each navbar button shows the page of its mode in :attr:`pages`.
+    Pages are built the first time they are shown. Ctrl+Shift+O opens a
+    dataset in the filmstrip of the annotation page, and the platform's
+    undo and redo keys undo and redo its annotation edits.
+
+    Attributes:
+        indexer (:obj:`DatasetIndexer`):
+            Scans opened datasets and generates their thumbnails.
+        journal (:obj:`AnnotationJournal`):
+            Saves the annotations of the open dataset, if any, as they
+            are edited.
+        undo_stack (:obj:`UndoStack`):
+            The undo history of the annotations of the open dataset, if
+            any.
+        pages (:obj:`PageManager`):
+            The stacked widget hosting the page of each mode, in place
+            of the default content window.
+    """
+
+    indexer: DatasetIndexer
+    journal: Optional[AnnotationJournal]
+    pages: PageManager
+    undo_stack: Optional[UndoStack]
 
     def __init__(self) -> None:
         super().__init__()
 
         self.setup_ui(self)
+        self._setup_pages()
+
+        self.indexer = DatasetIndexer(self)
+        self.journal = None
+        self.undo_stack = None
+        self.closed.connect(self._on_closed)
+        self.keypressed.connect(self._on_key_pressed)
+
+        self.open_dataset_shortcut = QShortcut(QKeySequence("Ctrl+Shift+O"), self)
+        self.open_dataset_shortcut.activated.connect(self.open_dataset)
+
+    def _annotation_page(self) -> QWidget:
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._placeholder_page("ANNOTATION"), 1)
+
+        filmstrip = Filmstrip(page)
+        filmstrip.set_indexer(self.indexer)
+        layout.addWidget(filmstrip)
+        return page
+
+    def _setup_pages(self) -> None:
+        self.pages = PageManager(self.main_content)
+        self.pages.setObjectName("pages")
+        self.pages.setSizePolicy(self.content.sizePolicy())
+
+        self.main_content_layout.replaceWidget(self.content, self.pages)
+
+        # The default content window is the home page until one exists
+        self.pages.register("home", lambda: self.content, pinned=True)
+        # Pinned, as it holds the filmstrip of the open dataset
+        self.pages.register("annotation", self._annotation_page, pinned=True)
+        self.pages.register("train", lambda: self._placeholder_page("TRAIN"))
+        self.pages.register("eval", lambda: self._placeholder_page("EVALUATION"), heavy=True)
+
+        self.home_btn.clicked.connect(lambda: self.pages.show_page("home"))
+        self.annotation_btn.clicked.connect(lambda: self.pages.show_page("annotation"))
+        self.train_btn.clicked.connect(lambda: self.pages.show_page("train"))
+        self.eval_btn.clicked.connect(lambda: self.pages.show_page("eval"))
+
+        self.pages.show_page("home")
+
+    def _close_journal(self) -> None:
+        # The history of a closed journal's store is dropped with it
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.undo_stack is not None:
+            self.undo_stack.close()
+            self.undo_stack = None
+
+    def _on_closed(self, event: QCloseEvent) -> None:
+        self.indexer.stop()
+        # The final flush; every edit is on disk once the window closes
+        self._close_journal()
+
+    def _on_key_pressed(self, event: QKeyEvent) -> None:
+        if self.undo_stack is None:
+            return
+        if event.matches(QKeySequence.Undo):
+            self.undo_stack.undo()
+        elif event.matches(QKeySequence.Redo):
+            self.undo_stack.redo()
+
+    def _placeholder_page(self, title: str) -> QWidget:
+        page = QLabel(title)
+        page.setAlignment(Qt.AlignCenter)
+        page.setFont(self.content.font())
+        return page
+
+    def open_dataset(self, directory: str = '') -> None:
+        """Shows the dataset in :term:`directory` in the filmstrip,
+        asking for the directory if none is given."""
+
+        directory = directory or QFileDialog.getExistingDirectory(self, "Open Dataset")
+        if not directory:
+            return
+
+        from helix.core.journal import AnnotationJournal
+        from helix.core.undo import UndoStack
+
+        self._close_journal()
+        self.journal = AnnotationJournal(AnnotationJournal.default_directory(directory))
+        self.undo_stack = UndoStack(self.journal.store)
+
+        # Built first, so the filmstrip receives the scanned paths
+        self.pages.show_page("annotation")
+        self.indexer.open_directory(directory)
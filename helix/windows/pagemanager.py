@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Hosts the pages of each mode of a window.
+
+'PageManager' is a stacked widget that builds each registered page the
+first time it is shown, so the cost of starting the application does not
+grow with the number of modes. Built pages are kept in a bounded cache,
+and heavy pages left idle are torn down to reclaim their memory; they
+are rebuilt on the next visit.
+
+Example Usage:
+    >>> pages = PageManager(parent, max_pages=3)
+    >>> pages.register("home", HomePage, pinned=True)
+    >>> pages.register("eval", "helix.windows.evalwindow:EvalPage", heavy=True)
+    >>> eval_btn.clicked.connect(lambda: pages.show_page("eval"))
+
+If importing all (i.e. 'from pagemanager import *'), only 'PageManager'
+will be imported as defined in the '__all__' attribute.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+__all__ = ["PageManager"]
+
+
+import importlib
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Union
+
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtWidgets import QStackedWidget, QWidget
+
+
+class _PageEntry(object):
+    # The registration of a page and its built widget, if any
+    __slots__ = ('factory', 'heavy', 'pinned', 'widget', 'hidden_at')
+
+    def __init__(self, factory: Union[Callable[[], QWidget], str], heavy: bool, pinned: bool) -> None:
+        self.factory = factory
+        self.heavy = heavy
+        self.pinned = pinned
+        self.widget: Optional[QWidget] = None
+        self.hidden_at: Optional[float] = None
+
+
+class PageManager(QStackedWidget):
+    """Builds, caches and tears down the pages of a window.
+
+    Args:
+        parent (:obj:`QWidget`, optional):
+            The parent widget.
+        max_pages (:obj:`int`):
+            The number of built pages kept at once, not counting pinned
+            pages. The least recently shown page is torn down first.
+        idle_timeout (:obj:`float`):
+            The number of seconds a heavy page may stay hidden before it
+            is torn down. Idle pages are never torn down if 0.
+
+    Attributes:
+        page_built (:obj:`pyqtSignal`):
+            The signal fired with the name of a page once it is built.
+        page_changed (:obj:`pyqtSignal`):
+            The signal fired with the name of the page being shown.
+        page_released (:obj:`pyqtSignal`):
+            The signal fired with the name of a page being torn down,
+            before its widget is deleted.
+
+    Raises:
+        ValueError:
+            An argument is of a legal type but is an illegal value.
+    """
+
+    page_built = pyqtSignal(str)
+    page_changed = pyqtSignal(str)
+    page_released = pyqtSignal(str)
+
+    _current: Optional[str]
+    _entries: Dict[str, _PageEntry]
+    _idle_timer: QTimer
+    _recent: OrderedDict
+
+    def __init__(self,
+                 parent: Optional[QWidget] = None,
+                 max_pages: int = 3,
+                 idle_timeout: float = 300.0) -> None:
+        super().__init__(parent)
+
+        if max_pages < 1:
+            raise ValueError(f"argument 'max_pages' must be at least 1: {max_pages}")
+
+        self.max_pages = max_pages
+        self.idle_timeout = idle_timeout
+
+        self._current = None
+        self._entries = {}
+
+        # Built, unpinned pages from least to most recently shown
+        self._recent = OrderedDict()
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.timeout.connect(self.release_idle)
+        if idle_timeout > 0:
+            # Checking at a fraction of the timeout bounds how late an
+            # idle page is torn down
+            self._idle_timer.start(max(1000, int(idle_timeout * 250)))
+
+    # Internal methods
+
+    def _build(self, name: str, entry: _PageEntry) -> QWidget:
+        factory = entry.factory
+        if isinstance(factory, str):
+            # Imported on first use so the page's dependencies do not
+            # slow down startup
+            module, _, attribute = factory.partition(':')
+            factory = entry.factory = getattr(importlib.import_module(module), attribute)
+
+        widget = factory()
+        widget.setObjectName(widget.objectName() or f"{name}_page")
+
+        entry.widget = widget
+        self.addWidget(widget)
+        self.page_built.emit(name)
+        return widget
+
+    def _evict(self) -> None:
+        # Tears down the least recently shown pages above the bound
+        while len(self._recent) > self.max_pages:
+            for name in self._recent:
+                if name != self._current:
+                    self.release(name)
+                    break
+            else:
+                break
+
+    # Public methods
+
+    @property
+    def built_pages(self) -> List[str]:
+        """The names of the pages currently built."""
+
+        return [name for name, entry in self._entries.items() if entry.widget is not None]
+
+    @property
+    def current_page(self) -> Optional[str]:
+        """The name of the page being shown, if any."""
+
+        return self._current
+
+    def page(self, name: str) -> Optional[QWidget]:
+        """Returns the widget of page :term:`name` if it is built."""
+
+        return self._entries[name].widget
+
+    def register(self,
+                 name: str,
+                 factory: Union[Callable[[], QWidget], str],
+                 heavy: bool = False,
+                 pinned: bool = False) -> None:
+        """
+        Registers a page without building it.
+
+        Args:
+            name (:obj:`str`):
+                The name the page is shown by.
+            factory (:obj:`Callable` or :obj:`str`):
+                Called without arguments to build the page widget the
+                first time it is shown. A 'package.module:attribute'
+                string names a factory that is only imported then, which
+                keeps heavy dependencies out of startup.
+            heavy (:obj:`bool`):
+                Whether the page is torn down after being hidden for
+                :attr:`idle_timeout` seconds.
+            pinned (:obj:`bool`):
+                Whether the page is never torn down nor counted against
+                :attr:`max_pages`, e.g. the home page.
+
+        Raises:
+            KeyError:
+                A page named :obj:`name` is already registered.
+        """
+
+        if name in self._entries:
+            raise KeyError(f"page '{name}' is already registered")
+
+        self._entries[name] = _PageEntry(factory, heavy, pinned)
+
+    def release(self, name: str) -> bool:
+        """
+        Tears down page :term:`name` if it is built. The page is built
+        again the next time it is shown.
+
+        Returns:
+            bool:
+                Whether the page was torn down. Pinned pages and the
+                page being shown are kept.
+        """
+
+        entry = self._entries[name]
+        if entry.widget is None or entry.pinned or name == self._current:
+            return False
+
+        self.page_released.emit(name)
+
+        widget = entry.widget
+        entry.widget = None
+        entry.hidden_at = None
+        self._recent.pop(name, None)
+
+        self.removeWidget(widget)
+        widget.deleteLater()
+        return True
+
+    def release_idle(self) -> List[str]:
+        """Tears down the heavy pages hidden for longer than
+        :attr:`idle_timeout` seconds, returning their names."""
+
+        if self.idle_timeout <= 0:
+            return []
+
+        now = time.monotonic()
+        idle = [
+            name for name, entry in self._entries.items()
+            if entry.heavy and entry.hidden_at is not None and
+            now - entry.hidden_at >= self.idle_timeout
+        ]
+        return [name for name in idle if self.release(name)]
+
+    def show_page(self, name: str) -> QWidget:
+        """
+        Shows page :term:`name`, building it first if needed.
+
+        Returns:
+            QWidget:
+                The widget of the page.
+
+        Raises:
+            KeyError:
+                No page named :obj:`name` is registered.
+        """
+
+        entry = self._entries[name]
+        if name == self._current and entry.widget is not None:
+            return entry.widget
+
+        widget = entry.widget
+        if widget is None:
+            widget = self._build(name, entry)
+
+        if self._current is not None:
+            self._entries[self._current].hidden_at = time.monotonic()
+
+        self._current = name
+        entry.hidden_at = None
+        self.setCurrentWidget(widget)
+
+        if not entry.pinned:
+            self._recent[name] = None
+            self._recent.move_to_end(name)
+            self._evict()
+
+        self.page_changed.emit(name)
+        return widget
@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+
+# **********************************************************************
+# * Copyright 2020 Julian_Orteil
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *    http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# * implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+# **********************************************************************
+
+"""Tests the core components of the application.
+
+This file is meant to be ran using the pytest framework.
+"""
+
+
+from __future__ import absolute_import
+from __future__ import annotations
+from __future__ import division
+from __future__ import print_function
+
+
+def test_dataset_browser(tmp_path):
+
+    from PyQt5.QtCore import QCoreApplication, QSize
+    from PyQt5.QtGui import QColor, QImage
+    from helix.core.browser import DatasetBrowser
+
+    app = QCoreApplication([])
+
+    for index in range(5):
+        image = QImage(400, 200, QImage.Format_RGB32)
+        image.fill(QColor(index * 40, 0, 0))
+        image.save(str(tmp_path / f"{index}.png"))
+
+    browser = DatasetBrowser(prefetch=2, target_size=QSize(100, 100))
+    ready = []
+    browser.image_ready.connect(lambda index, path, image: ready.append((index, image.size())))
+
+    browser.open_directory(str(tmp_path))
+    while not ready:
+        app.processEvents()
+    assert ready[0] == (0, QSize(100, 50))
+
+    # The prefetched next image is handed over right away
+    while 1 not in browser._images:
+        app.processEvents()
+    browser.next()
+    assert ready[-1][0] == 1
+
+    browser.shutdown()
+
+
+def test_image_cache(tmp_path):
+
+    import os
+
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtGui import QImage
+    from helix.core.imagecache import ImageCache
+
+    image = QImage(100, 100, QImage.Format_RGB32)
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"{index}.png"
+        image.save(str(path))
+        paths.append(str(path))
+
+    # Room for two 40000 byte images
+    cache = ImageCache(max_bytes=90000)
+    assert cache.get(paths[0]) is None
+
+    for path in paths[:2]:
+        assert cache.put(path, image)
+    assert cache.get(paths[0]) is not None
+    assert cache.get(paths[0], QSize(50, 50)) is None
+
+    cache.put(paths[2], image)
+    assert cache.get(paths[1]) is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 80000
+
+    # Probes are not counted; a miss is counted once per decode
+    misses = cache.misses
+    assert cache.peek(paths[1]) is None
+    cache.get_or_decode(paths[1], None, lambda path, size: image)
+    assert cache.peek(paths[1]) is not None
+    assert cache.misses == misses + 1 and cache.hits == 1
+
+    # A file rewritten while it is decoded is cached under its old time
+    def rewrite(path, size):
+        os.utime(path, ns=(0, 10 ** 9))
+        return image
+
+    path = str(tmp_path / "rewritten.png")
+    image.save(path)
+    cache.get_or_decode(path, None, rewrite)
+    assert cache.peek(path) is None
+
+    # Files that never change are keyed without a stat
+    cache.put(paths[0], image, stat=False)
+    os.unlink(paths[0])
+    assert cache.peek(paths[0], stat=False) is not None
+    assert cache.peek(paths[0]) is None
+
+
+def test_tile_pyramid(tmp_path):
+
+    import os
+    import struct
+
+    import pytest
+    from PyQt5.QtGui import QImage
+    from helix.core.tiles import TilePyramid
+
+    path = str(tmp_path / "large.png")
+    image = QImage(1000, 600, QImage.Format_RGB32)
+    image.fill(0)
+    image.save(path)
+
+    pyramid = TilePyramid(path, cache_dir=str(tmp_path / "tiles"), tile_size=256)
+    pyramid.build()
+
+    assert pyramid.levels == 3
+    assert pyramid.tile_grid(0) == (4, 3)
+    assert QImage(pyramid.tile_path(0, 3, 2)).size().width() == 1000 - 3 * 256
+    assert QImage(pyramid.tile_path(2, 0, 0)).width() == 250
+    assert pyramid.level_for_scale(0.3) == 1
+
+    # Reopening uses the cached pyramid
+    assert TilePyramid(path, cache_dir=str(tmp_path / "tiles"), tile_size=256).is_built()
+    assert list(pyramid.visible_tiles(1, 0, 0, 511, 511)) == [(0, 0)]
+
+    # A PNG is decoded whole, which is refused above the pixel cap
+    pyramid = TilePyramid(path, cache_dir=str(tmp_path / "capped"), tile_size=256, max_pixels=1000 * 599)
+    with pytest.raises(OSError):
+        pyramid.build()
+    assert not os.listdir(str(tmp_path / "capped"))
+
+    # A TIFF is read in bands through libtiff, whatever its size
+    from helix.core.tiles import _libtiff
+    if _libtiff() is None:
+        pytest.skip("libtiff is not installed")
+
+    path = str(tmp_path / "large.tif")
+    image.setPixel(999, 599, 0xff00ff00)
+    image.setPixel(300, 520, 0xffff0000)
+    image.save(path, "tif")
+
+    pyramid = TilePyramid(path, cache_dir=str(tmp_path / "capped"), tile_size=256, max_pixels=1000 * 599)
+    pyramid.build()
+    assert pyramid.levels == 3
+    assert QImage(pyramid.tile_path(0, 3, 2)).pixel(999 - 3 * 256, 599 - 2 * 256) == 0xff00ff00
+    assert QImage(pyramid.tile_path(0, 1, 2)).pixel(300 - 256, 520 - 2 * 256) == 0xffff0000
+    assert QImage(pyramid.tile_path(0, 0, 0)).pixel(0, 0) == 0xff000000
+
+    # A TIFF written as one strip would be decoded whole, so it is
+    # refused above the pixel cap too
+    width, height = 40, 30
+    entries = [(256, 3, width), (257, 3, height), (258, 3, 8), (259, 3, 1), (262, 3, 1),
+               (273, 4, 8 + 2 + 12 * 9 + 4), (277, 3, 1), (278, 3, height), (279, 4, width * height)]
+    with open(str(tmp_path / "strip.tif"), "wb") as file:
+        file.write(b"II*\0" + struct.pack("<I", 8) + struct.pack("<H", len(entries)))
+        for tag, kind, value in entries:
+            file.write(struct.pack("<HHI", tag, kind, 1) + struct.pack("<I" if kind == 4 else "<Hxx", value))
+        file.write(struct.pack("<I", 0) + bytes(range(height)) * width)
+
+    path = str(tmp_path / "strip.tif")
+    pyramid = TilePyramid(path, cache_dir=str(tmp_path / "strip"), tile_size=16, max_pixels=width * height - 1)
+    with pytest.raises(OSError):
+        pyramid.build()
+    assert not os.listdir(str(tmp_path / "strip"))
+
+    pyramid = TilePyramid(path, cache_dir=str(tmp_path / "strip"), tile_size=16, max_pixels=width * height)
+    pyramid.build()
+    assert QImage(pyramid.tile_path(0, 0, 0)).pixel(0, 0) == 0xff000000
+
+
+def test_dataset_indexer(tmp_path, monkeypatch):
+
+    import os
+
+    from PyQt5.QtCore import QCoreApplication
+    from PyQt5.QtGui import QImage
+    from helix.core.indexer import DatasetIndexer
+
+    app = QCoreApplication([])
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    dataset = tmp_path / "dataset"
+    (dataset / "nested").mkdir(parents=True)
+    image = QImage(400, 200, QImage.Format_RGB32)
+    image.fill(0)
+    for name in ("a.png", "b.png", "nested/c.png"):
+        image.save(str(dataset / name))
+    (dataset / "notes.txt").write_text("not an image")
+
+    # Old enough not to be listed again for being recent
+    for directory in (dataset, dataset / "nested"):
+        os.utime(str(directory), ns=(10 ** 18, 10 ** 18))
+
+    def index(indexer=None, changed=None, verify=False):
+        # Refreshes are triggered by hand rather than by a watcher
+        indexer = indexer or DatasetIndexer(
+            database=str(tmp_path / "thumbnails.db"),
+            thumbnail_size=64,
+            workers=1,
+            watch=False
+        )
+        scanned, thumbnails, finished = [], {}, []
+        indexer.scanned.connect(scanned.extend)
+        indexer.thumbnail_ready.connect(lambda index, path, image: thumbnails.update({index: image.size()}))
+        indexer.finished.connect(lambda: finished.append(True))
+
+        if verify:
+            indexer.verify()
+        elif changed is None:
+            indexer.open_directory(str(dataset))
+        else:
+            # As the file system watcher reports it
+            indexer._on_directory_changed(changed)
+        while not finished:
+            app.processEvents()
+        for signal in (indexer.scanned, indexer.thumbnail_ready, indexer.finished):
+            signal.disconnect()
+        return indexer, scanned, thumbnails
+
+    _, scanned, thumbnails = index()
+    assert [path[len(str(dataset)) + 1:] for path in scanned] == ["a.png", "b.png", "nested/c.png"]
+    assert thumbnails[0].width() == 64 and thumbnails[0].height() == 32
+
+    # Reopening sends the thumbnails stored in the database, without
+    # listing the unchanged directories or stat'ing their files
+    scandir, stat = os.scandir, os.stat
+    listed, stated = [], []
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "scandir", lambda path=".": listed.append(path) or scandir(path))
+        patch.setattr(os, "stat", lambda path, *args, **kwargs: stated.append(path) or stat(path, *args, **kwargs))
+        indexer, *reopened = index()
+    assert reopened == [scanned, thumbnails]
+    assert not listed and all(os.path.isdir(path) for path in stated)
+
+    # A refresh only sends the thumbnails of the images added
+    image.save(str(dataset / "nested" / "d.png"))
+    _, scanned, thumbnails = index(indexer, str(dataset / "nested"))
+    assert len(scanned) == 4 and list(thumbnails) == [3]
+
+    # Images edited in place, which leave their directory untouched, are
+    # found when asked to
+    QImage(100, 200, QImage.Format_RGB32).save(str(dataset / "a.png"))
+    _, _, thumbnails = index(indexer, verify=True)
+    assert list(thumbnails) == [0]
+    assert thumbnails[0].width() == 32 and thumbnails[0].height() == 64
+
+    # A change during the first scan is refreshed after it, rather than
+    # leaving the rest of the dataset without thumbnails
+    indexer = DatasetIndexer(database=str(tmp_path / "other.db"), thumbnail_size=64, workers=1, watch=False)
+    thumbnails, finished = set(), []
+    indexer.thumbnail_ready.connect(lambda index, path, image: thumbnails.add(path))
+    indexer.finished.connect(lambda: finished.append(True))
+    indexer.open_directory(str(dataset))
+    indexer._on_directory_changed(str(dataset / "nested"))
+    indexer._refresh()
+    while len(finished) < 2:
+        app.processEvents()
+    assert len(thumbnails) == 4
+
+    # Opening another directory mid-scan returns at once; the scan it
+    # replaces sends nothing more
+    other = tmp_path / "other"
+    other.mkdir()
+    image.save(str(other / "e.png"))
+    indexer = DatasetIndexer(database=str(tmp_path / "third.db"), thumbnail_size=64, workers=1, watch=False)
+    thumbnails, finished = set(), []
+    indexer.thumbnail_ready.connect(lambda index, path, image: thumbnails.add(path))
+    indexer.finished.connect(lambda: finished.append(True))
+    indexer.open_directory(str(dataset))
+    replaced = indexer._thread
+    indexer.open_directory(str(other))
+    assert replaced.is_alive()
+    while not finished:
+        app.processEvents()
+    replaced.join()
+    app.processEvents()
+    assert thumbnails == {str(other / "e.png")} and finished == [True]
+
+
+def test_dataset_manifest(tmp_path):
+
+    import os
+    from PyQt5.QtGui import QImage
+    from helix.core.manifest import DatasetManifest
+
+    dataset = tmp_path / "dataset"
+    (dataset / "nested").mkdir(parents=True)
+    image = QImage(40, 20, QImage.Format_RGB32)
+    image.fill(0)
+    for name in ("a.png", "b.png", "nested/c.png"):
+        image.save(str(dataset / name))
+
+    database = str(tmp_path / "manifest.db")
+    with DatasetManifest(str(dataset), database) as manifest:
+        added, changed, removed = manifest.refresh()
+        assert (len(added), changed, removed) == (3, [], [])
+        assert manifest.refresh() == ([], [], [])
+
+        # A directory modified within the tick of its last listing keeps
+        # its time, but is listed again anyway
+        info = os.stat(str(dataset))
+        image.save(str(dataset / "e.png"))
+        os.utime(str(dataset), ns=(info.st_atime_ns, info.st_mtime_ns))
+        assert manifest.refresh()[0] == [str(dataset / "e.png")]
+        (dataset / "e.png").unlink()
+        assert manifest.refresh()[2] == [str(dataset / "e.png")]
+
+        path = str(dataset / "a.png")
+        entry = manifest.entry(path)
+        manifest.record([entry[:3] + ("hash", 40, 20)])
+        assert manifest.entry(path)[3:] == ("hash", 40, 20)
+
+    # The manifest persists; only the directory that changed is listed
+    (dataset / "nested" / "c.png").unlink()
+    image.save(str(dataset / "nested" / "d.png"))
+    with DatasetManifest(str(dataset), database) as manifest:
+        nested = str(dataset / "nested")
+        assert manifest.refresh() == ([os.path.join(nested, "d.png")], [], [os.path.join(nested, "c.png")])
+        assert manifest.entry(str(dataset / "a.png"))[3] == "hash"
+
+        # Files edited in place are only found by a full refresh
+        info = os.stat(path)
+        os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+        assert manifest.refresh(full=True)[1] == [path]
+        assert manifest.entry(path)[3] is None
+
+        # Removed directories take their images with them
+        (dataset / "nested" / "d.png").unlink()
+        (dataset / "nested").rmdir()
+        assert manifest.refresh()[2] == [os.path.join(nested, "d.png")]
+        assert len(manifest) == 2
+
+
+def test_annotation_store():
+
+    import pytest
+    from helix.core.annotations import AnnotationStore
+
+    store = AnnotationStore(cell_size=64)
+    box = store.add_box("a.jpg", "car", 120, 80, 10, 10)
+    triangle = store.add_polygon("a.jpg", "person", [(200, 50), (300, 50), (250, 150)])
+    other = store.add_box("b.jpg", "car", 0, 0, 500, 500)
+
+    assert store.box(box) == (10, 10, 120, 80)
+    assert store.hit_test("a.jpg", 50, 40) == box
+    assert store.hit_test("a.jpg", 250, 60) == triangle
+    # Inside the triangle's box but outside the triangle
+    assert store.hit_test("a.jpg", 210, 140) is None
+    assert store.hit_test("b.jpg", 250, 60) == other
+
+    assert store.select("a.jpg", 0, 0, 400, 400, contained=True).tolist() == [box, triangle]
+    assert store.select("a.jpg", 100, 0, 210, 60).tolist() == [box, triangle]
+    assert store.select("a.jpg", 100, 0, 210, 60, contained=True).tolist() == []
+
+    # The spatial index follows moves across cells
+    store.move([triangle], 1000, 0)
+    assert store.hit_test("a.jpg", 250, 60) is None
+    assert store.hit_test("a.jpg", 1250, 60) == triangle
+    assert store.vertices(triangle)[0].tolist() == [1200, 50]
+
+    store.remove(box)
+    assert store.hit_test("a.jpg", 50, 40) is None
+    assert box not in store and len(store) == 2
+    with pytest.raises(KeyError):
+        store.label(box)
+    assert store.label_counts() == {"car": 1, "person": 1}
+
+    # Growth keeps every column and polygon intact
+    for index in range(5000):
+        store.add_polygon("c.jpg", "dot", [(index, 0), (index + 1, 0), (index, 1)])
+    store.compact()
+    assert store.vertices(triangle)[2].tolist() == [1250, 150]
+    assert store.hit_test("c.jpg", 4000.2, 0.2) == 4003
+
+
+def test_annotation_journal(tmp_path):
+
+    import asyncio
+    import os
+    from helix.core.journal import AnnotationJournal
+
+    directory = str(tmp_path / "annotations")
+    journal = AnnotationJournal(directory, compact_bytes=1 << 20)
+    box = journal.store.add_box("a.jpg", "car", 0, 0, 10, 10)
+    polygon = journal.store.add_polygon("a.jpg", "person", [(20, 20), (40, 20), (30, 40)])
+    journal.store.move([box], 5, 5)
+    journal.store.set_label(polygon, "cyclist")
+    journal.close()
+
+    # Replayed from the journal
+    journal = AnnotationJournal(directory, compact_bytes=1 << 20)
+    assert journal.store.box(box) == (5, 5, 15, 15)
+    assert journal.store.label(polygon) == "cyclist"
+
+    # Compacted into a snapshot, keeping later edits in the journal
+    journal.compact()
+    journal.store.remove(box)
+    journal.flush()
+    assert journal.store.hit_test("a.jpg", 30, 25) == polygon
+    journal.close()
+    assert sorted(os.listdir(directory)) == ["journal-000003.log", "snapshot.npz"]
+
+    # A line torn by a crash is ignored
+    with open(os.path.join(directory, "journal-000003.log"), "ab") as file:
+        file.write(b'0badc0de [4,"remove",')
+    journal = AnnotationJournal(directory)
+    assert box not in journal.store and journal.store.vertices(polygon).tolist() == [[20, 20], [40, 20], [30, 40]]
+    journal.close()
+
+    # Compacting once the journal grows large waits for the next tick
+    # rather than stalling the edit
+    async def edit():
+        journal = AnnotationJournal(directory, compact_bytes=64)
+        for _ in range(3):
+            journal.store.move([polygon], 1, 1)
+        assert journal._journal_bytes > 64
+        await asyncio.sleep(0)
+        assert journal._journal_bytes == 0
+        journal.close()
+
+    asyncio.run(edit())
+    journal = AnnotationJournal(directory)
+    assert journal.store.vertices(polygon).tolist() == [[23, 23], [43, 23], [33, 43]]
+    journal.close()
+
+
+def test_undo_stack():
+
+    import pytest
+    from helix.core.annotations import AnnotationStore
+    from helix.core.undo import UndoStack
+
+    store = AnnotationStore()
+    undo_stack = UndoStack(store, merge_interval=60)
+
+    box = store.add_box("a.jpg", "car", 0, 0, 10, 10)
+    # A drag merges into a single command
+    for _ in range(100):
+        store.move([box], 1, 0)
+    store.set_label(box, "truck")
+    assert undo_stack.undo_text() == "Relabel"
+
+    undo_stack.undo()
+    assert store.label(box) == "car"
+    undo_stack.undo()
+    assert store.box(box) == (0, 0, 10, 10)
+    undo_stack.undo()
+    assert box not in store and not undo_stack.can_undo()
+
+    # Redoing an add brings back the same annotation
+    undo_stack.redo()
+    undo_stack.redo()
+    assert store.box(box) == (100, 0, 110, 10)
+    assert undo_stack.redo_text() == "Relabel"
+
+    # A new edit drops what is left to redo
+    with undo_stack.group("Paste"):
+        store.add_box("a.jpg", "car", 0, 0, 5, 5)
+        store.add_box("a.jpg", "car", 5, 5, 9, 9)
+    assert not undo_stack.can_redo()
+    undo_stack.undo()
+    assert len(store) == 1
+
+    # The history is bounded by memory, keeping the newest commands
+    undo_stack = UndoStack(store, max_bytes=4096, merge_interval=0)
+    for index in range(100):
+        store.set_box(box, 0, 0, index + 1, index + 1)
+    assert 0 < undo_stack.current_bytes <= 4096
+    while undo_stack.undo():
+        # Commands to redo count toward the bound too
+        assert undo_stack.current_bytes <= 4096
+    assert 0 < store.box(box)[2] < 100
+
+    # A command that fails to apply stays in the history
+    undo_stack.redo()
+    size = undo_stack.current_bytes
+    store.apply = lambda record: (_ for _ in ()).throw(KeyError(record[1]))
+    with pytest.raises(KeyError):
+        undo_stack.undo()
+    assert undo_stack.can_undo() and undo_stack.current_bytes == size
+    del store.apply
+
+    # The records applied before one that fails are rolled back
+    other = store.add_box("a.jpg", "car", 20, 20, 30, 30)
+    with undo_stack.group("Move"):
+        store.move([box], 5, 0)
+        store.move([other], 5, 0)
+    calls = []
+
+    def fail_second(record):
+        calls.append(record)
+        if len(calls) == 2:
+            raise KeyError(record[1])
+        type(store).apply(store, record)
+
+    store.apply = fail_second
+    with pytest.raises(KeyError):
+        undo_stack.undo()
+    del store.apply
+    assert store.box(other) == (25, 20, 35, 30)
+    assert undo_stack.undo() and store.box(other) == (20, 20, 30, 30)
+
+    # A closed stack no longer records the edits of its store
+    undo_stack.close()
+    store.set_label(box, "bus")
+    assert not undo_stack.can_undo() and undo_stack.current_bytes == 0
+
+
+def test_annotation_journal_close(tmp_path):
+
+    import os
+
+    from helix.core.journal import AnnotationJournal
+
+    journal = AnnotationJournal(str(tmp_path / "annotations"))
+    edits = []
+    journal.store.observe(lambda record, inverse: edits.append(record[0]))
+    journal.close()
+
+    # Edits after closing reach the other observers, but not the journal
+    journal.store.add_box("a.jpg", "car", 0, 0, 10, 10)
+    assert edits == ["add"]
+    with AnnotationJournal(str(tmp_path / "annotations")) as reopened:
+        assert len(reopened.store) == 0
+
+    # Sessions without edits leave no journal segment behind
+    assert os.listdir(str(tmp_path / "annotations")) == []
@@ -43,3 +43,427 @@ def test_dictutils() -> None:
 
     assert maps.hello and isinstance(maps.hello, str)
     assert maps.should_be_int and isinstance(maps.should_be_int, int)
+
+
+def test_dictutils_coercion() -> None:
+
+    from helix.utils.dictutils import Maps
+
+    d = {
+        "an int": "32",
+        "a-float": "1e-5",
+        "a_bool": "tRue",
+        "none": "None",
+        "literal": "[1, 2]",
+        "string": "adam",
+        "not_a_str": 7,
+        "nested": {"leading zeros": "010"},
+    }
+    maps = Maps(d)
+
+    assert maps.an_int == 32
+    assert maps.a_float == 1e-5
+    assert maps.a_bool is True
+    assert maps.none is None
+    assert maps.literal == [1, 2]
+    assert maps.string == "adam"
+    assert maps.not_a_str == 7
+    assert maps.nested.leading_zeros == "010"
+
+
+def test_dictutils_lazy() -> None:
+
+    from helix.utils.dictutils import Maps
+
+    d = {"shard": {"size": "32", "images": [{"path": "a.png"}]}, "name": "train"}
+    maps = Maps(d, _lazy=True)
+
+    assert maps._map["shard"] is d["shard"]
+    assert isinstance(maps.shard, Maps)
+    assert maps._map["shard"] is maps.shard
+    assert maps.shard.size == 32
+    assert maps.shard.images[0].path == "a.png"
+    assert maps.to_dict() == {"shard": {"size": 32, "images": [{"path": "a.png"}]}, "name": "train"}
+
+    # Dicts in nested lists are wrapped as the constructor wraps them
+    nested = Maps({"l": [[{"a": "1"}], "2"]}, _lazy=True)
+    assert isinstance(nested.l[0][0], Maps) and nested.l[0][0].a == 1
+    assert nested.l[1] == "2"
+    assert nested == Maps({"l": [[{"a": "1"}], "2"]})
+
+    # Lazy and eager objects compare equal either way round
+    eager = Maps({"a": "1", "nested": {"b": "2"}})
+    assert eager == Maps({"a": "1", "nested": {"b": "2"}}, _lazy=True)
+    assert Maps({"a": "1", "nested": {"b": "2"}}, _lazy=True) == eager
+    assert not eager != Maps({"a": "1", "nested": {"b": "2"}}, _lazy=True)
+
+
+def test_dictutils_frozen() -> None:
+
+    import pickle
+
+    import pytest
+
+    from helix.utils.dictutils import FrozenMaps, Maps
+
+    d = {"optimizer": {"lr": "0.001", "betas": ["0.9", "0.999"]}, "1st": "1"}
+    frozen = Maps(d).freeze()
+
+    assert isinstance(frozen, FrozenMaps) and frozen == FrozenMaps(d)
+    assert frozen.optimizer.lr == 0.001
+    assert frozen.optimizer.betas == ("0.9", "0.999")
+    assert frozen["1st"] == 1
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
+
+    with pytest.raises(AttributeError):
+        frozen.missing
+    with pytest.raises(AttributeError):
+        frozen.optimizer.lr = 0.1
+
+    # Deep and cyclic trees are frozen and converted back without recursion
+    deep = current = {}
+    for _ in range(3000):
+        current["child"] = current = {}
+    current["leaf"] = "1"
+    node = FrozenMaps(deep).to_dict()
+    for _ in range(3000):
+        node = node["child"]
+    assert node == {"leaf": 1}
+
+    a = {"name": "a"}
+    a["b"] = {"a": a, "runs": [a]}
+    frozen = FrozenMaps(a)
+    assert frozen.b.a is frozen and frozen.b.runs[0] is frozen
+    converted = frozen.to_dict()
+    assert converted["b"]["a"] is converted and converted["b"]["runs"][0] is converted
+
+    # No tuple can hold itself
+    looped = []
+    looped.append(looped)
+    with pytest.raises(ValueError):
+        FrozenMaps({"looped": looped})
+
+    # Keysets driven by data stop generating classes past a cap
+    for index in range(1100):
+        frozen = FrozenMaps({f"key_{index}": "1"})
+    assert len(FrozenMaps._layouts) <= 1025
+    assert frozen.key_1099 == 1 and pickle.loads(pickle.dumps(frozen)) == frozen
+    with pytest.raises(AttributeError):
+        frozen.missing
+
+
+def test_dictutils_copy() -> None:
+
+    import copy
+
+    from helix.utils.dictutils import Maps
+
+    shared = {"lr": "0.1"}
+    d = {"a": shared, "b": shared, "runs": [shared]}
+    d["parent"] = d
+    maps = Maps(d)
+
+    converted = maps.to_dict()
+    assert converted["a"] is converted["b"] is converted["runs"][0]
+    assert converted["parent"] is converted
+
+    for duplicate in (maps.copy(), copy.deepcopy(maps)):
+        assert duplicate.a is duplicate.b and duplicate.a is not maps.a
+        assert duplicate.parent is duplicate
+        assert duplicate.a.lr == 0.1
+
+    # Items of lists are deep copied too
+    maps = Maps({"xs": [{"car"}, ({"bus"},)]})
+    duplicate = copy.deepcopy(maps)
+    duplicate.xs[0].add("truck")
+    duplicate.xs[1][0].add("van")
+    assert maps.xs == [{"car"}, ({"bus"},)]
+
+    deep = current = {}
+    for _ in range(10000):
+        current["child"] = current = {}
+    current["leaf"] = "1"
+
+    node = Maps(deep).copy().to_dict()
+    for _ in range(10000):
+        node = node["child"]
+    assert node == {"leaf": 1}
+
+
+def test_dictutils_load_ini(tmp_path, monkeypatch) -> None:
+
+    from helix.utils.dictutils import Maps
+
+    ini = tmp_path / "config.ini"
+    ini.write_text("[train]\nepochs = 10\ndata = &HELIX_DATA&/images\n")
+    cache_dir = str(tmp_path / "cache")
+
+    monkeypatch.setenv("HELIX_DATA", "/mnt/a")
+    assert Maps.load_ini(str(ini), cache_dir=cache_dir) == {
+        "train": {"epochs": 10, "data": "/mnt/a/images"}
+    }
+
+    def fail(*args, **kwargs) -> None:
+        raise AssertionError("snapshot was not used")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Maps, "parse_ini", fail)
+        assert Maps.load_ini(str(ini), to_maps=True, cache_dir=cache_dir).train.epochs == 10
+
+    monkeypatch.setenv("HELIX_DATA", "/mnt/b")
+    assert Maps.load_ini(str(ini), cache_dir=cache_dir)["train"]["data"] == "/mnt/b/images"
+
+    ini.write_text("[train]\nepochs = 20\n")
+    assert Maps.load_ini(str(ini), cache_dir=cache_dir)["train"]["epochs"] == 20
+
+
+def test_dictutils_parse_ini_env(monkeypatch) -> None:
+
+    from configparser import ConfigParser
+
+    import pytest
+
+    from helix.utils.dictutils import Maps
+
+    def parse(missing_env: str) -> dict:
+        parser = ConfigParser()
+        parser.read_string("[paths]\ndata = &HELIX_ROOT&/&HELIX_SET:train&/&HELIX_MISSING&\n")
+        return Maps.parse_ini(parser, missing_env=missing_env)
+
+    monkeypatch.setenv("HELIX_ROOT", "/mnt")
+    monkeypatch.delenv("HELIX_SET", raising=False)
+    monkeypatch.delenv("HELIX_MISSING", raising=False)
+
+    assert parse("leave")["paths"]["data"] == "/mnt/train/&HELIX_MISSING&"
+    assert parse("empty")["paths"]["data"] == "/mnt/train/"
+    with pytest.raises(KeyError):
+        parse("error")
+
+
+def test_dictutils_iter_ini(tmp_path) -> None:
+
+    from helix.utils.dictutils import Maps
+
+    ini = tmp_path / "shards.ini"
+    ini.write_text(
+        "# generated\n"
+        "[DEFAULT]\n"
+        "root = /mnt\n"
+        "\n"
+        "[shard 0]\n"
+        "size = 10\n"
+        "path = %(root)s/0\n"
+        "\n"
+        "[shard 1]\n"
+        "size = 20\n"
+        "notes = first line\n"
+        "    [not a section]\n"
+    )
+
+    sections = Maps.iter_ini(str(ini))
+
+    name, shard = next(sections)
+    assert name == "shard 0"
+    assert isinstance(shard, Maps) and shard.size == 10 and shard.path == "/mnt/0"
+
+    name, shard = next(sections)
+    assert name == "shard 1"
+    assert shard.size == 20 and shard.notes == "first line\n[not a section]"
+
+    assert next(sections, None) is None
+
+
+def test_dictutils_layered() -> None:
+
+    import copy
+
+    from helix.utils.dictutils import LayeredMaps, Maps
+
+    base = Maps({"train": {"lr": "0.1", "epochs": "10"}, "seed": "1"})
+    variant = LayeredMaps(base).new_child()
+
+    variant.train.lr = 0.01
+    variant.seed = 2
+
+    assert variant.train.lr == 0.01 and variant.train.epochs == 10
+    assert base.train.lr == 0.1 and base.seed == 1
+    assert variant.layers[-1].to_dict() == {"train": {"lr": 0.01}, "seed": 2}
+    assert variant.flatten() == Maps({"train": {"lr": 0.01, "epochs": 10}, "seed": 2})
+
+    variant.pop()
+    assert variant.train.lr == 0.1
+
+    # Copies share the layers rather than recursing through them
+    duplicate = copy.copy(variant)
+    assert duplicate.train.lr == 0.1 and duplicate.layers == variant.layers
+
+
+def test_dictutils_track_changes() -> None:
+
+    from helix.utils.dictutils import Maps
+
+    maps = Maps({"train": {"lr": "0.1", "epochs": "10"}})
+    notifications = []
+    tracker = maps.track_changes(notifications.append, schedule=lambda flush: None)
+
+    maps.train.lr = 0.01
+    maps.train.update(epochs=20)
+    maps.eval = Maps({"metric": "iou"})
+    maps.eval.metric = "map"
+    assert not notifications
+
+    tracker.flush()
+    assert notifications == [frozenset({"train.lr", "train.epochs", "eval", "eval.metric"})]
+
+    removed = maps.eval
+    del maps.eval
+    removed.metric = "iou"
+    tracker.flush()
+    assert notifications[-1] == frozenset({"eval"})
+
+    # Reading a missing key creates an empty child without a change
+    maps.schedule
+    tracker.flush()
+    assert len(notifications) == 2
+    maps.schedule.name = "cosine"
+    tracker.flush()
+    assert notifications[-1] == frozenset({"schedule.name"})
+
+    tracker.detach()
+    maps.train.lr = 0.1
+    tracker.flush()
+    assert len(notifications) == 3
+
+
+def test_dictutils_diff() -> None:
+
+    from helix.utils.dictutils import Maps
+
+    base = Maps({"train": {"lr": "0.1", "epochs": "10", "warmup": "1"}, "data": {"root": "/mnt"}})
+    run = base.copy()
+    run.data = base.data
+    run.train.lr = 0.01
+    del run.train.warmup
+    run.train.schedule = Maps({"name": "cosine"})
+
+    patch = base.diff(run)
+    assert patch == {
+        "added": {("train", "schedule"): {"name": "cosine"}},
+        "removed": [("train", "warmup")],
+        "changed": {("train", "lr"): 0.01},
+    }
+    assert base.diff(base) == {"added": {}, "removed": [], "changed": {}}
+
+    base.apply_patch(patch)
+    assert base == run and isinstance(base.train.schedule, Maps)
+
+    # Keys holding a '.', integer keys and tuple keys round-trip as is
+    base = Maps({"files": {}, 0: {"size": 1}})
+    run = base.copy()
+    run.files["a.png"] = 1
+    run[0]["size"] = 2
+    run[1] = Maps({(0, 1): "edge"})
+    patch = base.diff(run)
+    assert patch["added"] == {("files", "a.png"): 1, (1,): {(0, 1): "edge"}}
+    assert patch["changed"] == {(0, "size"): 2}
+    base.apply_patch(patch)
+    assert base == run and list(base.files) == ["a.png"]
+    assert list(base) == ["files", 0, 1] and list(base[1]) == [(0, 1)]
+
+    del run[0]
+    run[1][(0, 1)] = "node"
+    patch = base.diff(run)
+    base.apply_patch(patch)
+    assert base == run and list(base) == ["files", 1]
+
+
+def test_dictutils_paths() -> None:
+
+    import pytest
+
+    from helix.utils.dictutils import Maps, MapsPath
+
+    maps = Maps({"train": {"optimizer": {"lr": "0.1"}, "epochs": "10"}})
+
+    assert maps.get_path("train.optimizer.lr") == 0.1
+    assert maps.get_path("train.missing.lr", None) is None
+    assert "missing" not in maps.train
+    with pytest.raises(KeyError):
+        maps.get_path("train.missing")
+
+    assert maps.get_paths(["train.optimizer.lr", "train.epochs", "eval"], default=0) == [0.1, 10, 0]
+
+    lr = Maps.compile_path("train.optimizer.lr")
+    assert isinstance(lr, MapsPath) and lr is Maps.compile_path("train.optimizer.lr")
+    lr.set(maps, 0.01)
+    assert lr.get(maps) == maps.train.optimizer.lr == 0.01
+
+    maps.set_path("eval.metric", "iou")
+    assert maps.eval.metric == "iou"
+
+    # Only plain decimal segments also look up an integer key
+    indexed = {"runs": {-1: "last", "--1": "dashes", "²": "squared"}}
+    assert MapsPath("runs.-1").get(indexed) == "last"
+    assert MapsPath("runs.--1").get(indexed) == "dashes"
+    assert MapsPath("runs.²").get(indexed) == "squared"
+    assert MapsPath("runs.--2").get(indexed, None) is None
+
+
+def test_schemautils() -> None:
+
+    import pytest
+
+    from helix.utils.dictutils import Maps
+    from helix.utils.schemautils import Field, Schema, SchemaError
+
+    class Optimizer(Schema):
+        name = Field(str, choices=("adam", "sgd"))
+        lr = Field(float, default=0.001, minimum=0)
+
+    class Train(Schema):
+        epochs = Field(int, minimum=1)
+        sizes = Field(tuple, default=())
+        optimizer = Field(Optimizer)
+
+    train = Train.compile(Maps({"epochs": "10", "sizes": "[1, 2]", "optimizer": {"name": "adam", "lr": "1"}}))
+    assert train.epochs == 10 and train.sizes == (1, 2)
+    assert train.optimizer.lr == 1.0 and isinstance(train.optimizer.lr, float)
+    assert not hasattr(train, "__dict__")
+    assert train.to_dict() == {"epochs": 10, "sizes": (1, 2), "optimizer": {"name": "adam", "lr": 1.0}}
+    with pytest.raises(AttributeError):
+        train.epochs = 5
+
+    with pytest.raises(SchemaError) as info:
+        Train.compile(Maps({"epochs": "0", "optimizer": {"name": "rmsprop", "lr": "True"}, "typo": "1"}), strict=True)
+    assert sorted(path for path, _ in info.value.violations) == [
+        "epochs", "optimizer.lr", "optimizer.name", "typo"
+    ]
+
+
+def test_dictutils_pickle() -> None:
+
+    import pickle
+
+    import pytest
+
+    from helix.utils.dictutils import Maps, SharedMaps
+
+    maps = Maps({"loader": {"batch_size": "32", "shards": ["a", "b"]}, "seed": "7"})
+    maps.raw = {"kept": "as dict"}
+    maps.itself = maps
+
+    loaded = pickle.loads(pickle.dumps(maps))
+    assert loaded.loader == maps.loader and isinstance(loaded.loader, Maps)
+    assert type(loaded.raw) is dict and loaded.itself is loaded
+
+    with maps.share() as shared:
+        assert isinstance(shared, SharedMaps)
+        assert shared.loader.batch_size == 32 and shared["seed"] == 7
+        assert shared.itself is shared
+        assert pickle.loads(pickle.dumps(shared.loader)) is shared.loader
+        assert len(pickle.dumps(shared)) < 200
+        assert shared.to_maps().loader == maps.loader
+        with pytest.raises(AttributeError):
+            shared.seed = 8
+    with pytest.raises(ValueError):
+        shared.loader.batch_size
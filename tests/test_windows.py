@@ -29,7 +29,7 @@ from __future__ import division
 from __future__ import print_function
 
 
-def test_building_mainwindow():
+def test_building_mainwindow(tmp_path, monkeypatch):
 
     from PyQt5.QtWidgets import QApplication, QMainWindow
     from helix.windows.mainwindow.ui import Ui_Helix
@@ -40,13 +40,53 @@ def test_building_mainwindow():
 
             self.setup_ui(self)
 
+    # Resources are compiled into the cache
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
     app = QApplication([])
     window = Window()
 
-def test_building_mainwindow_view():
+def test_building_mainwindow_view(tmp_path, monkeypatch):
 
     from PyQt5.QtWidgets import QApplication
     from helix.windows.mainwindow.view import HelixWindowView
 
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
     app = QApplication([])
     window = HelixWindowView()
+
+def test_page_manager():
+
+    from PyQt5.QtWidgets import QApplication, QLabel
+    from helix.windows.pagemanager import PageManager
+
+    app = QApplication([])
+    pages = PageManager(max_pages=1, idle_timeout=0)
+
+    built = []
+    pages.register("home", lambda: QLabel("home"), pinned=True)
+    pages.register("train", lambda: built.append("train") or QLabel("train"))
+    pages.register("eval", lambda: built.append("eval") or QLabel("eval"), heavy=True)
+
+    assert pages.built_pages == []
+
+    pages.show_page("home")
+    pages.show_page("train")
+    pages.show_page("eval")
+    assert pages.current_page == "eval"
+    assert pages.built_pages == ["home", "eval"]
+
+    pages.show_page("train")
+    assert built == ["train", "eval", "train"]
+
+def test_designer_cache(tmp_path):
+
+    import os
+
+    from helix.windows.designer import compile_resources, compile_ui
+
+    resources = compile_resources(str(tmp_path))
+    modified = os.stat(resources).st_mtime_ns
+    assert compile_resources(str(tmp_path)) == resources
+    assert os.stat(resources).st_mtime_ns == modified
+
+    assert os.path.exists(compile_ui(str(tmp_path)))